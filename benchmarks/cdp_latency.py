@@ -0,0 +1,126 @@
+"""
+Compare the latency of Playwright calls made through RPyC netrefs with calls made
+directly over CDP.
+
+Connects to a running agent, and makes the same calls on a page obtained from
+`ChromiumServiceAPI.browser` (where every call goes through RPyC and the agent's
+Playwright instance) and on a page obtained from
+`ChromiumServiceAPI.connect_over_cdp()` (where every call goes straight to the
+browser from Playwright on the host). Unlike the other benchmarks, this needs a
+virtual machine running the agent.
+
+Usage:
+    python benchmarks/cdp_latency.py 192.168.50.4 --iterations 200
+"""
+
+import argparse
+import json
+import statistics
+import time
+from dataclasses import asdict, dataclass
+from functools import partial
+from typing import Any, Callable
+
+from akf_windows.api.chromium import ChromiumServiceAPI
+
+# The calls to time on each page, from cheapest to most expensive on the browser
+CALLS: dict[str, Callable[[Any], Any]] = {
+    "page.url": lambda page: page.url,
+    "page.title()": lambda page: page.title(),
+    "page.evaluate()": lambda page: page.evaluate("1 + 1"),
+    "locator.count()": lambda page: page.locator("a").count(),
+}
+
+
+@dataclass
+class CallResult:
+    """
+    Latency measurements for a single call made through a single path.
+    """
+
+    path: str
+    call: str
+    iterations: int
+    median_ms: float
+    p95_ms: float
+    max_ms: float
+
+
+def time_call(
+    path: str, call: str, func: Callable[[], Any], iterations: int
+) -> CallResult:
+    # Warm up, so that one-off costs (e.g. RPyC resolving the method) aren't
+    # included in the results
+    func()
+
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+
+    samples.sort()
+    return CallResult(
+        path=path,
+        call=call,
+        iterations=iterations,
+        median_ms=statistics.median(samples),
+        p95_ms=samples[int(len(samples) * 0.95) - 1],
+        max_ms=samples[-1],
+    )
+
+
+def run_benchmark(
+    chromium: ChromiumServiceAPI, browser_type: str, url: str, iterations: int
+) -> list[CallResult]:
+    results: list[CallResult] = []
+
+    # Launch the browser with a debugging port up front, so that both paths
+    # talk to the same browser
+    direct_context = chromium.connect_over_cdp(browser_type)  # type: ignore[arg-type]
+
+    netref_page = chromium.browser.new_page()
+    netref_page.goto(url)
+    direct_page = direct_context.new_page()
+    direct_page.goto(url)
+
+    try:
+        for call, func in CALLS.items():
+            for path, page in (("netref", netref_page), ("cdp", direct_page)):
+                results.append(time_call(path, call, partial(func, page), iterations))
+    finally:
+        netref_page.close()
+        direct_page.close()
+
+    return results
+
+
+def print_results(results: list[CallResult]) -> None:
+    print(f"{'call':<18}{'path':<8}{'median ms':>11}{'p95 ms':>10}{'max ms':>10}")
+    for r in results:
+        print(
+            f"{r.call:<18}{r.path:<8}{r.median_ms:>11.3f}{r.p95_ms:>10.3f}"
+            f"{r.max_ms:>10.3f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("host", help="The IP address of the agent")
+    parser.add_argument("--browser", choices=["msedge", "chrome"], default="msedge")
+    parser.add_argument("--url", default="https://example.com")
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    with ChromiumServiceAPI.auto_connect(args.host) as chromium:
+        results = run_benchmark(chromium, args.browser, args.url, args.iterations)
+
+    if args.json:
+        print(json.dumps([asdict(r) for r in results], indent=2))
+    else:
+        print_results(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""
+Benchmark each stage of Chromium history collection on a synthetic History
+database.
+
+Reports rows/sec, peak memory (as traced by `tracemalloc`) and payload size for
+each stage of `ChromiumService.exposed_get_history`: copying the database,
+querying the `urls` table, converting rows to BrowserHistoryEntry models and then
+to CASE objects, and pickling the result (plus unpickling, which happens on the
+host). Runs on any platform; no browser is needed.
+
+Usage:
+    python benchmarks/chromium_history.py --urls 1000000 --visits 5000000
+"""
+
+import argparse
+import json
+import logging
+import pickle
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable, TypeVar
+
+from history_db import generate_history_db
+
+from akf_windows.server.chromium import (
+    HISTORY_URLS_QUERY,
+    ChromiumService,
+    build_url_history,
+    remove_history_snapshot,
+    row_to_history_entry,
+    snapshot_history,
+)
+
+T = TypeVar("T")
+
+
+@dataclass
+class StageResult:
+    """
+    Measurements for a single benchmark stage.
+    """
+
+    stage: str
+    rows: int
+    seconds: float
+    peak_memory_bytes: int
+    payload_bytes: int | None = None
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else float("inf")
+
+
+def measure(
+    stage: str, rows: int, func: Callable[[], T], trace_memory: bool
+) -> tuple[T, StageResult]:
+    """
+    Run `func` once, measuring its wall-clock time and peak memory.
+    """
+    if trace_memory:
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+
+    start = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - start
+
+    peak = 0
+    if trace_memory:
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+
+    return result, StageResult(stage, rows, seconds, peak)
+
+
+def run_benchmark(
+    history_path: Path,
+    trace_memory: bool = True,
+    expected_dropped: int | None = None,
+) -> list[StageResult]:
+    """
+    Run every stage of history collection against `history_path`.
+
+    If `expected_dropped` is given, check that exactly that many rows were
+    dropped for having invalid timestamps.
+    """
+    if trace_memory:
+        tracemalloc.start()
+
+    results: list[StageResult] = []
+
+    with sqlite3.connect(history_path) as conn:
+        (num_rows,) = conn.execute("SELECT COUNT(*) FROM urls").fetchone()
+
+    snapshot_path, result = measure(
+        "snapshot",
+        num_rows,
+        lambda: snapshot_history("msedge", history_path),
+        trace_memory,
+    )
+    result.payload_bytes = snapshot_path.stat().st_size
+    results.append(result)
+
+    try:
+
+        def query() -> list[sqlite3.Row]:
+            conn = sqlite3.connect(snapshot_path)
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute(HISTORY_URLS_QUERY).fetchall()
+            conn.close()
+            return rows
+
+        rows, result = measure("query", num_rows, query, trace_memory)
+        results.append(result)
+    finally:
+        remove_history_snapshot(snapshot_path)
+
+    def parse_rows() -> list[Any]:
+        entries = [row_to_history_entry(row) for row in rows]
+        return [entry for entry in entries if entry is not None]
+
+    entries, result = measure("parse rows", len(rows), parse_rows, trace_memory)
+    results.append(result)
+
+    dropped = len(rows) - len(entries)
+    if expected_dropped is not None:
+        assert (
+            dropped == expected_dropped
+        ), f"Dropped {dropped} rows, expected {expected_dropped}"
+
+    url_history, result = measure(
+        "CASE conversion",
+        len(entries),
+        lambda: build_url_history("msedge", entries),
+        trace_memory,
+    )
+    results.append(result)
+
+    payload, result = measure(
+        "pickle", len(entries), lambda: pickle.dumps(url_history), trace_memory
+    )
+    result.payload_bytes = len(payload)
+    results.append(result)
+
+    _, result = measure(
+        "unpickle", len(entries), lambda: pickle.loads(payload), trace_memory
+    )
+    result.payload_bytes = len(payload)
+    results.append(result)
+
+    # The whole agent-side pipeline, as run for a single RPyC call
+    payload, result = measure(
+        "exposed_get_history",
+        num_rows,
+        lambda: ChromiumService().exposed_get_history("msedge", history_path),
+        trace_memory,
+    )
+    result.payload_bytes = len(payload)
+    results.append(result)
+
+    if trace_memory:
+        tracemalloc.stop()
+
+    return results
+
+
+def print_results(results: list[StageResult]) -> None:
+    print(
+        f"{'stage':<22}{'rows':>12}{'seconds':>10}{'rows/sec':>14}"
+        f"{'peak MiB':>11}{'payload MiB':>13}"
+    )
+    for r in results:
+        payload = (
+            f"{r.payload_bytes / 2**20:.2f}" if r.payload_bytes is not None else "-"
+        )
+        print(
+            f"{r.stage:<22}{r.rows:>12}{r.seconds:>10.3f}{r.rows_per_second:>14,.0f}"
+            f"{r.peak_memory_bytes / 2**20:>11.2f}{payload:>13}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--urls", type=int, default=100_000)
+    parser.add_argument("--visits", type=int, default=500_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--history",
+        type=Path,
+        default=None,
+        help="Benchmark an existing History database instead of generating one",
+    )
+    parser.add_argument(
+        "--no-trace-memory",
+        action="store_true",
+        help="Don't trace memory, which makes every stage noticeably faster",
+    )
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    # The generated database deliberately contains invalid timestamps, which
+    # are logged as errors for every row
+    logging.getLogger("akf_windows.server.chromium").setLevel(logging.CRITICAL)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        history_path = args.history
+        expected_dropped = None
+        if history_path is None:
+            history_path = Path(temp_dir) / "History"
+            stats = generate_history_db(
+                history_path, args.urls, args.visits, seed=args.seed
+            )
+            print(f"Generated {stats}")
+            expected_dropped = stats.invalid_timestamps
+
+        results = run_benchmark(
+            history_path,
+            trace_memory=not args.no_trace_memory,
+            expected_dropped=expected_dropped,
+        )
+
+    if args.json:
+        print(
+            json.dumps(
+                [asdict(r) | {"rows_per_second": r.rows_per_second} for r in results],
+                indent=2,
+            )
+        )
+    else:
+        print_results(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,360 @@
+"""
+Generate synthetic Chromium History databases for testing and benchmarking.
+
+The generated database uses the same schema as the History database of a recent
+version of Chromium (tables, columns, defaults and indexes), so it can be read by
+anything that reads a real History file. No browser is needed.
+
+Usage:
+    python benchmarks/history_db.py History --urls 100000 --visits 500000
+"""
+
+import argparse
+import itertools
+import random
+import sqlite3
+import sys
+from array import array
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator
+
+# Difference between Chromium's epoch (1601-01-01) and the Unix epoch, in seconds.
+CHROMIUM_EPOCH_OFFSET = 11644473600
+
+# The History schema version written to the `meta` table.
+HISTORY_SCHEMA_VERSION = 69
+
+# The schema of the tables read by AKF, as created by Chromium.
+HISTORY_SCHEMA = """
+CREATE TABLE meta(
+    key LONGVARCHAR NOT NULL UNIQUE PRIMARY KEY,
+    value LONGVARCHAR
+);
+CREATE TABLE urls(
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url LONGVARCHAR,
+    title LONGVARCHAR,
+    visit_count INTEGER DEFAULT 0 NOT NULL,
+    typed_count INTEGER DEFAULT 0 NOT NULL,
+    last_visit_time INTEGER NOT NULL,
+    hidden INTEGER DEFAULT 0 NOT NULL
+);
+CREATE TABLE visits(
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url INTEGER NOT NULL,
+    visit_time INTEGER NOT NULL,
+    from_visit INTEGER,
+    transition INTEGER DEFAULT 0 NOT NULL,
+    segment_id INTEGER,
+    visit_duration INTEGER DEFAULT 0 NOT NULL,
+    incremented_omnibox_typed_score BOOLEAN DEFAULT FALSE NOT NULL,
+    opener_visit INTEGER,
+    originator_cache_guid TEXT,
+    originator_visit_id INTEGER,
+    originator_from_visit INTEGER,
+    originator_opener_visit INTEGER,
+    is_known_to_sync BOOLEAN DEFAULT FALSE NOT NULL,
+    consider_for_ntp_most_visited BOOLEAN DEFAULT FALSE NOT NULL,
+    external_referrer_url TEXT,
+    visited_link_id INTEGER,
+    app_id TEXT
+);
+CREATE TABLE keyword_search_terms(
+    keyword_id INTEGER NOT NULL,
+    url_id INTEGER NOT NULL,
+    term LONGVARCHAR NOT NULL,
+    normalized_term LONGVARCHAR NOT NULL
+);
+CREATE TABLE downloads(
+    id INTEGER PRIMARY KEY,
+    guid VARCHAR NOT NULL,
+    current_path LONGVARCHAR NOT NULL,
+    target_path LONGVARCHAR NOT NULL,
+    start_time INTEGER NOT NULL,
+    received_bytes INTEGER NOT NULL,
+    total_bytes INTEGER NOT NULL,
+    state INTEGER NOT NULL,
+    danger_type INTEGER NOT NULL,
+    interrupt_reason INTEGER NOT NULL,
+    hash BLOB NOT NULL,
+    end_time INTEGER NOT NULL,
+    opened INTEGER NOT NULL,
+    last_access_time INTEGER NOT NULL,
+    transient INTEGER NOT NULL,
+    referrer VARCHAR NOT NULL,
+    site_url VARCHAR NOT NULL,
+    embedder_download_data VARCHAR NOT NULL,
+    tab_url VARCHAR NOT NULL,
+    tab_referrer_url VARCHAR NOT NULL,
+    http_method VARCHAR NOT NULL,
+    by_ext_id VARCHAR NOT NULL,
+    by_ext_name VARCHAR NOT NULL,
+    by_web_app_id VARCHAR NOT NULL,
+    etag VARCHAR NOT NULL,
+    last_modified VARCHAR NOT NULL,
+    mime_type VARCHAR(255) NOT NULL,
+    original_mime_type VARCHAR(255) NOT NULL
+);
+CREATE TABLE downloads_url_chains(
+    id INTEGER NOT NULL,
+    chain_index INTEGER NOT NULL,
+    url LONGVARCHAR NOT NULL,
+    PRIMARY KEY (id, chain_index)
+);
+CREATE INDEX urls_url_index ON urls (url);
+CREATE INDEX visits_url_index ON visits (url);
+CREATE INDEX visits_from_index ON visits (from_visit);
+CREATE INDEX visits_time_index ON visits (visit_time);
+CREATE INDEX keyword_search_terms_index1 ON keyword_search_terms (keyword_id, normalized_term);
+CREATE INDEX keyword_search_terms_index2 ON keyword_search_terms (url_id);
+CREATE INDEX keyword_search_terms_index3 ON keyword_search_terms (term);
+"""
+
+# Chromium's "typed" page transition, used for visits that were typed into the
+# omnibox. Other visits use the "link" transition (0).
+TRANSITION_TYPED = 1
+
+# Timestamps that can't be converted to a datetime on any platform. The first
+# overflows the maximum year; the second falls before year 1. (Small negative
+# values aren't enough: -1 is 1600-12-31, which Linux converts happily.)
+INVALID_TIMESTAMPS = [2**63 - 1, -(2**62)]
+
+# Hosts and path segments that generated URLs are built from. A small set of
+# hosts makes the generated URLs about as repetitive as real browsing history.
+HOSTS = [
+    "www.google.com",
+    "www.bing.com",
+    "www.reddit.com",
+    "en.wikipedia.org",
+    "www.youtube.com",
+    "github.com",
+    "stackoverflow.com",
+    "www.bbc.co.uk",
+    "news.ycombinator.com",
+    "drive.google.com",
+]
+WORDS = [
+    "cats",
+    "weather",
+    "news",
+    "python",
+    "recipes",
+    "wallpaper",
+    "download",
+    "forensics",
+    "windows",
+    "music",
+]
+
+
+@dataclass
+class HistoryDBStats:
+    """
+    Summary of a generated History database.
+    """
+
+    path: Path
+    urls: int
+    visits: int
+    null_titles: int
+    invalid_timestamps: int
+    keyword_search_terms: int
+
+
+def to_chromium_timestamp(unix_timestamp: float) -> int:
+    """
+    Convert a Unix timestamp (in seconds) to a Chromium timestamp (microseconds
+    since 1601-01-01 UTC).
+    """
+    return int((unix_timestamp + CHROMIUM_EPOCH_OFFSET) * 1_000_000)
+
+
+def generate_url(rng: random.Random, url_id: int) -> tuple[str, str | None]:
+    """
+    Generate a unique URL and an optional search term that led to it.
+    """
+    host = rng.choice(HOSTS)
+    if host in ("www.google.com", "www.bing.com"):
+        term = " ".join(rng.sample(WORDS, 2))
+        return f"https://{host}/search?q={term.replace(' ', '+')}&id={url_id}", term
+
+    path = "/".join(rng.sample(WORDS, rng.randint(1, 3)))
+    return f"https://{host}/{path}/{url_id}", None
+
+
+def _batched(
+    iterable: Iterator[tuple[object, ...]], n: int
+) -> Iterator[list[tuple[object, ...]]]:
+    it = iter(iterable)
+    while batch := list(itertools.islice(it, n)):
+        yield batch
+
+
+def generate_history_db(
+    path: Path,
+    num_urls: int,
+    num_visits: int,
+    null_title_ratio: float = 0.1,
+    invalid_timestamp_ratio: float = 0.001,
+    days: int = 90,
+    end_time: float = 1_735_689_600.0,
+    seed: int = 0,
+    batch_size: int = 50_000,
+) -> HistoryDBStats:
+    """
+    Generate a synthetic Chromium History database.
+
+    Visits are spread evenly over the `days` days before `end_time`, and are
+    distributed between URLs with a Zipf-like skew, so a few URLs get most of
+    the visits (as with real browsing history). Each URL's visit_count,
+    typed_count and last_visit_time are consistent with its visits, except for
+    the URLs deliberately given invalid timestamps.
+
+    Memory use is proportional to `num_urls`, not `num_visits`, so databases
+    with millions of visits can be generated.
+
+    :param path: Where to write the database. Any existing file is replaced.
+    :param num_urls: The number of rows in the `urls` table.
+    :param num_visits: The number of rows in the `visits` table.
+    :param null_title_ratio: The fraction of URLs with a NULL title.
+    :param invalid_timestamp_ratio: The fraction of URLs with a last_visit_time
+        that can't be converted to a datetime.
+    :param days: The span of time that visits are spread over.
+    :param end_time: The Unix timestamp of the most recent visit.
+    :param seed: The seed for the random number generator.
+    :param batch_size: The number of rows inserted per transaction.
+    :return: A summary of the generated database.
+    """
+    if num_urls < 1:
+        raise ValueError("num_urls must be positive")
+
+    rng = random.Random(seed)
+    path.unlink(missing_ok=True)
+
+    conn = sqlite3.connect(path)
+    conn.executescript(HISTORY_SCHEMA)
+    conn.executemany(
+        "INSERT INTO meta (key, value) VALUES (?, ?)",
+        [
+            ("version", str(HISTORY_SCHEMA_VERSION)),
+            ("last_compatible_version", "16"),
+        ],
+    )
+
+    # Per-URL aggregates, indexed by URL ID - 1
+    visit_counts = array("q", bytes(8 * num_urls))
+    typed_counts = array("q", bytes(8 * num_urls))
+    last_visit_times = array("q", bytes(8 * num_urls))
+
+    # Zipf-like weights over URL IDs
+    cum_weights = list(itertools.accumulate(1 / (i + 1) for i in range(num_urls)))
+    url_ids = range(1, num_urls + 1)
+
+    start_time = end_time - days * 86400
+    interval = (end_time - start_time) / max(num_visits, 1)
+
+    def visit_rows() -> Iterator[tuple[object, ...]]:
+        for offset in range(0, num_visits, batch_size):
+            count = min(batch_size, num_visits - offset)
+            chosen = rng.choices(url_ids, cum_weights=cum_weights, k=count)
+            for i, url_id in enumerate(chosen, start=offset):
+                visit_time = to_chromium_timestamp(start_time + i * interval)
+                typed = rng.random() < 0.1
+                visit_counts[url_id - 1] += 1
+                typed_counts[url_id - 1] += typed
+                last_visit_times[url_id - 1] = visit_time
+                yield (
+                    url_id,
+                    visit_time,
+                    TRANSITION_TYPED if typed else 0,
+                    rng.randint(0, 120_000_000),
+                )
+
+    for batch in _batched(visit_rows(), batch_size):
+        conn.executemany(
+            "INSERT INTO visits (url, visit_time, transition, visit_duration) VALUES (?, ?, ?, ?)",
+            batch,
+        )
+        conn.commit()
+
+    null_titles = 0
+    invalid_timestamps = 0
+    search_terms: list[tuple[int, str]] = []
+
+    def url_rows() -> Iterator[tuple[object, ...]]:
+        nonlocal null_titles, invalid_timestamps
+
+        for url_id in url_ids:
+            url, term = generate_url(rng, url_id)
+            if term is not None:
+                search_terms.append((url_id, term))
+
+            title: str | None = f"Page {url_id}"
+            if rng.random() < null_title_ratio:
+                title = None
+                null_titles += 1
+
+            last_visit_time = last_visit_times[url_id - 1]
+            if rng.random() < invalid_timestamp_ratio:
+                last_visit_time = rng.choice(INVALID_TIMESTAMPS)
+                invalid_timestamps += 1
+
+            yield (
+                url_id,
+                url,
+                title,
+                visit_counts[url_id - 1],
+                typed_counts[url_id - 1],
+                last_visit_time,
+                # Chromium hides URLs that were never visited directly
+                int(visit_counts[url_id - 1] == 0),
+            )
+
+    for batch in _batched(url_rows(), batch_size):
+        conn.executemany(
+            "INSERT INTO urls (id, url, title, visit_count, typed_count, last_visit_time, hidden) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            batch,
+        )
+        conn.commit()
+
+    conn.executemany(
+        "INSERT INTO keyword_search_terms (keyword_id, url_id, term, normalized_term) VALUES (2, ?, ?, ?)",
+        [(url_id, term, term.lower()) for url_id, term in search_terms],
+    )
+    conn.commit()
+    conn.close()
+
+    return HistoryDBStats(
+        path=path,
+        urls=num_urls,
+        visits=num_visits,
+        null_titles=null_titles,
+        invalid_timestamps=invalid_timestamps,
+        keyword_search_terms=len(search_terms),
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("output", type=Path, help="Where to write the database")
+    parser.add_argument("--urls", type=int, default=10_000)
+    parser.add_argument("--visits", type=int, default=50_000)
+    parser.add_argument("--null-title-ratio", type=float, default=0.1)
+    parser.add_argument("--invalid-timestamp-ratio", type=float, default=0.001)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    stats = generate_history_db(
+        args.output,
+        args.urls,
+        args.visits,
+        null_title_ratio=args.null_title_ratio,
+        invalid_timestamp_ratio=args.invalid_timestamp_ratio,
+        seed=args.seed,
+    )
+    print(stats, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+Compare the result codecs on the CASE objects returned by the agent's largest
+calls.
+
+Builds the same objects that `WindowsArtifactService.exposed_collect_prefetch_dir`
+and `ChromiumService.exposed_get_history` return (WindowsPrefetch objects with
+their accessed files, and a URLHistory built from a synthetic History database),
+then reports the encoded size and the encode/decode time of each codec in
+`akf_windows.common.codec`. Runs on any platform; no browser is needed. The
+msgpack codec is only included if msgpack is installed.
+
+Usage:
+    python benchmarks/result_codecs.py --prefetch 500 --urls 100000 --visits 500000
+"""
+
+import argparse
+import json
+import logging
+import random
+import sqlite3
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any
+
+from caselib.uco.observable import (
+    File,
+    FileFacet,
+    WindowsPrefetch,
+    WindowsPrefetchFacet,
+)
+from history_db import generate_history_db
+
+from akf_windows.common.codec import CODECS, decode_result, encode_result
+from akf_windows.server.chromium import (
+    HISTORY_URLS_QUERY,
+    build_url_history,
+    row_to_history_entry,
+)
+
+
+@dataclass
+class CodecResult:
+    """
+    Measurements for a single codec on a single artifact type.
+    """
+
+    artifact: str
+    codec: str
+    objects: int
+    payload_bytes: int
+    encode_seconds: float
+    decode_seconds: float
+
+
+def make_prefetch_objects(
+    count: int, files_per_entry: int = 60, seed: int = 0
+) -> list[WindowsPrefetch]:
+    """
+    Build WindowsPrefetch objects shaped like those built by
+    `WindowsArtifactService._parse_single_prefetch_file`.
+    """
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    result: list[WindowsPrefetch] = []
+
+    for i in range(count):
+        executable = f"PROGRAM{i}.EXE"
+        directories = [
+            File(
+                hasFacet=[
+                    FileFacet(
+                        isDirectory=True,
+                        fileName=f"DIR{j}",
+                        filePath=f"\\WINDOWS\\SYSTEM32\\SUBDIR{rng.randrange(20)}",
+                    )
+                ]
+            )
+            for j in range(files_per_entry // 6)
+        ]
+        files = [
+            File(
+                hasFacet=[
+                    FileFacet(
+                        isDirectory=False,
+                        fileName=f"LIBRARY{rng.randrange(500)}.DLL",
+                        filePath="\\WINDOWS\\SYSTEM32",
+                    )
+                ]
+            )
+            for _ in range(files_per_entry)
+        ]
+        timestamps = sorted(
+            (start + timedelta(seconds=rng.randrange(10**7)) for _ in range(8)),
+            reverse=True,
+        )
+
+        facet = WindowsPrefetchFacet(
+            volume=None,
+            accessedDirectory=directories,
+            accessedFile=files,
+            firstRun=timestamps[-1],
+            lastRun=timestamps[0],
+            timesExecuted=rng.randrange(1, 200),
+            applicationFileName=executable,
+            prefetchHash=f"{rng.getrandbits(32):08X}",
+        )
+        result.append(WindowsPrefetch(hasFacet=[facet]))
+
+    return result
+
+
+def make_url_history(history_path: Path) -> Any:
+    """
+    Build the URLHistory object that `exposed_get_history` would return for a
+    History database.
+    """
+    conn = sqlite3.connect(history_path)
+    conn.row_factory = sqlite3.Row
+    rows = conn.execute(HISTORY_URLS_QUERY).fetchall()
+    conn.close()
+
+    entries = [row_to_history_entry(row) for row in rows]
+    return build_url_history("msedge", [e for e in entries if e is not None])
+
+
+def time_codec(
+    artifact: str, codec: str, obj: Any, objects: int, repeats: int
+) -> CodecResult:
+    # Take the best of several runs, to reduce noise from other processes
+    encode_seconds = decode_seconds = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        payload = encode_result(obj, codec)
+        encode_seconds = min(encode_seconds, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        decode_result(payload)
+        decode_seconds = min(decode_seconds, time.perf_counter() - start)
+
+    return CodecResult(
+        artifact=artifact,
+        codec=codec,
+        objects=objects,
+        payload_bytes=len(payload),
+        encode_seconds=encode_seconds,
+        decode_seconds=decode_seconds,
+    )
+
+
+def print_results(results: list[CodecResult]) -> None:
+    print(
+        f"{'artifact':<10}{'codec':<9}{'objects':>9}{'payload MiB':>13}"
+        f"{'encode s':>10}{'decode s':>10}"
+    )
+    for r in results:
+        print(
+            f"{r.artifact:<10}{r.codec:<9}{r.objects:>9}"
+            f"{r.payload_bytes / 2**20:>13.2f}{r.encode_seconds:>10.3f}"
+            f"{r.decode_seconds:>10.3f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--prefetch", type=int, default=500)
+    parser.add_argument("--urls", type=int, default=20_000)
+    parser.add_argument("--visits", type=int, default=100_000)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    # The generated database deliberately contains invalid timestamps, which
+    # are logged as errors for every row
+    logging.getLogger("akf_windows.server.chromium").setLevel(logging.CRITICAL)
+
+    artifacts: list[tuple[str, Any, int]] = [
+        (
+            "prefetch",
+            make_prefetch_objects(args.prefetch, seed=args.seed),
+            args.prefetch,
+        )
+    ]
+    with tempfile.TemporaryDirectory() as temp_dir:
+        history_path = Path(temp_dir) / "History"
+        generate_history_db(history_path, args.urls, args.visits, seed=args.seed)
+        artifacts.append(("history", make_url_history(history_path), args.urls))
+
+    results = [
+        time_codec(artifact, codec, obj, objects, args.repeats)
+        for artifact, obj, objects in artifacts
+        for codec in CODECS
+    ]
+
+    if args.json:
+        print(json.dumps([asdict(r) for r in results], indent=2))
+    else:
+        print_results(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -13,7 +13,6 @@ take a while.
 """
 
 import logging
-import random
 import sys
 import time
 from pathlib import Path
@@ -25,6 +24,7 @@ from akflib.rendering.objs import AKFBundle
 from akf_windows.api.artifacts import WindowsArtifactServiceAPI
 from akf_windows.api.autogui import PyAutoGuiServiceAPI
 from akf_windows.api.chromium import ChromiumServiceAPI
+from akf_windows.common.chromium import BrowsePlan, BrowseStep, WaitPolicy
 
 # Change this based on what you've named the resulting VirtualBox machine.
 MACHINE_NAME = "akf-windows-fsidi-2"
@@ -69,36 +69,61 @@ with ChromiumServiceAPI.auto_connect(vbox_obj.get_maintenance_ip()) as chromium_
         urls = [line.strip() for line in f.readlines()]
     chromium_service.kill_edge()
     chromium_service.set_browser("msedge")
-    page = chromium_service.browser.new_page()
-
-    # Visit these sites in order
-    for idx, url in enumerate(urls, start=1):
-        logger.info(f"Visiting {url} and generating screenshot")
-        page.goto(url)
-        page.screenshot(
-            path=f"C:/Users/user/Downloads/cat_page_{idx}.png", full_page=True
+
+    # Wait for each page to finish loading, then spend 45-75 seconds on it
+    wait = WaitPolicy(wait_until="networkidle", min_dwell=45, jitter=30)
+
+    # Visit these sites in order. The whole plan is run by the agent, so this
+    # is a single round-trip rather than one per page action.
+    plan = BrowsePlan(
+        steps=[
+            BrowseStep(
+                url=url,
+                wait=wait,
+                screenshot_path=f"C:/Users/user/Downloads/cat_page_{idx}.png",
+            )
+            for idx, url in enumerate(urls, start=1)
+        ]
+    )
+    browse_result = chromium_service.browse(plan)
+    for step in browse_result.steps:
+        logger.info(
+            f"{step.url} loaded in {step.navigation_seconds:.2f}s"
+            + (f" (failed: {step.error})" if step.error else "")
         )
-        time.sleep(60 + random.randint(-15, 15))
 
     # Now visit a suspicious looking link directly
     logger.info("Downloading ransomware")
     with ChromiumServiceAPI.auto_connect(
         vbox_obj.get_maintenance_ip()
     ) as chromium_service:
-        page.goto("https://www.google.com/search?q=free+cat+wallpapers")
-        page.goto("https://pastebin.com/2jHBY4R3")
-        page.goto(
-            "https://drive.google.com/file/d/1I9I8reRi4DzszpPvABbeS94gs9rLiypx/view?usp=sharing"
-        )
-        # Manually visit next page - we won't click on the link since it opens a new tab,
-        # but as far as artifacts go, the effect is the largely the same
-        page.goto(
-            "https://drive.usercontent.google.com/download?id=1I9I8reRi4DzszpPvABbeS94gs9rLiypx&export=download&authuser=0"
+        chromium_service.set_browser("msedge")
+        no_dwell = WaitPolicy(min_dwell=0)
+        plan = BrowsePlan(
+            steps=[
+                BrowseStep(
+                    url="https://www.google.com/search?q=free+cat+wallpapers",
+                    wait=no_dwell,
+                ),
+                BrowseStep(url="https://pastebin.com/2jHBY4R3", wait=no_dwell),
+                BrowseStep(
+                    url="https://drive.google.com/file/d/1I9I8reRi4DzszpPvABbeS94gs9rLiypx/view?usp=sharing",
+                    wait=no_dwell,
+                ),
+                # Manually visit next page - we won't click on the link since it opens a new tab,
+                # but as far as artifacts go, the effect is the largely the same
+                BrowseStep(
+                    url="https://drive.usercontent.google.com/download?id=1I9I8reRi4DzszpPvABbeS94gs9rLiypx&export=download&authuser=0",
+                    wait=no_dwell,
+                    download_selector="[type='submit']",
+                    download_dir=r"C:\Users\user\Downloads",
+                ),
+            ],
+            stop_on_error=True,
         )
-        with page.expect_download() as download_info:
-            page.locator("[type='submit']").click()
-            download = download_info.value
-            download.save_as(rf"C:\Users\user\Downloads\{download.suggested_filename}")
+        browse_result = chromium_service.browse(plan)
+        if browse_result.failed:
+            raise RuntimeError(f"Failed to download: {browse_result.failed[0].error}")
 
 # Now manually open Explorer to open the file - we can trivially execute this
 # through guest additions or by opening the command prompt since we know where
@@ -5,28 +5,63 @@ This class should be subclassed by all API classes for the Windows agent. It
 automatically connects to the base DispatchService as needed.
 """
 
+import atexit
+import json
 import logging
-from typing import ClassVar, Type, TypeVar
+import pickle
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, ClassVar, Iterator, Type, TypeVar
 
 from akflib.core.agents.client import AKFServiceAPI
 
+from akf_windows.common.codec import available_codecs, decode_result
+from akf_windows.common.compression import (
+    DEFAULT_THRESHOLD,
+    CompressionStats,
+    available_compressions,
+    decompress_result,
+)
+from akf_windows.common.dispatch import DEFAULT_INSTANCE, AgentStatus, ServiceStatus
+from akf_windows.common.metrics import CallMetrics
+
 logger = logging.getLogger(__name__)
 
+# The longest the dispatcher is asked to block for in a single call while waiting
+# for a service, which must stay below RPyC's `sync_request_timeout`.
+MAX_WAIT_CALL_SECONDS = 10.0
+
 T = TypeVar("T", bound="WindowsServiceAPI")
 
 
 class DispatchServiceAPI(AKFServiceAPI):
-    def start_service(self, service_name: str) -> int:
+    def start_service(self, service_name: str, instance: str = DEFAULT_INSTANCE) -> int:
         """
         Start a service by name. Return the port number allocated for the service.
+
+        :param service_name: The name of the service to start.
+        :param instance: The name of the instance to start. Each instance runs
+            in its own process, separate from other instances of the service.
         """
-        return self.rpyc_conn.root.start_service(service_name)  # type: ignore[no-any-return]
+        return self.rpyc_conn.root.start_service(service_name, instance)  # type: ignore[no-any-return]
 
-    def stop_service(self, service_name: str) -> None:
+    def stop_service(self, service_name: str, instance: str = DEFAULT_INSTANCE) -> None:
+        """
+        Stop an instance of a service by name.
         """
-        Stop a service by name.
+        self.rpyc_conn.root.stop_service(service_name, instance)
+
+    def pick_instance(self, service_name: str, max_instances: int = 1) -> str:
+        """
+        Pick the least-loaded instance of a service, which must then be started
+        with `start_service()`.
+
+        A new instance is chosen if every running instance has connections and
+        there are fewer than `max_instances` of them.
         """
-        self.rpyc_conn.root.stop_service(service_name)
+        return self.rpyc_conn.root.pick_instance(service_name, max_instances)  # type: ignore[no-any-return]
 
     def get_service_port(self, service_name: str) -> int:
         """
@@ -46,11 +81,73 @@ class DispatchServiceAPI(AKFServiceAPI):
         """
         return self.rpyc_conn.root.get_running_services()  # type: ignore[no-any-return]
 
+    def get_status(self) -> AgentStatus:
+        """
+        Get the status of the agent and every running service.
+        """
+        # The result is pickled, and must be unpickled to be used.
+        return pickle.loads(self.rpyc_conn.root.get_status())  # type: ignore[no-any-return]
+
+    def get_metrics(self, reset: bool = False) -> CallMetrics:
+        """
+        Get per-method call metrics for the dispatcher and every service: call
+        and error counts, latency histograms and result sizes. Use
+        `CallMetrics.summary()` to see which calls dominate.
+
+        :param reset: If True, clear the recorded metrics afterwards.
+        """
+        # The result is pickled, and must be unpickled to be used.
+        return pickle.loads(self.rpyc_conn.root.get_metrics(reset))  # type: ignore[no-any-return]
+
+    def wait_for_service(
+        self, service_name: str, timeout: float, instance: str = DEFAULT_INSTANCE
+    ) -> ServiceStatus:
+        """
+        Wait until a running service is accepting connections, it exits, or the
+        timeout expires, whichever comes first.
+
+        :param service_name: The name of the service, which must already have
+            been started.
+        :param timeout: The maximum number of seconds to wait for.
+        :param instance: The instance of the service to wait for.
+        :return: The status of the service. Its state is "starting" if the
+            timeout expired first.
+        """
+        timeout = min(timeout, MAX_WAIT_CALL_SECONDS)
+        # The result is pickled, and must be unpickled to be used.
+        return pickle.loads(  # type: ignore[no-any-return]
+            self.rpyc_conn.root.wait_for_service(service_name, timeout, instance)
+        )
+
+
+def iter_backoff(
+    initial: float = 0.25, maximum: float = 5.0, factor: float = 2.0
+) -> Iterator[float]:
+    """
+    Yield delays that grow exponentially up to a maximum, with jitter.
+
+    Each delay is picked at random between half and all of the current backoff,
+    so that several clients retrying at once don't stay in lockstep.
+    """
+    delay = initial
+    while True:
+        yield random.uniform(delay / 2, delay)
+        delay = min(delay * factor, maximum)
+
 
 class WindowsServiceAPI(AKFServiceAPI):
     # The name of the related subservice class.
     related_service: ClassVar[str]
 
+    # The pool this object was acquired from, if any (see `acquire()`), and the
+    # key it's pooled under.
+    pool: "ServiceConnectionPool | None" = None
+    pool_key: tuple[Any, ...] | None = None
+
+    # The compression stats of the last compressed result decoded by
+    # `decode_result()`.
+    last_compression_stats: CompressionStats | None = None
+
     def __init_subclass__(cls) -> None:
         """
         Check that subclasses have a related service declared.
@@ -65,38 +162,353 @@ class WindowsServiceAPI(AKFServiceAPI):
 
     @classmethod
     def auto_connect(
-        cls: Type[T], host: str, port: int = 18861, wait_until_ready: bool = True
+        cls: Type[T],
+        host: str,
+        port: int = 18861,
+        wait_until_ready: bool = True,
+        timeout: float | None = 300.0,
+        instance: str | None = DEFAULT_INSTANCE,
+        max_instances: int = 1,
     ) -> T:
         """
         Automatically connect to the corresponding subservice, assuming that the
         `DispatchService` is running on the default port.
 
+        The dispatcher is asked to start the service, then to report when it's
+        accepting connections. Attempts that fail because the agent isn't up yet
+        (e.g. the guest is still booting) are retried with exponential backoff
+        until the timeout expires.
+
         :param host: The host to connect to.
         :param port: The port to connect to. The default port is 18861, and should
             be used in nearly all cases.
-        :param wait_until_ready: If True, wait indefinitely until the port is
-            available.
+        :param wait_until_ready: If True, retry until the agent and service are
+            ready. If False, make a single attempt.
+        :param timeout: The maximum number of seconds to wait for. If None, wait
+            indefinitely.
+        :param instance: The instance of the service to connect to. Instances
+            run in separate processes, so they don't share state and don't
+            serialize each other's work. If None, the dispatcher picks the
+            least-loaded instance, starting a new one if all are busy.
+        :param max_instances: If `instance` is None, the maximum number of
+            instances of the service to run at once.
+        :raises TimeoutError: If the service isn't ready before the timeout.
+        :raises RuntimeError: If the service's process exits while starting.
         :return: An instance of the service API class.
         """
-        # If a timeout is specified, wait until the dispatch service port is
-        # available.
-        #
         # Attempting to connect to the agent as soon as the Guest Additions
         # runlevel is "desktop" may sometimes fail, as the agent needs some time
         # to get started.
+        start = time.monotonic()
+        backoff = iter_backoff()
+
+        def remaining() -> float:
+            if timeout is None:
+                return MAX_WAIT_CALL_SECONDS
+            return timeout - (time.monotonic() - start)
 
-        # Assumed port 18861
         while True:
             try:
                 logger.info(
                     f"Attempting to connect to the dispatch service at {host}:{port}"
                 )
                 with DispatchServiceAPI(host, port) as dispatch:
-                    port = dispatch.start_service(cls.related_service)
-                    logger.info(f"{cls.related_service} is running on port {port}")
-                    return cls(host, port)
-            except TimeoutError:
+                    # Stick with the same instance if it's still starting
+                    if instance is None:
+                        instance = dispatch.pick_instance(
+                            cls.related_service, max_instances
+                        )
+
+                    dispatch.start_service(cls.related_service, instance)
+                    status = dispatch.wait_for_service(
+                        cls.related_service, max(remaining(), 0), instance
+                    )
+
+                if status.state == "ready":
+                    logger.info(
+                        f"{cls.related_service} (instance {instance}) is running on "
+                        f"port {status.port}"
+                    )
+                    # The service may still go away before the connection is
+                    # made (e.g. if its process dies), in which case it's
+                    # restarted on the next attempt
+                    return cls._connect_ready(host, status.port)
+            except (OSError, EOFError) as e:
+                # OSError includes TimeoutError and ConnectionRefusedError, raised
+                # while the agent isn't listening yet. EOFError is raised if the
+                # agent closes the connection, e.g. while it's restarting.
+                if not wait_until_ready:
+                    raise TimeoutError(f"Agent unavailable: {e}") from e
+
+                logger.info(f"Agent unavailable ({e}), trying again")
+            else:
+                if status.state == "exited":
+                    raise RuntimeError(
+                        f"{cls.related_service} exited with code "
+                        f"{status.exit_code} while starting"
+                    )
+
                 if not wait_until_ready:
-                    raise TimeoutError("Dispatch service timed out")
+                    raise TimeoutError(f"{cls.related_service} is still starting")
+
+                logger.info(f"{cls.related_service} is still starting")
+                if remaining() > 0:
+                    # The dispatcher already waited, so there's no need to back off
+                    continue
+
+            delay = next(backoff)
+            if remaining() <= delay:
+                raise TimeoutError(
+                    f"{cls.related_service} was not ready after {timeout} seconds"
+                )
+            time.sleep(delay)
+
+    @classmethod
+    def _connect_ready(cls: Type[T], host: str, port: int) -> T:
+        # Connect to a service that has reported it's ready, and negotiate how
+        # results are encoded. The connection is closed if negotiation fails.
+        api = cls(host, port)
+        try:
+            api.negotiate_codec()
+            api.negotiate_compression()
+        except BaseException:
+            api.rpyc_conn.close()
+            raise
+        return api
+
+    def negotiate_codec(self) -> str:
+        """
+        Ask the service to encode large results with the most compact codec
+        available on both sides. Called by `auto_connect()`; connections made
+        directly get pickled results.
+
+        :return: The name of the codec the service will use.
+        """
+        codec: str = self.rpyc_conn.root.negotiate_codec(json.dumps(available_codecs()))
+        logger.debug(f"{self.related_service} will encode results with {codec}")
+        return codec
+
+    def negotiate_compression(
+        self, threshold: int = DEFAULT_THRESHOLD, enabled: bool = True
+    ) -> str | None:
+        """
+        Ask the service to compress large results with the preferred algorithm
+        available on both sides. Called by `auto_connect()`; connections made
+        directly get uncompressed results.
+
+        :param threshold: The size in bytes of the smallest encoded result to
+            compress. Smaller results are quicker to send as-is.
+        :param enabled: If False, turn compression off for this connection.
+        :return: The name of the algorithm the service will use, or None if
+            results won't be compressed.
+        """
+        algorithms = available_compressions() if enabled else []
+        algorithm: str | None = self.rpyc_conn.root.negotiate_compression(
+            json.dumps(algorithms), threshold
+        )
+        logger.debug(f"{self.related_service} will compress results with {algorithm}")
+        return algorithm
+
+    def decode_result(self, result: Any) -> Any:
+        """
+        Decode a result returned by the service's `encode_result()`,
+        decompressing it first if the service compressed it.
+
+        The compression stats of compressed results are logged and kept in
+        `last_compression_stats`.
+        """
+        if isinstance(result, bytes):
+            return decode_result(result)
+
+        data, stats = decompress_result(result)
+        self.last_compression_stats = stats
+        logger.debug(f"{self.related_service} result compressed with {stats.summary()}")
+        return decode_result(data)
+
+    @classmethod
+    def acquire(cls: Type[T], host: str, port: int = 18861, **kwargs: Any) -> T:
+        """
+        Get a connection to the corresponding subservice from the process-wide
+        connection pool, connecting with `auto_connect()` if there isn't a
+        healthy idle one.
+
+        Return the object to the pool with `release()` (or by using it as a
+        context manager) instead of closing its connection, so that later
+        callers can reuse it.
+
+        :param host: The host to connect to.
+        :param port: The port of the dispatch service.
+        :param kwargs: Passed to `auto_connect()`.
+        """
+        return connection_pool.acquire(cls, host, port, **kwargs)
+
+    def release(self) -> None:
+        """
+        Return this object to the pool it was acquired from, or close its
+        connection if it wasn't acquired from a pool.
+        """
+        self.reset()
+        if self.pool is not None:
+            self.pool.release(self)
+        else:
+            self.rpyc_conn.close()
+
+    def reset(self) -> None:
+        """
+        Clean up any host-side state before this object is released or closed,
+        so that it can be reused by another caller.
+        """
+
+    def __exit__(self, *args: Any) -> Any:
+        if self.pool is not None:
+            return self.release()
+
+        self.reset()
+        return super().__exit__(*args)
+
+
+class ServiceConnectionPool:
+    """
+    A pool of service API objects, keyed by the host, the dispatch service port,
+    the service and the arguments used to connect.
+
+    Connecting to a service means connecting to the dispatch service, asking it
+    for the service's port, then connecting to the service, each with its own
+    RPyC handshake. Reusing connections means that paying this once per scenario
+    is enough.
+
+    Idle connections are checked with a ping before they're handed out, and are
+    closed once they've been idle for `idle_timeout` seconds.
+    """
+
+    def __init__(self, idle_timeout: float = 300.0, ping_timeout: float = 5.0) -> None:
+        """
+        :param idle_timeout: How long connections can be idle before they're
+            closed, in seconds.
+        :param ping_timeout: How long to wait for an idle connection to answer a
+            ping before treating it as dead, in seconds.
+        """
+        self.idle_timeout = idle_timeout
+        self.ping_timeout = ping_timeout
+
+        self._lock = threading.Lock()
+
+        # Set by `close_all()`, after which released connections are closed
+        # instead of being pooled
+        self._closed = False
+
+        # Idle objects, most recently released last, with the time they were
+        # released
+        self._idle: dict[tuple[Any, ...], list[tuple[WindowsServiceAPI, float]]] = {}
+
+    def acquire(
+        self, api_class: Type[T], host: str, port: int = 18861, **kwargs: Any
+    ) -> T:
+        """
+        Get a healthy connection to a service, reusing an idle one if possible.
+
+        :param api_class: The API class of the service.
+        :param host: The host to connect to.
+        :param port: The port of the dispatch service.
+        :param kwargs: Passed to `auto_connect()`.
+        """
+        key = (api_class, host, port, tuple(sorted(kwargs.items())))
+        self.close_idle()
+
+        while True:
+            with self._lock:
+                idle = self._idle.get(key)
+                if not idle:
+                    break
+                api, _ = idle.pop()
+
+            if self._is_healthy(api):
+                logger.debug(f"Reusing pooled {api_class.__name__} connection")
+                return api  # type: ignore[return-value]
+
+            # Closing sends a request to the other side, which could block
+            # until RPyC's timeout if it's unresponsive rather than gone
+            logger.info(f"Discarding dead pooled {api_class.__name__} connection")
+            threading.Thread(target=self._close, args=(api,), daemon=True).start()
+
+        api = api_class.auto_connect(host, port, **kwargs)
+        api.pool = self
+        api.pool_key = key
+        return api
+
+    def release(self, api: WindowsServiceAPI) -> None:
+        """
+        Return a connection to the pool.
+        """
+        if api.pool is self and api.pool_key is not None and not api.rpyc_conn.closed:
+            with self._lock:
+                if not self._closed:
+                    self._idle.setdefault(api.pool_key, []).append(
+                        (api, time.monotonic())
+                    )
+                    return
+
+        # The connection was closed by the caller, isn't from this pool, or the
+        # pool has been closed
+        self._close(api)
+
+    @contextmanager
+    def connection(
+        self, api_class: Type[T], host: str, port: int = 18861, **kwargs: Any
+    ) -> Iterator[T]:
+        """
+        Acquire a connection for the duration of a `with` block.
+        """
+        api = self.acquire(api_class, host, port, **kwargs)
+        try:
+            yield api
+        finally:
+            api.release()
+
+    def close_idle(self, max_idle: float | None = None) -> None:
+        """
+        Close connections that have been idle for longer than `max_idle`
+        seconds (by default, the pool's `idle_timeout`).
+        """
+        if max_idle is None:
+            max_idle = self.idle_timeout
+
+        cutoff = time.monotonic() - max_idle
+        expired: list[WindowsServiceAPI] = []
+        with self._lock:
+            for idle in self._idle.values():
+                expired += [api for api, released in idle if released <= cutoff]
+                idle[:] = [(api, t) for api, t in idle if t > cutoff]
+
+        for api in expired:
+            self._close(api)
+
+    def close_all(self) -> None:
+        """
+        Close every idle connection. Connections that are in use are closed when
+        they're released, rather than being returned to the pool.
+        """
+        with self._lock:
+            self._closed = True
+        self.close_idle(max_idle=-1)
+
+    def _is_healthy(self, api: WindowsServiceAPI) -> bool:
+        if api.rpyc_conn.closed:
+            return False
+
+        try:
+            api.rpyc_conn.ping(timeout=self.ping_timeout)
+        except Exception:
+            return False
+        return True
+
+    def _close(self, api: WindowsServiceAPI) -> None:
+        try:
+            api.rpyc_conn.close()
+        except Exception as e:
+            logger.debug(f"Failed to close {type(api).__name__} connection: {e}")
+
 
-                logger.info("Dispatch service timed out, trying again")
+# The process-wide connection pool used by `WindowsServiceAPI.acquire()`
+connection_pool = ServiceConnectionPool()
+atexit.register(connection_pool.close_all)
@@ -0,0 +1,297 @@
+"""
+Asyncio counterparts of the service APIs.
+
+The service APIs are blocking, so driving several agents at once otherwise needs
+a thread per agent. Each async API object wraps a blocking one and runs its
+calls on a thread dedicated to that connection, leaving the event loop free to
+drive other connections in the meantime:
+
+    async def collect(host: str) -> URLHistory:
+        async with await AsyncChromiumServiceAPI.auto_connect(host) as chromium:
+            await chromium.set_browser("msedge")
+            return await chromium.get_history("msedge")
+
+    histories = await asyncio.gather(*(collect(host) for host in hosts))
+
+Calls on the same connection run one at a time, in the order they're made. They
+always run on the same thread, because Playwright objects (such as the context
+returned by `connect_over_cdp()`) can only be used from the thread that created
+them. Netrefs and Playwright objects returned by a call are blocking as well;
+use `run()` to call them off the event loop. Cancelling a call stops the caller
+from waiting for it, but not the call itself.
+"""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    ClassVar,
+    Generic,
+    Literal,
+    Self,
+    TypeVar,
+)
+
+from akflib.core.agents.client import AKFServiceAPI
+from caselib.uco.observable import URLHistoryEntry
+
+from akf_windows.api._base import DispatchServiceAPI, WindowsServiceAPI
+from akf_windows.api.artifacts import WindowsArtifactServiceAPI
+from akf_windows.api.autogui import PyAutoGuiServiceAPI
+from akf_windows.api.chromium import (
+    DEFAULT_HISTORY_PAGE_SIZE,
+    ChromiumServiceAPI,
+    ConcurrentChromiumServiceAPI,
+)
+
+S = TypeVar("S", bound=AKFServiceAPI)
+W = TypeVar("W", bound=WindowsServiceAPI)
+R = TypeVar("R")
+
+
+def _delegate(func: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Make an async method that runs the blocking API's method of the same name
+    on the connection's thread. The docstring of the blocking method is kept.
+    """
+
+    # Looked up by name on the wrapped object, so that overrides in subclasses
+    # of the blocking API are used
+    @functools.wraps(func)
+    async def method(self: "AsyncServiceAPI[Any]", *args: Any, **kwargs: Any) -> Any:
+        return await self.run(getattr(self.api, func.__name__), *args, **kwargs)
+
+    return method
+
+
+class AsyncServiceAPI(Generic[S]):
+    """
+    Base class for the async service APIs, which wrap a blocking service API.
+
+    The blocking API object is available as `api`, e.g. to get netrefs such as
+    `api.browser` to pass to `run()`.
+    """
+
+    def __init__(self, api: S, executor: ThreadPoolExecutor) -> None:
+        self.api = api
+        self._executor = executor
+
+    @classmethod
+    async def _create(cls, factory: Callable[[], S]) -> Self:
+        # The blocking API object is created on the thread it'll be used from
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="akf-aio")
+        try:
+            loop = asyncio.get_running_loop()
+            api = await loop.run_in_executor(executor, factory)
+        except BaseException:
+            executor.shutdown(wait=False)
+            raise
+
+        return cls(api, executor)
+
+    async def run(self, func: Callable[..., R], *args: Any, **kwargs: Any) -> R:
+        """
+        Call a blocking function on this connection's thread, after any calls
+        already made on the connection.
+
+        :param func: The function to call, e.g. a method of a netref.
+        :return: The function's return value.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(func, *args, **kwargs)
+        )
+
+    async def close(self) -> None:
+        """
+        Close the connection, as the blocking API's context manager would.
+        """
+        await self.__aexit__(None, None, None)
+
+    async def __aenter__(self) -> Self:
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        try:
+            await self.run(self.api.__exit__, *args)
+        finally:
+            self._executor.shutdown(wait=False)
+
+
+class AsyncDispatchServiceAPI(AsyncServiceAPI[DispatchServiceAPI]):
+    """
+    The async counterpart of `DispatchServiceAPI`.
+    """
+
+    @classmethod
+    async def connect(cls, host: str, port: int = 18861) -> Self:
+        """
+        Connect to the dispatch service.
+
+        :param host: The host to connect to.
+        :param port: The port of the dispatch service.
+        """
+        return await cls._create(functools.partial(DispatchServiceAPI, host, port))
+
+    start_service = _delegate(DispatchServiceAPI.start_service)
+    stop_service = _delegate(DispatchServiceAPI.stop_service)
+    pick_instance = _delegate(DispatchServiceAPI.pick_instance)
+    get_service_port = _delegate(DispatchServiceAPI.get_service_port)
+    get_available_services = _delegate(DispatchServiceAPI.get_available_services)
+    get_running_services = _delegate(DispatchServiceAPI.get_running_services)
+    get_status = _delegate(DispatchServiceAPI.get_status)
+    get_metrics = _delegate(DispatchServiceAPI.get_metrics)
+    wait_for_service = _delegate(DispatchServiceAPI.wait_for_service)
+
+
+class AsyncWindowsServiceAPI(AsyncServiceAPI[W]):
+    """
+    Base class for the async counterparts of `WindowsServiceAPI` subclasses.
+    """
+
+    # The blocking API class that this class wraps.
+    api_class: ClassVar[type[WindowsServiceAPI]]
+
+    @classmethod
+    async def connect(cls, host: str, port: int) -> Self:
+        """
+        Connect directly to a service that's already running on a known port.
+
+        :param host: The host to connect to.
+        :param port: The port of the service.
+        """
+        return await cls._create(functools.partial(cls.api_class, host, port))
+
+    @classmethod
+    async def auto_connect(cls, host: str, port: int = 18861, **kwargs: Any) -> Self:
+        """
+        Connect to the corresponding subservice, starting it if needed. Waiting
+        for the agent and the service doesn't block the event loop.
+
+        :param host: The host to connect to.
+        :param port: The port of the dispatch service.
+        :param kwargs: Passed to `WindowsServiceAPI.auto_connect()`.
+        """
+        return await cls._create(
+            functools.partial(cls.api_class.auto_connect, host, port, **kwargs)
+        )
+
+    @classmethod
+    async def acquire(cls, host: str, port: int = 18861, **kwargs: Any) -> Self:
+        """
+        Get a connection to the corresponding subservice from the process-wide
+        connection pool (see `WindowsServiceAPI.acquire()`). Leaving the async
+        context manager returns it to the pool.
+
+        :param host: The host to connect to.
+        :param port: The port of the dispatch service.
+        :param kwargs: Passed to `WindowsServiceAPI.auto_connect()`.
+        """
+        return await cls._create(
+            functools.partial(cls.api_class.acquire, host, port, **kwargs)
+        )
+
+    async def release(self) -> None:
+        """
+        Return the connection to the pool it was acquired from, or close it if
+        it wasn't acquired from a pool.
+        """
+        try:
+            await self.run(self.api.release)
+        finally:
+            self._executor.shutdown(wait=False)
+
+    negotiate_codec = _delegate(WindowsServiceAPI.negotiate_codec)
+    negotiate_compression = _delegate(WindowsServiceAPI.negotiate_compression)
+
+
+class AsyncChromiumServiceAPI(AsyncWindowsServiceAPI[ChromiumServiceAPI]):
+    """
+    The async counterpart of `ChromiumServiceAPI`.
+
+    Pages and other objects from `api.browser`, or from the context returned by
+    `connect_over_cdp()`, are blocking; use them through `run()`, e.g.
+    `page = await chromium.run(chromium.api.browser.new_page)`.
+    """
+
+    api_class = ChromiumServiceAPI
+
+    async def iter_history(
+        self,
+        browser_type: Literal["chrome", "msedge"],
+        history_path: Path | None = None,
+        page_size: int = DEFAULT_HISTORY_PAGE_SIZE,
+    ) -> AsyncIterator[list[URLHistoryEntry]]:
+        """
+        Iterate over browser history entries for the specified browser, one page
+        at a time (see `ChromiumServiceAPI.iter_history()`).
+
+        :param browser_type: Type of browser to retrieve history from ("chrome" or "msedge")
+        :param history_path: Path to the browser history file. If None, defaults
+            to the standard location for the specified browser.
+        :param page_size: The maximum number of entries in each page.
+        :return: An async iterator of lists of URLHistoryEntry objects.
+        """
+        pages = self.api.iter_history(browser_type, history_path, page_size)
+        try:
+            while (entries := await self.run(next, pages, None)) is not None:
+                yield entries
+        finally:
+            # Releases the snapshot on the agent if iteration stopped early
+            await self.run(pages.close)
+
+    set_browser = _delegate(ChromiumServiceAPI.set_browser)
+    connect_over_cdp = _delegate(ChromiumServiceAPI.connect_over_cdp)
+    close_cdp = _delegate(ChromiumServiceAPI.close_cdp)
+    goto = _delegate(ChromiumServiceAPI.goto)
+    visit_urls = _delegate(ChromiumServiceAPI.visit_urls)
+    browse = _delegate(ChromiumServiceAPI.browse)
+    start_har = _delegate(ChromiumServiceAPI.start_har)
+    stop_har = _delegate(ChromiumServiceAPI.stop_har)
+    screenshot = _delegate(ChromiumServiceAPI.screenshot)
+    close_browsers = _delegate(ChromiumServiceAPI.close_browsers)
+    kill_edge = _delegate(ChromiumServiceAPI.kill_edge)
+    save_profile_state = _delegate(ChromiumServiceAPI.save_profile_state)
+    restore_profile_state = _delegate(ChromiumServiceAPI.restore_profile_state)
+    list_profile_states = _delegate(ChromiumServiceAPI.list_profile_states)
+    delete_profile_state = _delegate(ChromiumServiceAPI.delete_profile_state)
+    get_stats = _delegate(ChromiumServiceAPI.get_stats)
+    get_history = _delegate(ChromiumServiceAPI.get_history)
+    collect_artifacts = _delegate(ChromiumServiceAPI.collect_artifacts)
+    collect_artifacts_for_profiles = _delegate(
+        ChromiumServiceAPI.collect_artifacts_for_profiles
+    )
+
+
+class AsyncConcurrentChromiumServiceAPI(AsyncChromiumServiceAPI):
+    """
+    The async counterpart of `ConcurrentChromiumServiceAPI`.
+    """
+
+    api_class = ConcurrentChromiumServiceAPI
+
+
+class AsyncPyAutoGuiServiceAPI(AsyncWindowsServiceAPI[PyAutoGuiServiceAPI]):
+    """
+    The async counterpart of `PyAutoGuiServiceAPI`.
+
+    The remote pyautogui module is blocking; use it through `run()`, e.g.
+    `await autogui.run(autogui.api.pyautogui.hotkey, "win", "r")`.
+    """
+
+    api_class = PyAutoGuiServiceAPI
+
+
+class AsyncWindowsArtifactServiceAPI(AsyncWindowsServiceAPI[WindowsArtifactServiceAPI]):
+    """
+    The async counterpart of `WindowsArtifactServiceAPI`.
+    """
+
+    api_class = WindowsArtifactServiceAPI
+
+    collect_prefetch_file = _delegate(WindowsArtifactServiceAPI.collect_prefetch_file)
+    collect_prefetch_dir = _delegate(WindowsArtifactServiceAPI.collect_prefetch_dir)
@@ -3,7 +3,6 @@ The API for the RPyC service that locates and collects Windows artifacts,
 constructing and returning CASE objects.
 """
 
-import pickle
 from pathlib import Path
 
 from caselib.uco.observable import WindowsPrefetch
@@ -52,7 +51,7 @@ class WindowsArtifactServiceAPI(WindowsServiceAPI):
         :param glob: The glob pattern to use for finding prefetch files.
         :return: A list of WindowsPrefetch objects representing the prefetch files.
         """
-        # This returns a pickled object that needs to be deserialized.
+        # This returns an encoded object that needs to be decoded.
         temp_result = self.rpyc_conn.root.collect_prefetch_dir(prefetch_folder, glob)
 
         # Some RPyC netref weirdness means we have to convert these to "acutal"
@@ -60,7 +59,7 @@ class WindowsArtifactServiceAPI(WindowsServiceAPI):
         # model serializer in caselib to allow for conversion between the
         # Pydantic and not-Pydantic versions of the object, though that's not a
         # trivial fix.
-        return pickle.loads(temp_result)  # type: ignore[no-any-return]
+        return self.decode_result(temp_result)  # type: ignore[no-any-return]
 
 
 if __name__ == "__main__":
@@ -23,7 +23,7 @@ class PyAutoGuiServiceAPI(WindowsServiceAPI):
     instance attribute. Note that because pyautogui is a module, all connections
     to the same service will "share" the same resources/configuration. You can
     spin up multiple instances of this service to have separate configurations.
-    You can do this by simply calling `start_service()` on the dispatch service.
+    You can do this by passing a different `instance` to `auto_connect()`.
 
     You can freely interact with the remote browser instance using the `browser`
     instance attribute.
@@ -2,15 +2,55 @@
 The API for the RPyC service exposing Microsoft Edge.
 """
 
-import pickle
+import logging
+import queue
+import random
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import UTC, datetime
 from pathlib import Path
-from typing import Literal
+from typing import Iterable, Iterator, Literal
 
-from caselib.uco.observable import URLHistory
-from playwright.sync_api import BrowserContext
+import rpyc
+from caselib.uco.observable import (
+    Application,
+    ApplicationFacet,
+    URLHistory,
+    URLHistoryEntry,
+    URLHistoryFacet,
+)
+from playwright.sync_api import (
+    Browser,
+    BrowserContext,
+    Page,
+    Playwright,
+    sync_playwright,
+)
 
 from akf_windows.api._base import WindowsServiceAPI
+from akf_windows.common.chromium import (
+    ALL_CHROMIUM_ARTIFACTS,
+    BrowsePlan,
+    BrowseResult,
+    ChromiumArtifacts,
+    ChromiumArtifactType,
+    HarOptions,
+    NavigationTiming,
+    ProfileStateStats,
+    ScreenshotFormat,
+    URLVisit,
+    WaitPolicy,
+)
+from akf_windows.common.timing import TimingStats
+
+logger = logging.getLogger(__name__)
+
+# The default number of history entries transferred per round-trip.
+DEFAULT_HISTORY_PAGE_SIZE = 1000
+
+# The default number of screenshot bytes transferred per round-trip.
+DEFAULT_SCREENSHOT_CHUNK_SIZE = 1024 * 1024
 
 
 class ChromiumServiceAPI(WindowsServiceAPI):
@@ -29,17 +69,50 @@ class ChromiumServiceAPI(WindowsServiceAPI):
 
     def __init__(self, host: str, port: int) -> None:
         super().__init__(host, port)
+        self.host = host
 
         # Expose the browser context that's created on connection
         self.browser: BrowserContext = self.rpyc_conn.root.browser
 
+        # The host-side Playwright instance and browser used by
+        # `connect_over_cdp()`, if it has been called
+        self.cdp_playwright: Playwright | None = None
+        self.cdp_browser: Browser | None = None
+
+    def reset(self) -> None:
+        """
+        Return this connection to the state of a new one before it's released
+        to the connection pool or closed.
+
+        The host is disconnected from the browser connected to with
+        `connect_over_cdp()`. On the agent, any HAR recording or replay is
+        stopped (writing a recorded archive), and the browser context leased by
+        this connection is released; it's kept warm for the next caller, who
+        must call `set_browser()` again. History reads and screenshots that
+        weren't read to the end are discarded.
+        """
+        self.close_cdp()
+        self.browser = None  # type: ignore[assignment]
+        if self.rpyc_conn.closed:
+            return
+
+        try:
+            self.rpyc_conn.root.reset()
+        except Exception as e:
+            # The connection can't be reused in an unknown state, so it's
+            # closed instead of being returned to the pool
+            logger.warning(f"Could not reset {self.related_service}: {e}")
+            self.rpyc_conn.close()
+
     def set_browser(
         self, browser_type: Literal["msedge", "chrome"], profile: str = "Default"
     ) -> BrowserContext:
         """
         Set the browser to use for this service.
 
-        If the browser is currently open, it will be closed.
+        Browser contexts are kept open by the agent between connections, so if
+        this browser and profile is already running, this re-attaches to it
+        almost instantly instead of launching a new browser.
 
         :param browser: The browser to use (which corresponds to the distribution
             channel).
@@ -49,6 +122,354 @@ class ChromiumServiceAPI(WindowsServiceAPI):
         self.browser = self.rpyc_conn.root.set_browser(browser_type, profile)
         return self.browser
 
+    def connect_over_cdp(
+        self, browser_type: Literal["msedge", "chrome"], profile: str = "Default"
+    ) -> BrowserContext:
+        """
+        Connect to a browser on the agent directly over the Chrome DevTools
+        Protocol (CDP), using a Playwright instance on the host.
+
+        Playwright objects returned by this method are local objects rather
+        than RPyC netrefs, so calls on them go straight to the browser instead
+        of through RPyC and the agent's own Playwright instance. This is much
+        faster for scripts that make many small calls (see
+        `benchmarks/cdp_latency.py`).
+
+        The browser is relaunched on the agent if it's running without a
+        remote debugging port, and becomes the browser used by this connection
+        (so `browser` refers to the same context, as a netref). This requires
+        the Playwright package on the host, but not its browsers.
+
+        :param browser_type: The browser to use (which corresponds to the
+            distribution channel).
+        :param profile: The profile to use for the browser. Defaults to "Default".
+        :return: The browser's default context, which is the persistent context
+            for the profile.
+        """
+        self.close_cdp()
+
+        port, path = self.rpyc_conn.root.get_cdp_endpoint(browser_type, profile)
+        self.browser = self.rpyc_conn.root.browser
+
+        endpoint = f"ws://{self.host}:{port}{path}"
+        logger.info(f"Connecting to {endpoint}")
+
+        self.cdp_playwright = sync_playwright().start()
+        self.cdp_browser = self.cdp_playwright.chromium.connect_over_cdp(endpoint)
+        return self.cdp_browser.contexts[0]
+
+    def close_cdp(self) -> None:
+        """
+        Disconnect the host from the browser connected to with
+        `connect_over_cdp()`. The browser itself is left running on the agent.
+        """
+        if self.cdp_browser is not None:
+            self.cdp_browser.close()
+            self.cdp_browser = None
+
+        if self.cdp_playwright is not None:
+            self.cdp_playwright.stop()
+            self.cdp_playwright = None
+
+    def goto(self, page: Page, url: str, wait: WaitPolicy | None = None) -> URLVisit:
+        """
+        Navigate a page to a URL and wait for it to become ready.
+
+        Errors raised while navigating, such as the page not becoming ready
+        within `wait.max_timeout`, are logged and recorded in the result rather
+        than raised, so that one slow page doesn't abort a whole scenario. The
+        page is left as it is, so it may still be loading.
+
+        This only waits for the page itself; use `WaitPolicy.sample_dwell()` to
+        get how long to then stay on the page.
+
+        :param page: The page to navigate, e.g. from `browser.new_page()`.
+        :param url: The URL to visit.
+        :param wait: The page state to wait for and how long to wait for it.
+            Defaults to waiting for the `load` event for up to 30 seconds.
+        :return: The outcome of the visit. `navigation_seconds` is the time
+            taken for the page to become ready (or to fail), `error` is set if
+            it failed, and `index`, `page` and `dwell_seconds` are 0.
+        """
+        if wait is None:
+            wait = WaitPolicy()
+
+        error: str | None = None
+        started = datetime.now(UTC)
+        start = time.perf_counter()
+        try:
+            page.goto(url, **wait.goto_kwargs())
+        except Exception as e:
+            logger.warning(f"Failed to visit {url}: {e}")
+            error = str(e)
+        navigation_seconds = time.perf_counter() - start
+
+        return URLVisit(
+            index=0,
+            url=url,
+            page=0,
+            started=started,
+            navigation_seconds=navigation_seconds,
+            dwell_seconds=0.0,
+            timing=NavigationTiming.from_page(page) if error is None else None,
+            error=error,
+        )
+
+    def visit_urls(
+        self,
+        urls: list[str],
+        wait_time: int = 5,
+        jitter: int = 0,
+        concurrency: int = 1,
+        ordered: bool = True,
+        wait: WaitPolicy | None = None,
+    ) -> list[URLVisit]:
+        """
+        Visit a list of URLs in the current browser, optionally across several
+        pages (tabs) at once.
+
+        If `wait` is given, each navigation waits for the page to reach the
+        policy's ready state, and the page is then left open for the policy's
+        dwell time before moving on to the next URL. Otherwise, each URL is
+        visited and then left open for `wait_time` seconds (plus or minus up to
+        `jitter` seconds, and never less than 1 second).
+
+        With `concurrency` greater than 1, that many pages work through the list
+        in parallel, so their page loads and waits overlap. If `ordered`, each
+        navigation starts once the previous one has committed (so the browser
+        has recorded the visit), and the rest of the page load overlaps with the
+        next navigation. `ChromiumService` runs Playwright calls one at a time,
+        so page loads only overlap with `ConcurrentChromiumServiceAPI`.
+
+        Errors raised while visiting a URL are logged and recorded in the
+        returned URLVisit, and do not stop the remaining URLs from being visited.
+
+        `set_browser()` must be called first.
+
+        :param urls: The URLs to visit.
+        :param wait_time: The time to leave each page open, in seconds.
+        :param jitter: The maximum random variation of `wait_time`, in seconds.
+        :param concurrency: The number of pages to visit URLs with at once.
+        :param ordered: If True, navigations are started in the order of `urls`,
+            so the visit times recorded in the browser's history have the same
+            order as the list. If False, each page moves on as soon as it's done.
+        :param wait: The policy for waiting on each page. If given, `wait_time`
+            and `jitter` are ignored.
+        :return: A URLVisit for each URL, in the order of `urls`.
+        """
+        if self.browser is None:
+            raise RuntimeError("No browser is open; call set_browser() first")
+        if concurrency < 1:
+            raise ValueError(f"concurrency must be positive, got {concurrency}")
+
+        concurrency = min(concurrency, len(urls)) or 1
+        pages: list[Page] = [self.browser.new_page() for _ in range(concurrency)]
+
+        work: queue.SimpleQueue[tuple[int, str]] = queue.SimpleQueue()
+        for item in enumerate(urls):
+            work.put(item)
+
+        # The index of the next URL allowed to start navigating, if `ordered`
+        next_index = 0
+        turn = threading.Condition()
+        results: list[URLVisit | None] = [None] * len(urls)
+
+        def navigate_in_turn(page: Page, url: str, index: int) -> None:
+            nonlocal next_index
+            policy = wait if wait is not None else WaitPolicy()
+
+            # The next URL may start as soon as this navigation has committed,
+            # which is when the browser records the visit
+            try:
+                page.goto(url, wait_until="commit", timeout=policy.max_timeout * 1000)
+            finally:
+                with turn:
+                    next_index = index + 1
+                    turn.notify_all()
+
+            if policy.wait_until != "commit":
+                page.wait_for_load_state(
+                    policy.wait_until, timeout=policy.max_timeout * 1000
+                )
+
+        def visit(page_index: int) -> None:
+            page = pages[page_index]
+
+            while True:
+                try:
+                    index, url = work.get_nowait()
+                except queue.Empty:
+                    return
+
+                if ordered:
+                    with turn:
+                        while next_index != index:
+                            turn.wait()
+
+                logger.info(f"Visiting {url} (page {page_index})")
+                error: str | None = None
+                started = datetime.now(UTC)
+                start = time.perf_counter()
+                try:
+                    if ordered:
+                        navigate_in_turn(page, url, index)
+                    elif wait is None:
+                        page.goto(url)
+                    else:
+                        page.goto(url, **wait.goto_kwargs())
+                except Exception as e:
+                    logger.warning(f"Failed to visit {url}: {e}")
+                    error = str(e)
+                navigation_seconds = time.perf_counter() - start
+
+                timing = NavigationTiming.from_page(page) if error is None else None
+
+                if wait is None:
+                    dwell: float = max(wait_time + random.randint(-jitter, jitter), 1)
+                else:
+                    dwell = wait.sample_dwell()
+                time.sleep(dwell)
+
+                results[index] = URLVisit(
+                    index=index,
+                    url=url,
+                    page=page_index,
+                    started=started,
+                    navigation_seconds=navigation_seconds,
+                    dwell_seconds=dwell,
+                    timing=timing,
+                    error=error,
+                )
+
+        try:
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                for future in [executor.submit(visit, i) for i in range(concurrency)]:
+                    future.result()
+        finally:
+            # Only keep one page open, as a single-page visit would
+            for page in pages[1:]:
+                page.close()
+
+        return [result for result in results if result is not None]
+
+    def browse(self, plan: BrowsePlan) -> BrowseResult:
+        """
+        Run a whole browsing plan on the agent in a single round-trip.
+
+        Driving the browser through the `browser` attribute costs a round-trip
+        for every Playwright call (every `goto()`, `screenshot()`, `click()`, and
+        so on). Instead, the plan is sent to the agent, which runs it locally and
+        only returns a summary of each step.
+
+        Errors raised by a step are recorded in its result rather than raised.
+        Since plans can take a long time to run, the call isn't subject to the
+        connection's request timeout.
+
+        `set_browser()` must be called first.
+
+        :param plan: The steps to run.
+        :return: The outcome and timing of each step.
+        """
+        # The plan is sent as JSON so that it's passed by value rather than as
+        # a netref.
+        async_result = rpyc.async_(self.rpyc_conn.root.browse)(plan.model_dump_json())
+        async_result.wait()
+
+        # Recording a HAR archive relaunches the browser
+        self.browser = self.rpyc_conn.root.browser
+
+        # The result is encoded, and must be decoded to be used.
+        return self.decode_result(async_result.value)  # type: ignore[no-any-return]
+
+    def start_har(self, har: HarOptions) -> None:
+        """
+        Start recording the browser's traffic to a HAR archive on the agent, or
+        replaying its traffic from one, until `stop_har()` is called.
+
+        Replaying an archive makes browsing fast, repeatable, and independent
+        of network access, while still creating the usual browser artifacts.
+        To record or replay the traffic of a single browsing plan, set
+        `BrowsePlan.har` instead.
+
+        `set_browser()` must be called first.
+
+        :param har: The archive to record to or replay from.
+        """
+        self.rpyc_conn.root.start_har(har.model_dump_json())
+
+    def stop_har(self) -> None:
+        """
+        Stop recording or replaying a HAR archive.
+
+        A recorded archive is only written once the browser is closed, so after
+        recording, the browser is relaunched and `browser` is updated. Pages
+        from before the relaunch can no longer be used.
+        """
+        self.rpyc_conn.root.stop_har()
+        self.browser = self.rpyc_conn.root.browser
+
+    def screenshot(
+        self,
+        page: Page | None = None,
+        path: Path | None = None,
+        full_page: bool = True,
+        image_format: ScreenshotFormat = "png",
+        quality: int | None = None,
+        guest_path: str | None = None,
+        chunk_size: int = DEFAULT_SCREENSHOT_CHUNK_SIZE,
+    ) -> bytes:
+        """
+        Take a screenshot of a page on the agent and transfer it to the host.
+
+        The image is encoded on the agent and transferred in chunks of
+        `chunk_size` bytes, so a large full-page screenshot doesn't hold up
+        other calls on the connection. JPEG screenshots with a reduced quality
+        are usually much smaller than PNGs.
+
+        :param page: The page to take a screenshot of, which must be a page of
+            `browser`. If None, the most recently opened page is used.
+        :param path: If set, the image is also written to this path on the host.
+        :param full_page: Whether to capture the full scrollable page, rather
+            than just the viewport.
+        :param image_format: The image format, either "png" or "jpeg".
+        :param quality: The JPEG quality, from 0 to 100. Only valid for JPEG.
+        :param guest_path: If set, a copy of the image is also kept at this path
+            on the agent.
+        :param chunk_size: The maximum number of bytes transferred per round-trip.
+        :return: The encoded image.
+        """
+        if chunk_size < 1:
+            raise ValueError(f"chunk_size must be positive, got {chunk_size}")
+
+        token, size = self.rpyc_conn.root.capture_screenshot(
+            page, full_page, image_format, quality, guest_path
+        )
+
+        image = bytearray()
+        try:
+            while len(image) < size:
+                chunk = self.rpyc_conn.root.read_screenshot(token, chunk_size)
+                if not chunk:
+                    raise RuntimeError(f"Screenshot ended after {len(image)} bytes")
+                image += chunk
+        finally:
+            if len(image) < size:
+                self.rpyc_conn.root.close_screenshot(token)
+
+        if path is not None:
+            path.write_bytes(image)
+
+        return bytes(image)
+
+    def close_browsers(self) -> None:
+        """
+        Close every browser context kept open by the agent, including those in
+        use by other connections.
+
+        Use this to force the next `set_browser()` call to launch a fresh browser.
+        """
+        self.rpyc_conn.root.close_browsers()
+
     def kill_edge(self) -> None:
         """
         Kill Edge process instances by name.
@@ -61,25 +482,241 @@ class ChromiumServiceAPI(WindowsServiceAPI):
 
         This method kills all Edge processes by name, which effectively bypasses
         the "startup boost" feature. In general, this is only necessary if Edge
-        has been opened through other means (e.g. manually).
+        has been opened through other means (e.g. manually). Browsers opened by
+        the agent itself are not killed.
         """
         self.rpyc_conn.root.kill_edge()
 
+    def save_profile_state(
+        self,
+        browser_type: Literal["chrome", "msedge"],
+        name: str,
+        profile: str = "Default",
+    ) -> ProfileStateStats:
+        """
+        Save the state of a browser profile on the agent, so that it can be
+        restored before later scenario runs with `restore_profile_state()`.
+
+        Together, these let a single VM run many scenario iterations from the
+        same starting point without being restored or cloned each time. States
+        are stored incrementally (only new file contents are copied), and
+        caches are skipped.
+
+        The browser is closed first, including for other connections.
+
+        :param browser_type: The browser the profile belongs to.
+        :param name: The name to save the state under. Any state previously
+            saved under this name is replaced.
+        :param profile: The name of the profile directory. Defaults to "Default".
+        :return: The number of files saved and copied.
+        """
+        result = self.rpyc_conn.root.save_profile_state(browser_type, name, profile)
+        self.browser = self.rpyc_conn.root.browser
+
+        # The result is encoded, and must be decoded to be used.
+        return self.decode_result(result)  # type: ignore[no-any-return]
+
+    def restore_profile_state(
+        self,
+        browser_type: Literal["chrome", "msedge"],
+        name: str,
+        profile: str = "Default",
+    ) -> ProfileStateStats:
+        """
+        Restore a browser profile on the agent to a state saved with
+        `save_profile_state()`.
+
+        The browser is closed first, including for other connections; call
+        `set_browser()` afterwards to open it again.
+
+        :param browser_type: The browser the profile belongs to.
+        :param name: The name of the saved state.
+        :param profile: The name of the profile directory. Defaults to "Default".
+        :return: The number of files rewritten and deleted.
+        """
+        result = self.rpyc_conn.root.restore_profile_state(browser_type, name, profile)
+        self.browser = self.rpyc_conn.root.browser
+
+        # The result is encoded, and must be decoded to be used.
+        return self.decode_result(result)  # type: ignore[no-any-return]
+
+    def list_profile_states(self) -> list[str]:
+        """
+        Get the names of all profile states saved on the agent.
+        """
+        return list(self.rpyc_conn.root.list_profile_states())
+
+    def delete_profile_state(self, name: str) -> None:
+        """
+        Delete a profile state saved on the agent.
+        """
+        self.rpyc_conn.root.delete_profile_state(name)
+
+    def get_stats(self, reset: bool = False) -> TimingStats:
+        """
+        Get the timing spans recorded by the agent's Chromium service.
+
+        These break down where browsing time goes: starting Playwright,
+        launching and closing browsers, killing Edge, navigation, dwell,
+        screenshots, downloads and artifact collection. Use
+        `TimingStats.summary()` to format them as a table.
+
+        :param reset: If True, clear the recorded timings afterwards, e.g. to
+            measure a single scenario run.
+        """
+        result = self.rpyc_conn.root.get_stats(reset)
+
+        # The result is encoded, and must be decoded to be used.
+        return self.decode_result(result)  # type: ignore[no-any-return]
+
+    def iter_history(
+        self,
+        browser_type: Literal["chrome", "msedge"],
+        history_path: Path | None = None,
+        page_size: int = DEFAULT_HISTORY_PAGE_SIZE,
+    ) -> Iterator[list[URLHistoryEntry]]:
+        """
+        Iterate over browser history entries for the specified browser, one page
+        at a time.
+
+        Each page is a separate round-trip, so other calls on the connection
+        aren't stalled by a single large transfer. All pages are read from the
+        same snapshot of the history database. If the iterator is closed early,
+        the snapshot is released on the agent.
+
+        :param browser_type: Type of browser to retrieve history from ("chrome" or "msedge")
+        :param history_path: Path to the browser history file. If None, defaults
+            to the standard location for the specified browser.
+        :param page_size: The maximum number of entries in each page.
+        :return: An iterator of lists of URLHistoryEntry objects.
+        """
+        continuation_token: str | None = None
+        try:
+            while True:
+                page, continuation_token = self.rpyc_conn.root.get_history_page(
+                    browser_type, history_path, page_size, continuation_token
+                )
+
+                # Each page is encoded, and must be decoded to be used.
+                entries: list[URLHistoryEntry] = self.decode_result(page)
+                if entries:
+                    yield entries
+
+                if continuation_token is None:
+                    return
+        finally:
+            if continuation_token is not None:
+                self.rpyc_conn.root.close_history(continuation_token)
+
     def get_history(
         self,
         browser_type: Literal["chrome", "msedge"],
         history_path: Path | None = None,
+        page_size: int = DEFAULT_HISTORY_PAGE_SIZE,
     ) -> URLHistory:
         """
         Get browser history entries for the specified browser.
 
+        The entries are transferred in pages of `page_size` entries (see
+        `iter_history()`) and assembled into a single URLHistory object.
+
         :param browser_type: Type of browser to retrieve history from ("chrome" or "msedge")
         :param history_path: Path to the browser history file. If None, defaults
             to the standard location for the specified browser.
+        :param page_size: The maximum number of entries transferred per round-trip.
         :return: A URLHistory object containing the browser history entries.
         """
-        # The result is pickled, and must be unpickled to be used.
-        return pickle.loads(self.rpyc_conn.root.get_history(browser_type, history_path))
+        url_history_entries: list[URLHistoryEntry] = []
+        for entries in self.iter_history(browser_type, history_path, page_size):
+            url_history_entries.extend(entries)
+
+        # Create Application object for this browser (note that it also won't
+        # be included as a reference, it'll be the original)
+        app_obj = Application(
+            hasFacet=[ApplicationFacet(applicationIdentifier=browser_type)],
+        )
+
+        return URLHistory(
+            hasFacet=[
+                URLHistoryFacet(
+                    urlHistoryEntry=url_history_entries, browserInformation=app_obj
+                )
+            ],
+        )
+
+    def collect_artifacts(
+        self,
+        browser_type: Literal["chrome", "msedge"],
+        profile: str = "Default",
+        artifacts: Iterable[ChromiumArtifactType] = ALL_CHROMIUM_ARTIFACTS,
+        user_data_path: Path | None = None,
+    ) -> ChromiumArtifacts:
+        """
+        Collect several artifacts from a browser profile in a single round-trip.
+
+        The profile's databases (History, Cookies, Web Data, Top Sites) are
+        copied once on the agent, and every requested artifact is extracted
+        from that one snapshot. Use `ChromiumArtifacts.case_objects()` to get
+        the resulting CASE objects.
+
+        :param browser_type: The browser to collect artifacts from.
+        :param profile: The name of the profile directory. Defaults to "Default".
+        :param artifacts: The artifacts to collect. Defaults to all artifacts.
+        :param user_data_path: The path to the browser's "User Data" directory.
+            If None, defaults to the standard location for the specified browser.
+        :return: A ChromiumArtifacts object containing the requested artifacts.
+        """
+        # Send the artifact names as a tuple so that they're passed by value
+        # rather than as a netref.
+        result = self.rpyc_conn.root.collect_artifacts(
+            browser_type, profile, tuple(artifacts), user_data_path
+        )
+
+        # The result is encoded, and must be decoded to be used.
+        return self.decode_result(result)  # type: ignore[no-any-return]
+
+    def collect_artifacts_for_profiles(
+        self,
+        browser_type: Literal["chrome", "msedge"],
+        profiles: Iterable[str],
+        artifacts: Iterable[ChromiumArtifactType] = ALL_CHROMIUM_ARTIFACTS,
+        user_data_path: Path | None = None,
+    ) -> list[ChromiumArtifacts]:
+        """
+        Collect several artifacts from each of several browser profiles in a
+        single round-trip.
+
+        URL objects are shared between all of the returned artifacts, so a URL
+        that appears in several profiles (or in several artifacts) is only
+        transferred once.
+
+        :param browser_type: The browser to collect artifacts from.
+        :param profiles: The names of the profile directories.
+        :param artifacts: The artifacts to collect. Defaults to all artifacts.
+        :param user_data_path: The path to the browser's "User Data" directory.
+            If None, defaults to the standard location for the specified browser.
+        :return: A list of ChromiumArtifacts objects, one per profile.
+        """
+        result = self.rpyc_conn.root.collect_artifacts_for_profiles(
+            browser_type, tuple(profiles), tuple(artifacts), user_data_path
+        )
+
+        # The result is encoded, and must be decoded to be used.
+        return self.decode_result(result)  # type: ignore[no-any-return]
+
+
+class ConcurrentChromiumServiceAPI(ChromiumServiceAPI):
+    """
+    The service API for `ConcurrentChromiumService`, which drives the browser
+    with Playwright's async API.
+
+    This has the same interface as ChromiumServiceAPI, but calls made through
+    different connections run concurrently on the agent instead of one at a
+    time. Open one connection per simulated user (each on its own thread) to
+    browse in parallel.
+    """
+
+    related_service = "ConcurrentChromiumService"
 
 
 if __name__ == "__main__":
@@ -0,0 +1,279 @@
+"""
+Run the same collection plan on many agents at once.
+
+Clones of the same VM image are typically collected from in the same way, so
+instead of handling each agent in turn, `collect_fleet()` runs a
+`CollectionPlan` on a list of agents with bounded concurrency, and returns each
+agent's CASE objects along with how long each step took and what failed. The
+objects can then be merged into one `AKFBundle` per agent or a single combined
+bundle:
+
+    plan = CollectionPlan(browse=BrowsePlan.from_urls(["https://example.com"]))
+    result = collect_fleet(hosts, plan, concurrency=8)
+    logger.info(result.summary())
+    bundle = result.combined_bundle()
+"""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterable, Literal
+
+from akflib.rendering.objs import AKFBundle
+from pydantic import BaseModel, ConfigDict
+
+from akf_windows.api.artifacts import WindowsArtifactServiceAPI
+from akf_windows.api.chromium import ChromiumServiceAPI
+from akf_windows.common.chromium import (
+    ALL_CHROMIUM_ARTIFACTS,
+    BrowsePlan,
+    BrowseResult,
+    ChromiumArtifactType,
+)
+
+logger = logging.getLogger(__name__)
+
+# The steps of a collection plan, in the order they're run on each agent.
+FleetStep = Literal["browse", "chromium", "prefetch"]
+
+
+class CollectionPlan(BaseModel):
+    """
+    What to do on each agent in a fleet.
+    """
+
+    # If set, this plan is run in the first profile before anything is
+    # collected, so that the collected artifacts include the browsing.
+    browse: BrowsePlan | None = None
+
+    # The browser and profiles to collect Chromium artifacts from. An empty
+    # list of artifacts skips the step.
+    browser: Literal["chrome", "msedge"] = "msedge"
+    profiles: list[str] = ["Default"]
+    chromium_artifacts: list[ChromiumArtifactType] = list(ALL_CHROMIUM_ARTIFACTS)
+
+    # Whether to collect prefetch files, and from where. If the folder is None,
+    # the system prefetch folder is used.
+    prefetch: bool = True
+    prefetch_folder: Path | None = None
+
+
+class HostResult(BaseModel):
+    """
+    The outcome of running a CollectionPlan on a single agent.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    host: str
+
+    # The CASE objects collected from the agent, suitable for
+    # `AKFBundle.add_objects()`.
+    objects: list[BaseModel] = []
+
+    browse_result: BrowseResult | None = None
+
+    # The time taken by each step that was run, in seconds, including
+    # connecting to the service it uses.
+    step_seconds: dict[FleetStep, float] = {}
+    total_seconds: float = 0.0
+
+    # The error raised by each step that failed. The other steps are still run,
+    # so objects from the steps that succeeded are kept.
+    errors: dict[FleetStep, str] = {}
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def bundle(self) -> AKFBundle:
+        """
+        Build a bundle containing the objects collected from this agent.
+        """
+        bundle = AKFBundle()
+        bundle.add_objects(self.objects)
+        return bundle
+
+
+class FleetResult(BaseModel):
+    """
+    The outcome of running a CollectionPlan on every agent in a fleet.
+    """
+
+    # In the same order as the hosts passed to `collect_fleet()`.
+    hosts: list[HostResult] = []
+
+    # The wall-clock time taken for the whole fleet, in seconds.
+    total_seconds: float = 0.0
+
+    @property
+    def failed(self) -> list[HostResult]:
+        """
+        The agents on which at least one step failed.
+        """
+        return [host for host in self.hosts if not host.ok]
+
+    def host_bundles(self) -> dict[str, AKFBundle]:
+        """
+        Build one bundle per agent, keyed by host.
+        """
+        return {host.host: host.bundle() for host in self.hosts}
+
+    def combined_bundle(self) -> AKFBundle:
+        """
+        Build a single bundle containing the objects collected from every agent.
+        """
+        bundle = AKFBundle()
+        for host in self.hosts:
+            bundle.add_objects(host.objects)
+        return bundle
+
+    def summary(self) -> str:
+        """
+        Format the time taken by each step on each agent as a table, followed by
+        any errors.
+        """
+        steps: list[FleetStep] = ["browse", "chromium", "prefetch"]
+        lines = [
+            f"{'host':<24}"
+            + "".join(f"{step + ' s':>12}" for step in steps)
+            + f"{'total s':>10}{'objects':>9}  status"
+        ]
+        for host in self.hosts:
+            step_columns = "".join(
+                (
+                    f"{host.step_seconds[step]:>12.2f}"
+                    if step in host.step_seconds
+                    else f"{'-':>12}"
+                )
+                for step in steps
+            )
+            status = "ok" if host.ok else f"failed ({', '.join(host.errors)})"
+            lines.append(
+                f"{host.host:<24}{step_columns}{host.total_seconds:>10.2f}"
+                f"{len(host.objects):>9}  {status}"
+            )
+
+        lines.append(
+            f"{len(self.hosts) - len(self.failed)}/{len(self.hosts)} agents "
+            f"succeeded in {self.total_seconds:.2f}s"
+        )
+        for host in self.failed:
+            for step, error in host.errors.items():
+                lines.append(f"{host.host} {step}: {error}")
+        return "\n".join(lines)
+
+
+def collect_host(
+    host: str,
+    plan: CollectionPlan,
+    port: int = 18861,
+    timeout: float | None = 300.0,
+) -> HostResult:
+    """
+    Run a collection plan on a single agent. Errors raised by each step are
+    recorded in the result rather than raised.
+
+    :param host: The agent to collect from.
+    :param plan: What to do on the agent.
+    :param port: The port of the agent's dispatch service.
+    :param timeout: The maximum number of seconds to wait for each service to
+        start, e.g. while the VM is still booting. If None, wait indefinitely.
+    """
+    result = HostResult(host=host)
+    start = time.perf_counter()
+
+    def run_step(step: FleetStep, func: Callable[[], None]) -> None:
+        step_start = time.perf_counter()
+        try:
+            func()
+        except Exception as e:
+            logger.warning(f"{host}: {step} failed: {e!r}")
+            result.errors[step] = repr(e)
+        finally:
+            result.step_seconds[step] = time.perf_counter() - step_start
+
+    def browse() -> None:
+        assert plan.browse is not None
+        with ChromiumServiceAPI.acquire(host, port, timeout=timeout) as chromium:
+            profile = plan.profiles[0] if plan.profiles else "Default"
+            chromium.set_browser(plan.browser, profile)
+            result.browse_result = chromium.browse(plan.browse)
+
+    def collect_chromium() -> None:
+        with ChromiumServiceAPI.acquire(host, port, timeout=timeout) as chromium:
+            profiles = chromium.collect_artifacts_for_profiles(
+                plan.browser, plan.profiles, plan.chromium_artifacts
+            )
+
+        # URL objects may be shared between profiles, so each object is only
+        # included once
+        seen: set[int] = set()
+        for artifacts in profiles:
+            for obj in artifacts.case_objects():
+                if id(obj) not in seen:
+                    seen.add(id(obj))
+                    result.objects.append(obj)
+
+    def collect_prefetch() -> None:
+        with WindowsArtifactServiceAPI.acquire(
+            host, port, timeout=timeout
+        ) as win_artifact:
+            result.objects.extend(
+                win_artifact.collect_prefetch_dir(plan.prefetch_folder)
+            )
+
+    if plan.browse is not None:
+        run_step("browse", browse)
+    if plan.chromium_artifacts and plan.profiles:
+        run_step("chromium", collect_chromium)
+    if plan.prefetch:
+        run_step("prefetch", collect_prefetch)
+
+    result.total_seconds = time.perf_counter() - start
+    logger.info(
+        f"{host}: collected {len(result.objects)} objects in "
+        f"{result.total_seconds:.2f}s"
+        + (f", {len(result.errors)} step(s) failed" if result.errors else "")
+    )
+    return result
+
+
+def collect_fleet(
+    hosts: Iterable[str],
+    plan: CollectionPlan,
+    concurrency: int = 8,
+    port: int = 18861,
+    timeout: float | None = 300.0,
+) -> FleetResult:
+    """
+    Run a collection plan on many agents, at most `concurrency` at a time.
+
+    A failure on one agent doesn't affect the others; check `FleetResult.failed`
+    for the agents that need attention.
+
+    :param hosts: The agents to collect from.
+    :param plan: What to do on each agent.
+    :param concurrency: The maximum number of agents to run the plan on at once.
+    :param port: The port of each agent's dispatch service.
+    :param timeout: The maximum number of seconds to wait for each service to
+        start on each agent. If None, wait indefinitely.
+    """
+    hosts = list(hosts)
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(
+        max_workers=max(1, min(concurrency, len(hosts))),
+        thread_name_prefix="akf-fleet",
+    ) as executor:
+        host_results = list(
+            executor.map(lambda host: collect_host(host, plan, port, timeout), hosts)
+        )
+
+    result = FleetResult(hosts=host_results, total_seconds=time.perf_counter() - start)
+    logger.info(
+        f"Collected from {len(hosts) - len(result.failed)}/{len(hosts)} agents in "
+        f"{result.total_seconds:.2f}s"
+    )
+    return result
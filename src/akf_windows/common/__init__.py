@@ -0,0 +1,7 @@
+"""
+Models and helpers shared between the Windows agent (`akf_windows.server`) and
+the host-side APIs (`akf_windows.api`).
+
+Anything that is pickled by a service and unpickled by its API must be importable
+on both sides, which is why it lives here rather than in either package.
+"""
@@ -0,0 +1,362 @@
+"""
+Models for Chromium artifacts that are shared by `ChromiumService` and
+`ChromiumServiceAPI`.
+"""
+
+import random
+from typing import Any, Literal
+
+from caselib.uco.observable import (
+    URL,
+    BrowserCookie,
+    File,
+    ObservableRelationship,
+    URLHistory,
+)
+from pydantic import AwareDatetime, BaseModel, ConfigDict, Field
+
+# The artifacts that can be collected from a single profile snapshot.
+ChromiumArtifactType = Literal[
+    "history", "downloads", "cookies", "autofill", "top_sites"
+]
+
+ALL_CHROMIUM_ARTIFACTS: tuple[ChromiumArtifactType, ...] = (
+    "history",
+    "downloads",
+    "cookies",
+    "autofill",
+    "top_sites",
+)
+
+# The image formats that browsers can encode screenshots as.
+ScreenshotFormat = Literal["png", "jpeg"]
+
+
+class BrowserAutofillEntry(BaseModel):
+    """
+    Pydantic model representing an entry in Chrome/Edge's autofill table.
+
+    UCO has no observable for form autofill data, so unlike the other artifacts,
+    these are returned as-is rather than as CASE objects.
+    """
+
+    name: str
+    value: str
+    count: int
+    date_created: AwareDatetime | None = None
+    date_last_used: AwareDatetime | None = None
+
+
+class WaitPolicy(BaseModel):
+    """
+    How long to stay on a page after navigating to it.
+
+    Rather than sleeping for a fixed time, navigation waits until the page
+    reaches the `wait_until` state (or `max_timeout` expires), and the page is
+    then left open for `min_dwell` seconds plus up to `jitter` random seconds.
+    The time spent on a page therefore tracks how long it actually took to load.
+    """
+
+    # The page state to wait for, as accepted by Playwright's `Page.goto()`:
+    # - "commit": the response was received and the document started loading
+    # - "domcontentloaded": the `DOMContentLoaded` event was fired
+    # - "load": the `load` event was fired
+    # - "networkidle": there were no network requests for 500ms
+    wait_until: Literal["commit", "domcontentloaded", "load", "networkidle"] = "load"
+
+    # The time to stay on the page once it's ready, in seconds.
+    min_dwell: float = Field(default=1.0, ge=0)
+
+    # The maximum time to wait for the page to become ready, in seconds. If the
+    # page isn't ready by then, the visit is recorded as failed (in the result
+    # of `goto()`, `visit_urls()` or `browse()`) rather than raised, and the
+    # page is still left open for the dwell time (except by `goto()`, which
+    # doesn't dwell).
+    max_timeout: float = Field(default=30.0, gt=0)
+
+    # The maximum random time added on top of `min_dwell`, in seconds.
+    jitter: float = Field(default=0.0, ge=0)
+
+    def goto_kwargs(self) -> dict[str, Any]:
+        """
+        Get the keyword arguments to pass to `Page.goto()` for this policy.
+        """
+        return {"wait_until": self.wait_until, "timeout": self.max_timeout * 1000}
+
+    def sample_dwell(self) -> float:
+        """
+        Get a randomized time to stay on a page once it's ready, in seconds.
+        """
+        return self.min_dwell + random.uniform(0, self.jitter)
+
+
+# Reads the Navigation Timing entry of the current document as JSON, with every
+# phase as a duration in milliseconds. Phases that didn't happen (e.g. DNS
+# lookups for cached connections) are 0. JSON is returned, rather than an
+# object, so that it's passed by value over RPyC.
+NAVIGATION_TIMING_SCRIPT = """() => {
+    const [nav] = performance.getEntriesByType("navigation");
+    if (!nav) {
+        return null;
+    }
+    const span = (start, end) => (start > 0 && end >= start ? end - start : 0);
+    return JSON.stringify({
+        dns_ms: span(nav.domainLookupStart, nav.domainLookupEnd),
+        connect_ms: span(nav.connectStart, nav.connectEnd),
+        tls_ms: span(nav.secureConnectionStart, nav.connectEnd),
+        ttfb_ms: span(nav.requestStart, nav.responseStart),
+        response_ms: span(nav.responseStart, nav.responseEnd),
+        dom_content_loaded_ms: nav.domContentLoadedEventEnd,
+        load_ms: nav.loadEventEnd,
+        transfer_bytes: nav.transferSize,
+    });
+}"""
+
+
+class NavigationTiming(BaseModel):
+    """
+    The browser's own timings for a page load, from the Navigation Timing API.
+
+    Each phase is a duration in milliseconds. `dom_content_loaded_ms` and
+    `load_ms` are measured from the start of navigation, and are 0 if the page
+    hadn't reached that point when the timings were read.
+    """
+
+    dns_ms: float = 0.0
+    connect_ms: float = 0.0
+    tls_ms: float = 0.0
+    ttfb_ms: float = 0.0
+    response_ms: float = 0.0
+    dom_content_loaded_ms: float = 0.0
+    load_ms: float = 0.0
+    transfer_bytes: int = 0
+
+    @classmethod
+    def from_page(cls, page: Any) -> "NavigationTiming | None":
+        """
+        Read the timings of the document currently loaded in a Playwright page.
+
+        Returns None if the timings can't be read (e.g. on an error page).
+        """
+        try:
+            timing = page.evaluate(NAVIGATION_TIMING_SCRIPT)
+        except Exception:
+            return None
+        return cls.model_validate_json(timing) if timing else None
+
+    def summary(self) -> str:
+        return (
+            f"dns {self.dns_ms:.0f}ms, connect {self.connect_ms:.0f}ms, "
+            f"ttfb {self.ttfb_ms:.0f}ms, load {self.load_ms:.0f}ms"
+        )
+
+
+class URLVisit(BaseModel):
+    """
+    The outcome and timing of a single URL visit.
+    """
+
+    # The position of the URL in the list of URLs that were visited.
+    index: int
+    url: str
+
+    # The index of the page (tab) the URL was visited in.
+    page: int
+
+    # When navigation to the URL started.
+    started: AwareDatetime
+
+    # How long the navigation itself took (until the page was ready), and how
+    # long the page was then left open before moving on, in seconds.
+    navigation_seconds: float
+    dwell_seconds: float
+
+    # The browser's breakdown of the page load, if the page loaded.
+    timing: NavigationTiming | None = None
+
+    # The error raised while visiting the URL, if any.
+    error: str | None = None
+
+
+class BrowseStep(BaseModel):
+    """
+    A single URL visit in a BrowsePlan, and what to do once the page is ready.
+    """
+
+    url: str
+    wait: WaitPolicy = WaitPolicy()
+
+    # If set, a screenshot of the page is saved to this path on the agent once
+    # the page is ready.
+    screenshot_path: str | None = None
+    full_page_screenshot: bool = True
+
+    # The format of the screenshot, and its quality (from 0 to 100) if JPEG.
+    # JPEG screenshots take up much less space on the agent's disk.
+    screenshot_format: ScreenshotFormat = "png"
+    screenshot_quality: int | None = None
+
+    # If set, the element matching this selector is clicked once the page is
+    # ready, and the download it starts is saved to `download_dir` on the agent
+    # (by default, the agent user's Downloads folder).
+    download_selector: str | None = None
+    download_dir: str | None = None
+
+
+class HarOptions(BaseModel):
+    """
+    Record a browser's network traffic to a HAR archive, or replay it from one.
+
+    In replay mode, requests are answered from the archive by Playwright, so
+    browsing doesn't need network access and returns the same pages on every
+    run. Pages are still loaded by the browser, so browsing artifacts such as
+    history are created as usual.
+    """
+
+    # The path to the HAR archive on the agent. Responses are embedded in the
+    # archive, so it can be copied around as a single file.
+    path: str
+    mode: Literal["record", "replay"]
+
+    # If set, only requests whose URL matches this glob pattern are recorded or
+    # replayed. Other requests go to the network as usual.
+    url: str | None = None
+
+    # What to do when replaying a request that isn't in the archive: "abort"
+    # fails the request, and "fallback" sends it to the network.
+    not_found: Literal["abort", "fallback"] = "abort"
+
+
+class BrowsePlan(BaseModel):
+    """
+    A sequence of steps run by the agent in a single call to
+    `ChromiumServiceAPI.browse()`.
+    """
+
+    steps: list[BrowseStep]
+
+    # If true, the remaining steps are skipped after the first step that fails.
+    stop_on_error: bool = False
+
+    # If set, the plan's traffic is recorded to or replayed from a HAR archive.
+    har: HarOptions | None = None
+
+    @classmethod
+    def from_urls(cls, urls: list[str], wait: WaitPolicy | None = None) -> "BrowsePlan":
+        """
+        Build a plan that visits each URL in order with the same wait policy.
+        """
+        if wait is None:
+            wait = WaitPolicy()
+        return cls(steps=[BrowseStep(url=url, wait=wait) for url in urls])
+
+
+class BrowseStepResult(URLVisit):
+    """
+    The outcome of a single BrowseStep.
+    """
+
+    # The URL and title of the page after navigation (e.g. after redirects).
+    final_url: str | None = None
+    title: str | None = None
+
+    # The paths on the agent that the screenshot and download were saved to.
+    screenshot_path: str | None = None
+    download_path: str | None = None
+
+
+class BrowseResult(BaseModel):
+    """
+    A summary of a BrowsePlan run by the agent.
+    """
+
+    steps: list[BrowseStepResult] = []
+
+    # The number of steps that were skipped because an earlier step failed.
+    skipped: int = 0
+
+    # The time taken to run the whole plan on the agent, in seconds.
+    total_seconds: float = 0.0
+
+    @property
+    def failed(self) -> list[BrowseStepResult]:
+        """
+        The steps that raised an error.
+        """
+        return [step for step in self.steps if step.error is not None]
+
+
+class ProfileStateStats(BaseModel):
+    """
+    A summary of saving or restoring the state of a browser profile.
+    """
+
+    # The name the state was saved under.
+    name: str
+
+    # The number and total size of the files in the state.
+    files: int = 0
+    total_bytes: int = 0
+
+    # The files that had to be copied: when saving, files whose content wasn't
+    # already stored; when restoring, files that differed from the saved state.
+    copied_files: int = 0
+    copied_bytes: int = 0
+
+    # When restoring, the files that weren't in the saved state and were deleted.
+    deleted_files: int = 0
+
+    seconds: float = 0.0
+
+
+class ChromiumArtifacts(BaseModel):
+    """
+    The artifacts collected from a single snapshot of a Chromium profile.
+
+    Any artifact that wasn't requested (or whose database doesn't exist in the
+    profile) is left empty.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    browser_type: Literal["chrome", "msedge"]
+    profile: str
+
+    # The keyword search terms associated with each URL are recorded on the
+    # corresponding URLHistoryEntry objects.
+    history: URLHistory | None = None
+
+    # Each download is represented by the downloaded File, the URL it was
+    # downloaded from, and a "Downloaded_From" relationship between the two.
+    downloads: list[File] = []
+    download_sources: list[URL] = []
+    download_relationships: list[ObservableRelationship] = []
+
+    cookies: list[BrowserCookie] = []
+    top_sites: list[URL] = []
+    autofill: list[BrowserAutofillEntry] = []
+
+    def case_objects(self) -> list[BaseModel]:
+        """
+        Get all of the CASE objects in this collection, suitable for
+        `AKFBundle.add_objects()`.
+
+        URL objects may be shared between artifacts (e.g. a top site that was
+        also a download source), so each object is only included once.
+        """
+        objs: list[BaseModel] = []
+        if self.history is not None:
+            objs.append(self.history)
+        objs.extend(self.downloads)
+        objs.extend(self.download_sources)
+        objs.extend(self.download_relationships)
+        objs.extend(self.cookies)
+        objs.extend(self.top_sites)
+
+        seen: set[int] = set()
+        result: list[BaseModel] = []
+        for obj in objs:
+            if id(obj) not in seen:
+                seen.add(id(obj))
+                result.append(obj)
+        return result
@@ -0,0 +1,272 @@
+"""
+Codecs for the results that services return to the host.
+
+RPyC doesn't play well with some of the Pydantic properties of CASE objects, so
+services return their results as bytes and the host decodes them. Pickle works
+for anything, but repeats every field name and every unset optional field of
+every object, which adds up for results with thousands of CASE objects.
+
+The msgpack codec (used when msgpack is installed on both sides) is aware of
+Pydantic models: each model class is described once, by its import path and
+field names, and each instance only carries the fields that differ from their
+static defaults. Models are rebuilt without validation, so they come back as
+exactly the same classes with the same values. Anything msgpack can't represent
+natively, other than enums, UUIDs and datetimes, is pickled individually.
+
+Services pick a codec per connection with `negotiate_codec()`, and every encoded
+result identifies its codec, so `decode_result()` needs no other information.
+"""
+
+import enum
+import importlib
+import pickle
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, ClassVar
+
+from pydantic import BaseModel
+from pydantic_core import PydanticUndefined
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# The first byte of msgpack-encoded results. Pickles (protocol 2 and later)
+# always start with 0x80, so the two can't be confused.
+MSGPACK_MAGIC = b"\x01"
+
+# Extension type codes used within msgpack-encoded results
+_EXT_MODEL = 1
+_EXT_TUPLE = 2
+_EXT_PICKLE = 3
+_EXT_DATETIME = 4
+_EXT_UUID = 5
+_EXT_ENUM = 6
+_EXT_REF = 7
+
+
+class ResultCodec(ABC):
+    """
+    Base class for result codecs.
+    """
+
+    name: ClassVar[str]
+
+    @abstractmethod
+    def encode(self, obj: Any) -> bytes:
+        """
+        Encode a result to bytes.
+        """
+
+    @abstractmethod
+    def decode(self, data: bytes) -> Any:
+        """
+        Decode a result encoded by `encode()`.
+        """
+
+
+class PickleCodec(ResultCodec):
+    """
+    Encodes results with pickle. Works for any picklable object.
+    """
+
+    name = "pickle"
+
+    def encode(self, obj: Any) -> bytes:
+        return pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def decode(self, data: bytes) -> Any:
+        return pickle.loads(data)
+
+
+class _ModelEncoder:
+    """
+    The state of a single msgpack encode: the table of model classes seen so far.
+    """
+
+    def __init__(self) -> None:
+        # Each entry is [module, qualname, field names], where the field names
+        # are None for enums
+        self.types: list[list[Any]] = []
+        self.type_indexes: dict[type, int] = {}
+
+        # For each model class, its field names and their static defaults
+        self.fields: dict[type, list[tuple[str, Any]]] = {}
+
+        # The index of every model encoded so far, by its ID. Models that appear
+        # more than once (such as URL objects shared between several profiles)
+        # are only encoded the first time, like pickle's memo. Models are
+        # numbered after their fields, which is the order they're rebuilt in.
+        self.memo: dict[int, int] = {}
+
+    def pack(self, obj: Any) -> bytes:
+        # `strict_types` sends subclasses of builtins (like str enums) and tuples
+        # to `default`, so that they aren't silently turned into their base type
+        return msgpack.packb(  # type: ignore[no-any-return]
+            obj, default=self.default, strict_types=True
+        )
+
+    def default(self, obj: Any) -> Any:
+        if isinstance(obj, BaseModel):
+            if id(obj) in self.memo:
+                return msgpack.ExtType(_EXT_REF, self.pack(self.memo[id(obj)]))
+
+            ext = msgpack.ExtType(_EXT_MODEL, self.pack(self.model_to_list(obj)))
+            self.memo[id(obj)] = len(self.memo)
+            return ext
+        if type(obj) is tuple:
+            return msgpack.ExtType(_EXT_TUPLE, self.pack(list(obj)))
+        if type(obj) is datetime:
+            # Kept as text, so that the timezone offset survives
+            return msgpack.ExtType(_EXT_DATETIME, obj.isoformat().encode())
+        if type(obj) is uuid.UUID:
+            return msgpack.ExtType(_EXT_UUID, obj.bytes)
+        if isinstance(obj, enum.Enum):
+            type_index = self.type_index(type(obj), None)
+            return msgpack.ExtType(_EXT_ENUM, self.pack([type_index, obj.value]))
+        return msgpack.ExtType(_EXT_PICKLE, pickle.dumps(obj))
+
+    def model_to_list(self, model: BaseModel) -> list[Any]:
+        cls = type(model)
+        if cls not in self.fields:
+            self.fields[cls] = [
+                (name, field.default) for name, field in cls.model_fields.items()
+            ]
+        type_index = self.type_index(cls, [name for name, _ in self.fields[cls]])
+
+        # Only include fields that differ from their static default. Fields with
+        # a default factory (such as generated IDs) are always included.
+        values: dict[int, Any] = {}
+        fields_set: list[int] = []
+        for index, (name, default) in enumerate(self.fields[cls]):
+            value = getattr(model, name)
+            if default is PydanticUndefined or not _same_value(value, default):
+                values[index] = value
+            if name in model.model_fields_set:
+                fields_set.append(index)
+
+        return [type_index, values, fields_set, model.model_extra or None]
+
+    def type_index(self, cls: type, field_names: list[str] | None) -> int:
+        if cls not in self.type_indexes:
+            self.type_indexes[cls] = len(self.types)
+            self.types.append([cls.__module__, cls.__qualname__, field_names])
+        return self.type_indexes[cls]
+
+
+def _same_value(value: Any, default: Any) -> bool:
+    try:
+        return type(value) is type(default) and bool(value == default)
+    except Exception:
+        return False
+
+
+def _resolve_type(module: str, qualname: str) -> type:
+    obj: Any = importlib.import_module(module)
+    for part in qualname.split("."):
+        obj = getattr(obj, part)
+    return obj  # type: ignore[no-any-return]
+
+
+class MsgpackCodec(ResultCodec):
+    """
+    Encodes results with msgpack, describing each Pydantic model class once.
+    """
+
+    name = "msgpack"
+
+    def encode(self, obj: Any) -> bytes:
+        encoder = _ModelEncoder()
+        body = encoder.pack(obj)
+        return MSGPACK_MAGIC + msgpack.packb([encoder.types, body])  # type: ignore[no-any-return]
+
+    def decode(self, data: bytes) -> Any:
+        if data[:1] != MSGPACK_MAGIC:
+            raise ValueError("Not a msgpack-encoded result")
+
+        types, body = msgpack.unpackb(data[1:])
+        classes = [_resolve_type(module, qualname) for module, qualname, _ in types]
+        field_names = [names for _, _, names in types]
+        models: list[BaseModel] = []
+
+        def ext_hook(code: int, ext_data: bytes) -> Any:
+            if code == _EXT_MODEL:
+                type_index, values, fields_set, extra = unpack(ext_data)
+                names = field_names[type_index]
+                model = classes[type_index].model_construct(
+                    _fields_set={names[i] for i in fields_set},
+                    **{names[i]: value for i, value in values.items()},
+                )
+                if extra:
+                    # Extra fields always count as set, as they do when validated
+                    model.__pydantic_extra__ = extra
+                    model.__pydantic_fields_set__.update(extra)
+                models.append(model)
+                return model
+            if code == _EXT_REF:
+                return models[unpack(ext_data)]
+            if code == _EXT_TUPLE:
+                return tuple(unpack(ext_data))
+            if code == _EXT_PICKLE:
+                return pickle.loads(ext_data)
+            if code == _EXT_DATETIME:
+                return datetime.fromisoformat(ext_data.decode())
+            if code == _EXT_UUID:
+                return uuid.UUID(bytes=ext_data)
+            if code == _EXT_ENUM:
+                type_index, value = unpack(ext_data)
+                return classes[type_index](value)
+            return msgpack.ExtType(code, ext_data)
+
+        def unpack(packed: bytes) -> Any:
+            return msgpack.unpackb(packed, ext_hook=ext_hook, strict_map_key=False)
+
+        return unpack(body)
+
+
+CODECS: dict[str, ResultCodec] = {"pickle": PickleCodec()}
+if msgpack is not None:
+    CODECS["msgpack"] = MsgpackCodec()
+
+
+def available_codecs() -> list[str]:
+    """
+    Get the names of the codecs available in this environment, most preferred
+    first.
+    """
+    return [name for name in ("msgpack", "pickle") if name in CODECS]
+
+
+def negotiate_codec(names: list[str]) -> str:
+    """
+    Pick the first codec from a list of names that is available here, falling
+    back to pickle.
+    """
+    for name in names:
+        if name in CODECS:
+            return name
+    return "pickle"
+
+
+def encode_result(obj: Any, codec: str = "pickle") -> bytes:
+    """
+    Encode a result to be returned to the host.
+
+    :param obj: The result, typically a Pydantic model or a list of them.
+    :param codec: The name of the codec to use.
+    """
+    return CODECS[codec].encode(obj)
+
+
+def decode_result(data: bytes) -> Any:
+    """
+    Decode a result encoded with `encode_result()`, whichever codec was used.
+    """
+    if data[:1] == MSGPACK_MAGIC:
+        if "msgpack" not in CODECS:
+            raise RuntimeError("Result was encoded with msgpack, which isn't installed")
+        return CODECS["msgpack"].decode(data)
+
+    return CODECS["pickle"].decode(data)
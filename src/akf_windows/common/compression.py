@@ -0,0 +1,272 @@
+"""
+Compression of large results returned by services.
+
+Encoded prefetch and history results are highly repetitive (DLL paths, URL
+prefixes), so they compress well. Services compress results above a size
+threshold with an algorithm negotiated with the client: zlib is always
+available, and zstd is used if the `zstandard` package is installed on both
+sides.
+
+Results are compressed in chunks by a background thread on the agent, while the
+host reads and decompresses the chunks that are already done. Compressing one
+chunk therefore overlaps with transferring and decompressing the previous one,
+rather than the whole result being compressed before any of it is sent.
+"""
+
+import logging
+import queue
+import threading
+import time
+import zlib
+from typing import Any, Iterator, Protocol
+
+from pydantic import BaseModel
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Results smaller than this are sent uncompressed by default
+DEFAULT_THRESHOLD = 64 * 1024
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+# Results whose reader hasn't made progress for this long, in seconds, are
+# closed, so that an abandoned result doesn't keep its data in memory
+DEFAULT_READ_TIMEOUT = 300.0
+
+
+class CompressionStats(BaseModel):
+    """
+    The outcome of compressing and decompressing a single result.
+    """
+
+    algorithm: str
+    raw_bytes: int = 0
+    compressed_bytes: int = 0
+    chunks: int = 0
+
+    # Time spent compressing on the agent, and decompressing on the host.
+    compress_seconds: float = 0.0
+    decompress_seconds: float = 0.0
+
+    @property
+    def ratio(self) -> float:
+        return self.raw_bytes / self.compressed_bytes if self.compressed_bytes else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.algorithm}: {self.raw_bytes} -> {self.compressed_bytes} bytes "
+            f"({self.ratio:.1f}x) in {self.chunks} chunks, compressed in "
+            f"{self.compress_seconds:.3f}s, decompressed in "
+            f"{self.decompress_seconds:.3f}s"
+        )
+
+
+class _Compressor(Protocol):
+    def compress(self, data: bytes) -> bytes: ...
+
+    def flush(self) -> bytes: ...
+
+
+class _Decompressor(Protocol):
+    def decompress(self, data: bytes) -> bytes: ...
+
+
+class _ZlibCompressor:
+    def __init__(self, level: int = 6) -> None:
+        self._obj = zlib.compressobj(level)
+
+    def compress(self, data: bytes) -> bytes:
+        # A sync flush after every chunk lets the host decompress each chunk as
+        # soon as it arrives
+        return self._obj.compress(data) + self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def flush(self) -> bytes:
+        return self._obj.flush()
+
+
+class _ZstdCompressor:
+    def __init__(self, level: int = 3) -> None:
+        self._obj = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data) + self._obj.flush(  # type: ignore[no-any-return]
+            zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        )
+
+    def flush(self) -> bytes:
+        return self._obj.flush()  # type: ignore[no-any-return]
+
+
+def _new_compressor(algorithm: str) -> _Compressor:
+    if algorithm == "zstd":
+        return _ZstdCompressor()
+    return _ZlibCompressor()
+
+
+def _new_decompressor(algorithm: str) -> _Decompressor:
+    if algorithm == "zstd":
+        return zstandard.ZstdDecompressor().decompressobj()  # type: ignore[no-any-return]
+    return zlib.decompressobj()
+
+
+def available_compressions() -> list[str]:
+    """
+    Get the names of the compression algorithms available in this environment,
+    most preferred first.
+    """
+    algorithms = ["zlib"]
+    if zstandard is not None:
+        algorithms.insert(0, "zstd")
+    return algorithms
+
+
+def negotiate_compression(names: list[str]) -> str | None:
+    """
+    Pick the first algorithm from a list of names that is available here, or
+    None if there isn't one.
+    """
+    available = available_compressions()
+    for name in names:
+        if name in available:
+            return name
+    return None
+
+
+class CompressedResult:
+    """
+    A result being compressed in chunks by a background thread.
+
+    Returned by services in place of the result's bytes. The host reads the
+    compressed chunks through RPyC with `read()` until it returns None, which
+    `decompress_result()` does.
+
+    The result is closed, and compression stops, if the reader calls `close()`
+    or doesn't read anything for `read_timeout` seconds. Services also close
+    the results of a connection when it's closed.
+    """
+
+    def __init__(
+        self,
+        data: bytes,
+        algorithm: str,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        read_timeout: float = DEFAULT_READ_TIMEOUT,
+    ) -> None:
+        self.algorithm = algorithm
+        self.read_timeout = read_timeout
+        self.stats = CompressionStats(algorithm=algorithm, raw_bytes=len(data))
+
+        # Only a few chunks are compressed ahead of the reader, so that a reader
+        # that stops early doesn't leave the whole result compressed in memory
+        self._chunks: queue.Queue[bytes | None] = queue.Queue(maxsize=4)
+        self._closed = threading.Event()
+        self._thread = threading.Thread(
+            target=self._compress, args=(data, chunk_size), daemon=True
+        )
+        self._thread.start()
+
+    def read(self) -> bytes | None:
+        """
+        Get the next compressed chunk, or None once every chunk has been read.
+        """
+        while not self._closed.is_set():
+            try:
+                chunk = self._chunks.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            if chunk is None:
+                self._closed.set()
+            return chunk
+        return None
+
+    def get_stats_json(self) -> str:
+        """
+        Get the compression stats as JSON, so that they're passed by value.
+        """
+        return self.stats.model_dump_json()
+
+    def close(self) -> None:
+        """
+        Stop compressing, if the result isn't going to be read to the end.
+        """
+        self._closed.set()
+
+        # Unblock the compression thread if it's waiting for room in the queue
+        while not self._chunks.empty():
+            self._chunks.get_nowait()
+
+    def _compress(self, data: bytes, chunk_size: int) -> None:
+        compressor = _new_compressor(self.algorithm)
+        view = memoryview(data)
+        try:
+            for offset in range(0, len(data), chunk_size):
+                start = time.perf_counter()
+                chunk = compressor.compress(view[offset : offset + chunk_size])
+                self.stats.compress_seconds += time.perf_counter() - start
+                if not self._put(chunk):
+                    return
+
+            start = time.perf_counter()
+            chunk = compressor.flush()
+            self.stats.compress_seconds += time.perf_counter() - start
+            self._put(chunk)
+        finally:
+            self._put(None)
+
+    def _put(self, chunk: bytes | None) -> bool:
+        # Returns False if the result has been closed, or the reader has given up
+        if chunk is not None:
+            self.stats.chunks += 1
+            self.stats.compressed_bytes += len(chunk)
+
+        deadline = time.monotonic() + self.read_timeout
+        while not self._closed.is_set():
+            try:
+                self._chunks.put(chunk, timeout=0.5)
+                return True
+            except queue.Full:
+                if time.monotonic() > deadline:
+                    logger.warning(
+                        f"Closing compressed result after {self.read_timeout}s "
+                        "without being read"
+                    )
+                    self.close()
+        return False
+
+
+def iter_chunks(result: Any) -> Iterator[bytes]:
+    """
+    Iterate over the chunks of a (possibly remote) `CompressedResult`.
+    """
+    while (chunk := result.read()) is not None:
+        yield chunk
+
+
+def decompress_result(result: Any) -> tuple[bytes, CompressionStats]:
+    """
+    Read and decompress a `CompressedResult`, usually a netref to one on the
+    agent. Each chunk is decompressed as soon as it arrives.
+
+    :return: The result's bytes, and the compression stats.
+    """
+    algorithm = str(result.algorithm)
+    decompressor = _new_decompressor(algorithm)
+    decompress_seconds = 0.0
+    parts: list[bytes] = []
+    try:
+        for chunk in iter_chunks(result):
+            start = time.perf_counter()
+            parts.append(decompressor.decompress(chunk))
+            decompress_seconds += time.perf_counter() - start
+    finally:
+        result.close()
+
+    stats = CompressionStats.model_validate_json(result.get_stats_json())
+    stats.decompress_seconds = decompress_seconds
+    return b"".join(parts), stats
@@ -0,0 +1,55 @@
+"""
+Models describing the state of the agent's `DispatchService` and the services it
+has started.
+"""
+
+from typing import Literal
+
+from pydantic import BaseModel
+
+# "starting" - the service's process has been started, but isn't accepting
+#   connections yet (e.g. it's still importing its dependencies)
+# "ready" - the service is accepting connections on its port
+# "exited" - the service's process has exited
+ServiceState = Literal["starting", "ready", "exited"]
+
+# The instance of a service used when none is specified.
+DEFAULT_INSTANCE = "0"
+
+
+class ServiceStatus(BaseModel):
+    """
+    The status of a single instance of a service started by the dispatcher.
+    """
+
+    name: str
+    instance: str = DEFAULT_INSTANCE
+    port: int
+    state: ServiceState
+    pid: int | None = None
+
+    # Only set once the process has exited.
+    exit_code: int | None = None
+
+    # The number of times the service has been restarted after its process
+    # exited unexpectedly.
+    restarts: int = 0
+
+    # The number of open connections to the instance.
+    connections: int = 0
+
+
+class AgentStatus(BaseModel):
+    """
+    The status of the agent as a whole.
+
+    If this can be retrieved at all, the dispatcher is up and accepting requests.
+    """
+
+    # Every instance of every service that has been started. Instances whose
+    # process has exited are kept (in the "exited" state) until they're
+    # restarted.
+    services: list[ServiceStatus] = []
+
+    # The number of pre-spawned workers waiting to be handed out, by service name.
+    prespawned: dict[str, int] = {}
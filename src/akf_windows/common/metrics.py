@@ -0,0 +1,242 @@
+"""
+Per-method metrics for the exposed methods of the agent's services.
+
+Every `exposed_*` method of the `DispatchService` and of each `WindowsService`
+is wrapped with `instrument_exposed_methods()`, which records the call's latency,
+the size of its result and whether it raised. Service processes forward each
+call to the dispatcher, which aggregates them with a `MethodRecorder` and returns
+a `CallMetrics` summary to the host on request.
+"""
+
+import bisect
+import functools
+import inspect
+import threading
+import time
+from datetime import UTC, datetime
+from typing import Any, Callable
+
+from pydantic import AwareDatetime, BaseModel, Field
+
+from akf_windows.common.compression import CompressedResult
+from akf_windows.common.timing import SpanStats
+
+# The upper bounds of the latency histogram buckets, in seconds.
+LATENCY_BUCKETS: tuple[float, ...] = (
+    0.001,
+    0.005,
+    0.01,
+    0.05,
+    0.1,
+    0.5,
+    1.0,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+
+class MethodStats(SpanStats):
+    """
+    Aggregate metrics of every call to a single exposed method of a service.
+
+    `name` is the name of the method, without the "exposed_" prefix.
+    """
+
+    service: str
+
+    # The number of calls whose latency fell in each bucket of
+    # `LATENCY_BUCKETS`. The last entry counts calls slower than the last bucket.
+    latency_histogram: list[int] = Field(
+        default_factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1)
+    )
+
+    # The total and largest size of the results returned, in bytes. Results
+    # passed by reference (as netrefs) count as zero bytes, and compressed
+    # results count their uncompressed size.
+    result_bytes: int = 0
+    max_result_bytes: int = 0
+
+    def percentile(self, q: float) -> float:
+        """
+        Estimate a latency percentile from the histogram, as the upper bound of
+        the bucket it falls in.
+
+        :param q: The percentile, from 0 to 100.
+        """
+        target = self.count * q / 100
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.latency_histogram):
+            seen += count
+            if count and seen >= target:
+                return min(bound, self.max_seconds)
+        return self.max_seconds
+
+
+class CallMetrics(BaseModel):
+    """
+    A summary of the calls made to the agent's services.
+    """
+
+    # Keyed by "Service.method".
+    methods: dict[str, MethodStats] = {}
+
+    # When recording started (or was last reset), and when this summary was
+    # taken.
+    since: AwareDatetime
+    collected: AwareDatetime
+
+    # The bucket bounds used for every `MethodStats.latency_histogram`.
+    latency_buckets: list[float] = list(LATENCY_BUCKETS)
+
+    def summary(self) -> str:
+        """
+        Format the metrics as a table, methods with the most total time first.
+        """
+        lines = [
+            f"{'method':<48}{'calls':>7}{'errors':>7}{'total s':>10}"
+            f"{'mean s':>9}{'p95 s':>9}{'max s':>9}{'result MiB':>12}"
+        ]
+        for key, stats in sorted(
+            self.methods.items(), key=lambda item: item[1].total_seconds, reverse=True
+        ):
+            lines.append(
+                f"{key:<48}{stats.count:>7}{stats.errors:>7}"
+                f"{stats.total_seconds:>10.2f}{stats.mean_seconds:>9.3f}"
+                f"{stats.percentile(95):>9.3f}{stats.max_seconds:>9.3f}"
+                f"{stats.result_bytes / 2**20:>12.2f}"
+            )
+        return "\n".join(lines)
+
+
+class MethodRecorder:
+    """
+    A thread-safe recorder of calls to exposed methods.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._methods: dict[str, MethodStats] = {}
+        self._since = datetime.now(UTC)
+
+    def record(
+        self,
+        service: str,
+        method: str,
+        seconds: float,
+        result_bytes: int = 0,
+        error: bool = False,
+    ) -> None:
+        """
+        Record a single call to an exposed method.
+        """
+        key = f"{service}.{method}"
+        with self._lock:
+            stats = self._methods.get(key)
+            if stats is None:
+                stats = self._methods[key] = MethodStats(
+                    name=method,
+                    service=service,
+                    min_seconds=seconds,
+                    max_seconds=seconds,
+                )
+
+            stats.count += 1
+            stats.total_seconds += seconds
+            stats.min_seconds = min(stats.min_seconds, seconds)
+            stats.max_seconds = max(stats.max_seconds, seconds)
+            stats.errors += error
+            stats.latency_histogram[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            stats.result_bytes += result_bytes
+            stats.max_result_bytes = max(stats.max_result_bytes, result_bytes)
+
+    def get_metrics(self, reset: bool = False) -> CallMetrics:
+        """
+        Get a copy of the recorded metrics.
+
+        :param reset: If True, clear the recorded metrics afterwards.
+        """
+        now = datetime.now(UTC)
+        with self._lock:
+            result = CallMetrics(
+                methods={
+                    key: stats.model_copy(deep=True)
+                    for key, stats in self._methods.items()
+                },
+                since=self._since,
+                collected=now,
+            )
+            if reset:
+                self._methods.clear()
+                self._since = now
+        return result
+
+
+def payload_size(result: Any) -> int:
+    """
+    Get the size in bytes of a result passed by value, such as an encoded
+    result. Anything passed by reference counts as zero bytes.
+    """
+    if isinstance(result, (bytes, bytearray)):
+        return len(result)
+    if isinstance(result, str):
+        return len(result)
+    if isinstance(result, CompressedResult):
+        return result.stats.raw_bytes
+    if isinstance(result, tuple):
+        return sum(payload_size(item) for item in result)
+    return 0
+
+
+# The number of instrumented calls in progress on each thread. Exposed methods
+# often call other exposed methods (e.g. `exposed_collect_artifacts()` calling
+# `exposed_get_history()`), and only the outermost call is recorded, so that the
+# time and result of the nested ones aren't counted twice.
+_call_depth = threading.local()
+
+
+def _instrument(func: Callable[..., Any], method: str) -> Callable[..., Any]:
+    @functools.wraps(func)
+    def wrapper(self: Any, *args: Any, **kwargs: Any) -> Any:
+        depth = getattr(_call_depth, "depth", 0)
+        if depth:
+            return func(self, *args, **kwargs)
+
+        _call_depth.depth = depth + 1
+        start = time.perf_counter()
+        result = None
+        error = False
+        try:
+            result = func(self, *args, **kwargs)
+            return result
+        except BaseException:
+            error = True
+            raise
+        finally:
+            _call_depth.depth = depth
+            self.record_call(
+                method, time.perf_counter() - start, payload_size(result), error
+            )
+
+    wrapper.__akf_instrumented__ = True  # type: ignore[attr-defined]
+    return wrapper
+
+
+def instrument_exposed_methods(cls: type) -> None:
+    """
+    Wrap every `exposed_*` method of a service class (including inherited ones)
+    so that each call is passed to the class's `record_call(method, seconds,
+    result_bytes, error)` classmethod. Calls made from within another exposed
+    method aren't recorded separately. Methods that are already wrapped are left
+    alone, so this can be called again for subclasses.
+    """
+    for name in dir(cls):
+        if not name.startswith("exposed_"):
+            continue
+
+        func = inspect.getattr_static(cls, name)
+        if not inspect.isfunction(func) or getattr(func, "__akf_instrumented__", False):
+            continue
+
+        setattr(cls, name, _instrument(func, name.removeprefix("exposed_")))
@@ -0,0 +1,159 @@
+"""
+Timing spans for diagnosing where a service spends its time.
+
+Services record a span for each phase of their work (e.g. launching a browser or
+navigating to a URL) with a `TimingRecorder`, and return a `TimingStats` summary
+to the host on request.
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import UTC, datetime
+from typing import Iterator
+
+from pydantic import AwareDatetime, BaseModel
+
+
+class SpanStats(BaseModel):
+    """
+    Aggregate timings of every span recorded under a single name.
+    """
+
+    name: str
+    count: int = 0
+    total_seconds: float = 0.0
+    min_seconds: float = 0.0
+    max_seconds: float = 0.0
+
+    # The number of spans that ended with an exception.
+    errors: int = 0
+
+    @property
+    def mean_seconds(self) -> float:
+        return self.total_seconds / self.count if self.count else 0.0
+
+
+class TimingSpan(BaseModel):
+    """
+    A single recorded span.
+    """
+
+    name: str
+    started: AwareDatetime
+    seconds: float
+    error: bool = False
+
+    # Free-form details, such as the URL that was navigated to.
+    detail: str | None = None
+
+
+class TimingStats(BaseModel):
+    """
+    A summary of the spans recorded by a service.
+    """
+
+    spans: dict[str, SpanStats] = {}
+
+    # The most recent spans, oldest first.
+    recent: list[TimingSpan] = []
+
+    def summary(self) -> str:
+        """
+        Format the aggregate timings as a table, slowest phases first.
+        """
+        lines = [f"{'phase':<28}{'count':>7}{'total s':>10}{'mean s':>9}{'max s':>9}"]
+        for stats in sorted(
+            self.spans.values(), key=lambda s: s.total_seconds, reverse=True
+        ):
+            lines.append(
+                f"{stats.name:<28}{stats.count:>7}{stats.total_seconds:>10.2f}"
+                f"{stats.mean_seconds:>9.2f}{stats.max_seconds:>9.2f}"
+            )
+        return "\n".join(lines)
+
+
+class TimingRecorder:
+    """
+    A thread-safe recorder of timing spans.
+
+    Aggregate statistics are kept for every span name, along with the last
+    `max_recent` individual spans.
+    """
+
+    def __init__(self, max_recent: int = 1000) -> None:
+        self._lock = threading.Lock()
+        self._spans: dict[str, SpanStats] = {}
+        self._recent: deque[TimingSpan] = deque(maxlen=max_recent)
+
+    @contextmanager
+    def span(self, name: str, detail: str | None = None) -> Iterator[None]:
+        """
+        Record the time taken by the body of a `with` block.
+
+        Spans that raise an exception are still recorded, and counted as errors.
+        """
+        started = datetime.now(UTC)
+        start = time.perf_counter()
+        error = False
+        try:
+            yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self.record(name, time.perf_counter() - start, started, error, detail)
+
+    def record(
+        self,
+        name: str,
+        seconds: float,
+        started: datetime | None = None,
+        error: bool = False,
+        detail: str | None = None,
+    ) -> None:
+        """
+        Record a span that has already been timed.
+        """
+        if started is None:
+            started = datetime.now(UTC)
+
+        with self._lock:
+            stats = self._spans.get(name)
+            if stats is None:
+                stats = self._spans[name] = SpanStats(
+                    name=name, min_seconds=seconds, max_seconds=seconds
+                )
+
+            stats.count += 1
+            stats.total_seconds += seconds
+            stats.min_seconds = min(stats.min_seconds, seconds)
+            stats.max_seconds = max(stats.max_seconds, seconds)
+            stats.errors += error
+
+            self._recent.append(
+                TimingSpan(
+                    name=name,
+                    started=started,
+                    seconds=seconds,
+                    error=error,
+                    detail=detail,
+                )
+            )
+
+    def get_stats(self, reset: bool = False) -> TimingStats:
+        """
+        Get a copy of the recorded timings.
+
+        :param reset: If True, clear the recorded timings afterwards.
+        """
+        with self._lock:
+            result = TimingStats(
+                spans={name: stats.model_copy() for name, stats in self._spans.items()},
+                recent=list(self._recent),
+            )
+            if reset:
+                self._spans.clear()
+                self._recent.clear()
+        return result
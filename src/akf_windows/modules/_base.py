@@ -81,7 +81,7 @@ class ServiceStartModule(ServiceModule):
                 "State variable `akflib.hypervisor_var` not available, can't determine IP for auto_connect"
             )
         return auto_format(
-            f"{cls.service_api_var_name} = {cls.api_name()}.auto_connect({hypervisor_var}.get_maintenance_ip())",
+            f"{cls.service_api_var_name} = {cls.api_name()}.acquire({hypervisor_var}.get_maintenance_ip())",
             state,
         )
 
@@ -102,9 +102,7 @@ class ServiceStartModule(ServiceModule):
                 "State variable `akflib.hypervisor` not available, can't determine IP for auto_connect"
             )
 
-        win_artifact = cls.service_api_class.auto_connect(
-            hypervisor.get_maintenance_ip()
-        )
+        win_artifact = cls.service_api_class.acquire(hypervisor.get_maintenance_ip())
 
         state[cls.state_var] = win_artifact
 
@@ -130,7 +128,7 @@ class ServiceStopModule(ServiceModule):
             return ""
 
         del state[cls.state_var]
-        return auto_format(f"{cls.service_api_var_name}.rpyc_conn.close()", state)
+        return auto_format(f"{cls.service_api_var_name}.release()", state)
 
     @classmethod
     def execute(
@@ -145,7 +143,10 @@ class ServiceStopModule(ServiceModule):
 
         service_api = state[cls.state_var]
         assert isinstance(service_api, WindowsServiceAPI)
-        service_api.rpyc_conn.close()
 
-        del state[cls.state_var]
+        # The object is gone from the state even if releasing it fails
+        try:
+            service_api.release()
+        finally:
+            del state[cls.state_var]
         logger.info(f"Deleted {cls.api_name()} object")
@@ -3,6 +3,7 @@ Declarative modules for collecting Windows artifacts.
 """
 
 import logging
+from contextlib import ExitStack
 from pathlib import Path
 from typing import Any, ClassVar
 
@@ -106,7 +107,7 @@ class PrefetchModule(AKFModule[PrefetchModuleArgs, NullConfig]):
             # Generate temporary object. Don't add it to the state and don't modify
             # the indentation; we want it to close as soon as we're done.
             indent_code = True
-            result += f"with WindowsArtifactServiceAPI.auto_connect({hypervisor_var}.get_maintenance_ip()) as win_artifact:\n"
+            result += f"with WindowsArtifactServiceAPI.acquire({hypervisor_var}.get_maintenance_ip()) as win_artifact:\n"
             win_artifact_var = "win_artifact"
         else:
             # Use the existing object.
@@ -141,31 +142,30 @@ class PrefetchModule(AKFModule[PrefetchModuleArgs, NullConfig]):
         # Check that a WindowsArtifactServiceAPI object is available. If it
         # isn't, create a temporary context manager. (This, of course, requires
         # that a machine is available with `akflib.machine`.)
-        close_win_artifact = False
-        if "akf_windows.artifacts.artifact_service" not in state:
-            hypervisor = cls.get_hypervisor(state)
-            if hypervisor is None:
-                raise ValueError(
-                    "State variable `akflib.hypervisor` not available, can't determine IP"
+        with ExitStack() as stack:
+            if "akf_windows.artifacts.artifact_service" not in state:
+                hypervisor = cls.get_hypervisor(state)
+                if hypervisor is None:
+                    raise ValueError(
+                        "State variable `akflib.hypervisor` not available, can't determine IP"
+                    )
+
+                hypervisor = state["akflib.hypervisor"]
+                assert isinstance(hypervisor, HypervisorABC)
+
+                stack.callback(
+                    logger.info, "Closed temporary WindowsArtifactServiceAPI object"
+                )
+                win_artifact = stack.enter_context(
+                    WindowsArtifactServiceAPI.acquire(hypervisor.get_maintenance_ip())
                 )
 
-            hypervisor = state["akflib.hypervisor"]
-            assert isinstance(hypervisor, HypervisorABC)
-
-            win_artifact = WindowsArtifactServiceAPI.auto_connect(
-                hypervisor.get_maintenance_ip()
-            )
-
-            logger.info("Creating temporary WindowsArtifactServiceAPI object")
-            close_win_artifact = True
-        else:
-            win_artifact = state["akf_windows.artifacts.artifact_service"]
-            assert isinstance(win_artifact, WindowsArtifactServiceAPI)
+                logger.info("Creating temporary WindowsArtifactServiceAPI object")
+            else:
+                win_artifact = state["akf_windows.artifacts.artifact_service"]
+                assert isinstance(win_artifact, WindowsArtifactServiceAPI)
 
-        prefetch_objs = win_artifact.collect_prefetch_dir(args.prefetch_folder)
-        if close_win_artifact:
-            win_artifact.rpyc_conn.close()
-            logger.info("Closed temporary WindowsArtifactServiceAPI object")
+            prefetch_objs = win_artifact.collect_prefetch_dir(args.prefetch_folder)
 
         # Add all objects to the bundle
         bundle.add_objects(prefetch_objs)
@@ -3,8 +3,8 @@ Declarative modules for interacting with Chromium browsers.
 """
 
 import logging
-import random
 import time
+from contextlib import ExitStack
 from pathlib import Path
 from typing import Any, ClassVar, Literal
 
@@ -13,6 +13,12 @@ from akflib.declarative.core import AKFModule, AKFModuleArgs, NullConfig
 from akflib.declarative.util import auto_format
 
 from akf_windows.api.chromium import ChromiumServiceAPI
+from akf_windows.common.chromium import (
+    ALL_CHROMIUM_ARTIFACTS,
+    ChromiumArtifactType,
+    HarOptions,
+    WaitPolicy,
+)
 from akf_windows.modules._base import ServiceStartModule, ServiceStopModule
 
 logger = logging.getLogger(__name__)
@@ -73,6 +79,23 @@ class ChromiumVisitURLsModuleArgs(AKFModuleArgs):
     # The wait time will never be less than 1 second.
     jitter: int = 0
 
+    # The number of pages (tabs) to visit URLs with at once. The wait after each
+    # visit overlaps between pages, so large lists finish much sooner.
+    concurrency: int = 1
+
+    # If true, navigations are started in the same order as `urls`, so that the
+    # visit times recorded in the browser history keep that order.
+    ordered: bool = True
+
+    # Wait for each page to become ready (e.g. the `load` event), then stay on it
+    # for a minimum dwell time plus jitter, instead of sleeping for a fixed time.
+    # If set, `wait_time` and `jitter` are ignored.
+    wait: WaitPolicy | None = None
+
+    # Record the traffic of the visits to a HAR archive on the agent, or replay
+    # it from one instead of fetching the URLs from the network.
+    har: HarOptions | None = None
+
 
 class ChromiumVisitURLsModule(AKFModule[ChromiumVisitURLsModuleArgs, NullConfig]):
     """
@@ -88,8 +111,8 @@ class ChromiumVisitURLsModule(AKFModule[ChromiumVisitURLsModuleArgs, NullConfig]
 
     dependencies: ClassVar[set[str]] = {
         "akf_windows.api.chromium.ChromiumServiceAPI",
-        "time",
-        "random",
+        "akf_windows.common.chromium.HarOptions",
+        "akf_windows.common.chromium.WaitPolicy",
         "pathlib.Path",
     }
 
@@ -133,11 +156,25 @@ class ChromiumVisitURLsModule(AKFModule[ChromiumVisitURLsModuleArgs, NullConfig]
         if args.browser == "msedge":
             result += "chromium_service.kill_edge()\n"
         result += f'chromium_service.set_browser("{args.browser}")\n'
-        result += "page = chromium_service.browser.new_page()\n"
-        result += "\n"
-        result += "for url in urls:\n"
-        result += "    page.goto(url)\n"
-        result += f"    time.sleep({args.wait_time} + random.randint(-{args.jitter}, {args.jitter}))\n"
+
+        visit_code = "visits = chromium_service.visit_urls(\n"
+        visit_code += "    urls,\n"
+        visit_code += f"    wait_time={args.wait_time},\n"
+        visit_code += f"    jitter={args.jitter},\n"
+        visit_code += f"    concurrency={args.concurrency},\n"
+        visit_code += f"    ordered={args.ordered},\n"
+        if args.wait is not None:
+            visit_code += f"    wait={args.wait!r},\n"
+        visit_code += ")\n"
+
+        if args.har is None:
+            result += visit_code
+        else:
+            result += f"chromium_service.start_har({args.har!r})\n"
+            result += "try:\n"
+            result += "".join(f"    {line}\n" for line in visit_code.splitlines())
+            result += "finally:\n"
+            result += "    chromium_service.stop_har()\n"
 
         if "akf_windows.chromium.chromium_service" not in state:
             hypervisor_var = cls.get_hypervisor_var(state)
@@ -151,7 +188,7 @@ class ChromiumVisitURLsModule(AKFModule[ChromiumVisitURLsModuleArgs, NullConfig]
             result = auto_format(result, state)
             state["indentation_level"] -= 1
             result = (
-                f"with ChromiumServiceAPI.auto_connect({hypervisor_var}.get_maintenance_ip()) as chromium_service:\n"
+                f"with ChromiumServiceAPI.acquire({hypervisor_var}.get_maintenance_ip()) as chromium_service:\n"
                 + result
             )
 
@@ -194,43 +231,69 @@ class ChromiumVisitURLsModule(AKFModule[ChromiumVisitURLsModuleArgs, NullConfig]
 
         # Check that a ChromiumServiceAPI object is available. If it isn't,
         # create a temporary context manager.
-        close_chromium_service = False
-        if "akf_windows.chromium.chromium_service" not in state:
-            hypervisor = cls.get_hypervisor(state)
-            if hypervisor is None:
-                raise ValueError(
-                    "State variable `akflib.hypervisor` not available, can't determine IP"
+        with ExitStack() as stack:
+            if "akf_windows.chromium.chromium_service" not in state:
+                hypervisor = cls.get_hypervisor(state)
+                if hypervisor is None:
+                    raise ValueError(
+                        "State variable `akflib.hypervisor` not available, can't determine IP"
+                    )
+
+                hypervisor = state["akflib.hypervisor"]
+                assert isinstance(hypervisor, HypervisorABC)
+
+                logger.info("Creating temporary ChromiumServiceAPI object")
+                stack.callback(
+                    logger.info, "Closed temporary ChromiumServiceAPI object"
                 )
-
-            hypervisor = state["akflib.hypervisor"]
-            assert isinstance(hypervisor, HypervisorABC)
-
-            logger.info("Creating temporary ChromiumServiceAPI object")
-            chromium_service = ChromiumServiceAPI.auto_connect(
-                hypervisor.get_maintenance_ip()
+                chromium_service = stack.enter_context(
+                    ChromiumServiceAPI.acquire(hypervisor.get_maintenance_ip())
+                )
+            else:
+                chromium_service = state["akf_windows.chromium.chromium_service"]
+                assert isinstance(chromium_service, ChromiumServiceAPI)
+
+            # Visit the URLs.
+            if args.browser == "msedge":
+                logger.info("Killing existing Edge processes")
+                chromium_service.kill_edge()
+
+            chromium_service.set_browser(args.browser)
+            logger.info(f"Opening {args.browser=}")
+
+            if args.har is not None:
+                logger.info(f"Starting HAR {args.har.mode} ({args.har.path})")
+                chromium_service.start_har(args.har)
+
+            start = time.perf_counter()
+            try:
+                visits = chromium_service.visit_urls(
+                    args.urls,
+                    wait_time=args.wait_time,
+                    jitter=args.jitter,
+                    concurrency=args.concurrency,
+                    ordered=args.ordered,
+                    wait=args.wait,
+                )
+            finally:
+                if args.har is not None:
+                    chromium_service.stop_har()
+
+            for visit in visits:
+                status = "failed" if visit.error else "ok"
+                timing = f" ({visit.timing.summary()})" if visit.timing else ""
+                logger.info(
+                    f"{visit.url}: {status}, page {visit.page}, navigation "
+                    f"{visit.navigation_seconds:.2f}s{timing}, dwell "
+                    f"{visit.dwell_seconds:.2f}s"
+                )
+            logger.info(
+                f"Visited {len(visits)} URLs with {args.concurrency} page(s) in "
+                f"{time.perf_counter() - start:.2f}s"
             )
-            close_chromium_service = True
-        else:
-            chromium_service = state["akf_windows.chromium.chromium_service"]
-            assert isinstance(chromium_service, ChromiumServiceAPI)
 
-        # Visit the URLs.
-        if args.browser == "msedge":
-            logger.info("Killing existing Edge processes")
-            chromium_service.kill_edge()
-
-        chromium_service.set_browser(args.browser)
-        logger.info(f"Opening {args.browser=}")
-        page = chromium_service.browser.new_page()
-
-        for url in args.urls:
-            logger.info(f"Visiting {url}")
-            page.goto(url)
-            time.sleep(args.wait_time + random.randint(-args.jitter, args.jitter))
-
-        if close_chromium_service:
-            chromium_service.rpyc_conn.close()
-            logger.info("Closed temporary ChromiumServiceAPI object")
+            stats = chromium_service.get_stats()
+            logger.info(f"Chromium service timings:\n{stats.summary()}")
 
 
 class ChromiumHistoryModuleArgs(AKFModuleArgs):
@@ -284,7 +347,7 @@ class ChromiumHistoryModule(AKFModule[ChromiumHistoryModuleArgs, NullConfig]):
             result = auto_format(result, state)
             state["indentation_level"] -= 1
             result = (
-                f"with ChromiumServiceAPI.auto_connect({hypervisor_var}.get_maintenance_ip()) as chromium_service:\n"
+                f"with ChromiumServiceAPI.acquire({hypervisor_var}.get_maintenance_ip()) as chromium_service:\n"
                 + result
             )
 
@@ -309,32 +372,143 @@ class ChromiumHistoryModule(AKFModule[ChromiumHistoryModuleArgs, NullConfig]):
         #
         # TODO: generalize this "create a temporary service" pattern into a
         # context manager that accepts `state`
-        close_chromium_service = False
+        with ExitStack() as stack:
+            if "akf_windows.chromium.chromium_service" not in state:
+                hypervisor = cls.get_hypervisor(state)
+                if hypervisor is None:
+                    raise ValueError(
+                        "State variable `akflib.hypervisor` not available, can't determine IP"
+                    )
+
+                hypervisor = state["akflib.hypervisor"]
+                assert isinstance(hypervisor, HypervisorABC)
+
+                logger.info("Creating temporary ChromiumServiceAPI object")
+                stack.callback(
+                    logger.info, "Closed temporary ChromiumServiceAPI object"
+                )
+                chromium_service = stack.enter_context(
+                    ChromiumServiceAPI.acquire(hypervisor.get_maintenance_ip())
+                )
+            else:
+                chromium_service = state["akf_windows.chromium.chromium_service"]
+                assert isinstance(chromium_service, ChromiumServiceAPI)
+
+            # Collect the history.
+            history = chromium_service.get_history(args.browser, args.history_path)
+
+        # Add the history to the bundle.
+        bundle.add_object(history)
+
+
+class ChromiumArtifactsModuleArgs(AKFModuleArgs):
+    browser: Literal["chrome", "msedge"] = "msedge"
+    profile: str = "Default"
+
+    # The artifacts to collect from a single snapshot of the profile.
+    artifacts: list[ChromiumArtifactType] = list(ALL_CHROMIUM_ARTIFACTS)
+
+
+class ChromiumArtifactsModule(AKFModule[ChromiumArtifactsModuleArgs, NullConfig]):
+    """
+    Collect several artifacts (history, downloads, cookies, top sites) from a
+    single snapshot of a Chromium profile and update an existing AKFBundle.
+
+    Autofill entries have no CASE equivalent, so they are not added to the bundle.
+    """
+
+    aliases = ["chromium_artifacts"]
+    arg_model = ChromiumArtifactsModuleArgs
+    config_model = NullConfig
+
+    dependencies: ClassVar[set[str]] = {
+        "akf_windows.api.chromium.ChromiumServiceAPI",
+    }
+
+    @classmethod
+    def generate_code(
+        cls,
+        args: ChromiumArtifactsModuleArgs,
+        config: NullConfig,
+        state: dict[str, Any],
+    ) -> str:
+        bundle_var = cls.get_akf_bundle_var(state)
+        if bundle_var is None:
+            logger.warning(
+                "Executing ChromiumArtifactsModule without a bundle won't do anything - skipping!"
+            )
+            return "# No CASE bundle was available, so no code was generated"
+
+        result = ""
+
+        result += f'artifacts = chromium_service.collect_artifacts("{args.browser}", "{args.profile}", {args.artifacts})\n'
+        result += f"{bundle_var}.add_objects(artifacts.case_objects())\n"
+
         if "akf_windows.chromium.chromium_service" not in state:
-            hypervisor = cls.get_hypervisor(state)
-            if hypervisor is None:
+            hypervisor_var = cls.get_hypervisor_var(state)
+            if hypervisor_var is None:
                 raise ValueError(
                     "State variable `akflib.hypervisor` not available, can't determine IP"
                 )
 
-            hypervisor = state["akflib.hypervisor"]
-            assert isinstance(hypervisor, HypervisorABC)
+            # Temporarily kick up indent
+            state["indentation_level"] += 1
+            result = auto_format(result, state)
+            state["indentation_level"] -= 1
+            result = (
+                f"with ChromiumServiceAPI.acquire({hypervisor_var}.get_maintenance_ip()) as chromium_service:\n"
+                + result
+            )
+
+        return auto_format(result, state)
 
-            logger.info("Creating temporary ChromiumServiceAPI object")
-            chromium_service = ChromiumServiceAPI.auto_connect(
-                hypervisor.get_maintenance_ip()
+    @classmethod
+    def execute(
+        cls,
+        args: ChromiumArtifactsModuleArgs,
+        config: NullConfig,
+        state: dict[str, Any],
+    ) -> None:
+        bundle = cls.get_akf_bundle(state)
+        if bundle is None:
+            logger.warning(
+                "Executing ChromiumArtifactsModule without a bundle won't do anything - skipping!"
             )
-            close_chromium_service = True
-        else:
-            chromium_service = state["akf_windows.chromium.chromium_service"]
-            assert isinstance(chromium_service, ChromiumServiceAPI)
+            return
 
-        # Collect the history.
-        history = chromium_service.get_history(args.browser, args.history_path)
+        # Check that a ChromiumServiceAPI object is available. If it isn't,
+        # create a temporary context manager.
+        with ExitStack() as stack:
+            if "akf_windows.chromium.chromium_service" not in state:
+                hypervisor = cls.get_hypervisor(state)
+                if hypervisor is None:
+                    raise ValueError(
+                        "State variable `akflib.hypervisor` not available, can't determine IP"
+                    )
+
+                hypervisor = state["akflib.hypervisor"]
+                assert isinstance(hypervisor, HypervisorABC)
+
+                logger.info("Creating temporary ChromiumServiceAPI object")
+                stack.callback(
+                    logger.info, "Closed temporary ChromiumServiceAPI object"
+                )
+                chromium_service = stack.enter_context(
+                    ChromiumServiceAPI.acquire(hypervisor.get_maintenance_ip())
+                )
+            else:
+                chromium_service = state["akf_windows.chromium.chromium_service"]
+                assert isinstance(chromium_service, ChromiumServiceAPI)
 
-        if close_chromium_service:
-            chromium_service.rpyc_conn.close()
-            logger.info("Closed temporary ChromiumServiceAPI object")
+            # Collect all artifacts from one snapshot of the profile.
+            artifacts = chromium_service.collect_artifacts(
+                args.browser, args.profile, args.artifacts
+            )
 
-        # Add the history to the bundle.
-        bundle.add_object(history)
+        if artifacts.autofill:
+            logger.info(
+                f"Collected {len(artifacts.autofill)} autofill entries, which are not added to the bundle"
+            )
+
+        # Add the artifacts to the bundle.
+        bundle.add_objects(artifacts.case_objects())
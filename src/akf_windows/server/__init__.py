@@ -1,6 +1,19 @@
 import multiprocessing
 
-from akf_windows.server.main import main
+
+def main() -> None:
+    """
+    Start the Windows agent.
+
+    The agent is imported here rather than at the top of the module so that
+    individual services (e.g. `akf_windows.server.chromium`) can be imported
+    without also importing every other service's dependencies, some of which
+    are only available on Windows.
+    """
+    from akf_windows.server.main import main as agent_main
+
+    agent_main()
+
 
 if __name__ == "__main__":
     # On Windows calling this function is necessary.
@@ -0,0 +1,146 @@
+"""
+Base class for all services run by the Windows agent.
+"""
+
+import json
+import queue
+import weakref
+from typing import Any, ClassVar
+
+import rpyc
+from akflib.core.agents.server import AKFService
+
+from akf_windows.common.codec import encode_result, negotiate_codec
+from akf_windows.common.compression import (
+    DEFAULT_THRESHOLD,
+    CompressedResult,
+    negotiate_compression,
+)
+from akf_windows.common.metrics import instrument_exposed_methods
+
+
+class WindowsService(AKFService):
+    """
+    Base class for the services started by the `DispatchService`.
+
+    Keeps count of the open connections to the service's process, which the
+    dispatcher uses to balance clients between instances of the same service,
+    and tracks the codec and compression each connection has asked for its
+    results in. Subclasses that override `on_connect()` or `on_disconnect()`
+    must call the base implementation.
+
+    Every `exposed_*` method of a subclass is instrumented, and its calls are
+    reported to the dispatcher (see `akf_windows.common.metrics`).
+    """
+
+    # A `multiprocessing.Value` shared with the dispatcher, set when the service
+    # is started by it. There is one per process, and therefore one per instance.
+    connection_count: ClassVar[Any] = None
+
+    # A `multiprocessing.Queue` shared with the dispatcher, set when the service
+    # is started by it. Each call to an exposed method is put on it.
+    metrics_queue: ClassVar[Any] = None
+
+    # The codec used by `encode_result()`, until the client negotiates another
+    # one for its connection
+    result_codec: str = "pickle"
+
+    # The algorithm used to compress encoded results of at least
+    # `compression_threshold` bytes. Results aren't compressed until the client
+    # negotiates an algorithm for its connection.
+    compression: str | None = None
+    compression_threshold: int = DEFAULT_THRESHOLD
+
+    # The compressed results returned on this connection that may still be
+    # being read, closed when the connection is
+    compressed_results: "weakref.WeakSet[CompressedResult] | None" = None
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        instrument_exposed_methods(cls)
+
+    def on_connect(self, conn: rpyc.Connection) -> None:
+        self._add_connections(1)
+
+    def on_disconnect(self, conn: rpyc.Connection) -> None:
+        self._add_connections(-1)
+
+        # Stop compressing results that the client will never read
+        for result in list(self.compressed_results or ()):
+            result.close()
+
+    def exposed_negotiate_codec(self, codecs_json: str) -> str:
+        """
+        Pick the codec to encode large results in for this connection.
+
+        :param codecs_json: A JSON list of the codecs the client supports, most
+            preferred first.
+        :return: The name of the codec that will be used.
+        """
+        self.result_codec = negotiate_codec(json.loads(codecs_json))
+        return self.result_codec
+
+    def exposed_negotiate_compression(
+        self, algorithms_json: str, threshold: int = DEFAULT_THRESHOLD
+    ) -> str | None:
+        """
+        Pick the algorithm to compress large results with for this connection.
+
+        :param algorithms_json: A JSON list of the compression algorithms the
+            client supports, most preferred first. An empty list disables
+            compression.
+        :param threshold: The size in bytes of the smallest encoded result to
+            compress.
+        :return: The name of the algorithm that will be used, or None if
+            results won't be compressed.
+        """
+        self.compression = negotiate_compression(json.loads(algorithms_json))
+        self.compression_threshold = threshold
+        return self.compression
+
+    def encode_result(self, obj: Any) -> bytes | CompressedResult:
+        """
+        Encode a result (typically a list of CASE objects) with the codec
+        negotiated by the client, to be decoded with `decode_result()`.
+
+        If the client negotiated compression and the encoded result is large
+        enough, the result is returned as a `CompressedResult`, which the client
+        reads in chunks while it's being compressed.
+        """
+        data = encode_result(obj, self.result_codec)
+        if self.compression is None or len(data) < self.compression_threshold:
+            return data
+
+        result = CompressedResult(data, self.compression)
+        if self.compressed_results is None:
+            self.compressed_results = weakref.WeakSet()
+        self.compressed_results.add(result)
+        return result
+
+    @classmethod
+    def record_call(
+        cls, method: str, seconds: float, result_bytes: int, error: bool
+    ) -> None:
+        """
+        Report a call to an exposed method to the dispatcher. Calls aren't
+        recorded if the service wasn't started by the dispatcher.
+        """
+        if cls.metrics_queue is None:
+            return
+
+        try:
+            cls.metrics_queue.put_nowait(
+                (cls.__name__, method, seconds, result_bytes, error)
+            )
+        except queue.Full:
+            # The dispatcher has fallen behind; drop the call rather than
+            # stalling the service
+            pass
+
+    @classmethod
+    def _add_connections(cls, delta: int) -> None:
+        if cls.connection_count is None:
+            return
+
+        with cls.connection_count.get_lock():
+            cls.connection_count.value += delta
@@ -0,0 +1,438 @@
+"""
+A long-lived Playwright runtime that is shared by every connection to a service.
+
+Starting Playwright and launching a persistent browser context takes several
+seconds, so rather than doing this for each RPyC connection, a single runtime per
+service process keeps one Playwright instance (and any browser contexts launched
+from it) alive across connections. Contexts that haven't been used by any
+connection for a while are closed automatically.
+
+`PlaywrightRuntime` uses Playwright's sync API, so only one Playwright call runs
+at a time. `AsyncPlaywrightRuntime` uses the async API instead, so calls made by
+different connections are interleaved on a single event loop.
+"""
+
+import asyncio
+import inspect
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable, TypeVar
+
+from playwright.async_api import async_playwright
+from playwright.sync_api import BrowserContext, Playwright, sync_playwright
+
+from akf_windows.common.timing import TimingRecorder
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# The key used to identify a browser context: (browser type, profile).
+ContextKey = tuple[str, str]
+
+
+class ThreadBoundProxy:
+    """
+    A proxy for a Playwright object that runs every access on the runtime's
+    worker thread.
+
+    Playwright's sync API can only be used from the thread that started it, but
+    RPyC serves each connection on its own thread. Clients are given these
+    proxies instead of the Playwright objects themselves; attribute accesses and
+    calls made through a proxy are forwarded to the worker thread, and any
+    Playwright objects they return are wrapped in proxies as well.
+    """
+
+    __slots__ = ("_obj", "_runtime")
+
+    def __init__(self, obj: Any, runtime: "PlaywrightRuntime") -> None:
+        object.__setattr__(self, "_obj", obj)
+        object.__setattr__(self, "_runtime", runtime)
+
+    def __getattr__(self, name: str) -> Any:
+        return self._runtime.wrap(self._runtime.run(getattr, self._obj, name))
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        self._runtime.run(setattr, self._obj, name, unwrap(value))
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        args = tuple(unwrap(arg) for arg in args)
+        kwargs = {k: unwrap(v) for k, v in kwargs.items()}
+        return self._runtime.wrap(self._runtime.run(self._obj, *args, **kwargs))
+
+    # Special methods are looked up on the type, so they can't be forwarded by
+    # `__getattr__`. These cover the ones clients use with Playwright objects
+    # (e.g. `with page.expect_download() as download_info: ...`).
+    def __enter__(self) -> Any:
+        return self._runtime.wrap(self._runtime.enter(self._obj))
+
+    def __exit__(self, *args: Any) -> Any:
+        return self._runtime.exit(self._obj, *args)
+
+    def __iter__(self) -> Any:
+        return iter(self._runtime.wrap(self._runtime.run(list, self._obj)))
+
+    def __len__(self) -> int:
+        return self._runtime.run(len, self._obj)  # type: ignore[no-any-return]
+
+    def __getitem__(self, key: Any) -> Any:
+        return self._runtime.wrap(self._runtime.run(self._obj.__getitem__, key))
+
+    def __bool__(self) -> bool:
+        return self._runtime.run(bool, self._obj)  # type: ignore[no-any-return]
+
+    def __eq__(self, other: object) -> bool:
+        return self._obj == unwrap(other)  # type: ignore[no-any-return]
+
+    def __hash__(self) -> int:
+        return hash(self._obj)
+
+    def __repr__(self) -> str:
+        return self._runtime.run(repr, self._obj)  # type: ignore[no-any-return]
+
+    def __str__(self) -> str:
+        return self._runtime.run(str, self._obj)  # type: ignore[no-any-return]
+
+
+def unwrap(value: Any) -> Any:
+    """
+    Get the underlying object of a ThreadBoundProxy, or return the value as-is.
+    """
+    if isinstance(value, ThreadBoundProxy):
+        return object.__getattribute__(value, "_obj")
+    return value
+
+
+@dataclass
+class ContextEntry:
+    """
+    A browser context kept alive by the runtime.
+    """
+
+    context: BrowserContext
+    options: Hashable
+
+    # The number of connections currently using this context.
+    leases: int = 0
+    last_used: float = 0.0
+    closed: bool = False
+
+
+class PlaywrightRuntime:
+    """
+    A Playwright instance and its browser contexts, shared across connections.
+
+    All Playwright calls are run on a single worker thread owned by the runtime
+    (see `ThreadBoundProxy`). Contexts are keyed by (browser type, profile); a
+    context is leased by a connection with `acquire_context()` and handed back
+    with `release_context()`. Contexts with no leases are closed after
+    `idle_timeout` seconds.
+
+    Starting Playwright, launching, and closing contexts are recorded as
+    timing spans in `timings`.
+
+    Functions in `close_callbacks` are called with the key and launch options of
+    every context once it's closed, by any means: `close_contexts()`, eviction,
+    relaunching with other options, or the browser being closed by hand. They
+    may be called on the worker thread, so they must not make Playwright calls.
+    """
+
+    def __init__(
+        self, idle_timeout: float = 300.0, timings: TimingRecorder | None = None
+    ) -> None:
+        self.idle_timeout = idle_timeout
+        self.timings = timings if timings is not None else TimingRecorder()
+
+        self.contexts: dict[ContextKey, ContextEntry] = {}
+        self.playwright: Playwright | None = None
+        self.close_callbacks: list[Callable[[ContextKey, Hashable], None]] = []
+
+        # Guards `contexts` and `playwright`
+        self._lock = threading.RLock()
+
+        self._worker_ident = self._start_worker()
+
+        self._stopped = threading.Event()
+        self._evictor = threading.Thread(
+            target=self._evict_idle_loop, name="playwright-evictor", daemon=True
+        )
+        self._evictor.start()
+
+    def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """
+        Run a function on the worker thread and return its result.
+        """
+        if threading.get_ident() == self._worker_ident:
+            # Already on the worker thread (e.g. from a Playwright event handler)
+            return func(*args, **kwargs)
+
+        return self._executor.submit(func, *args, **kwargs).result()
+
+    def enter(self, obj: Any) -> Any:
+        """
+        Enter a Playwright context manager on the worker thread.
+        """
+        return self.run(obj.__enter__)
+
+    def exit(self, obj: Any, *args: Any) -> Any:
+        """
+        Exit a Playwright context manager on the worker thread.
+        """
+        return self.run(obj.__exit__, *args)
+
+    def wrap(self, value: Any) -> Any:
+        """
+        Wrap Playwright objects (and lists of them) in ThreadBoundProxy objects.
+
+        Plain values, such as strings and numbers, are returned as-is.
+        """
+        if isinstance(value, list):
+            return [self.wrap(item) for item in value]
+
+        if callable(value) or type(value).__module__.startswith("playwright."):
+            return ThreadBoundProxy(value, self)
+
+        return value
+
+    def get_playwright(self) -> Playwright:
+        """
+        Get the Playwright instance, starting it if necessary.
+
+        Note that this returns the instance itself, which may only be used on
+        the worker thread.
+        """
+        with self._lock:
+            if self.playwright is None:
+                start = time.perf_counter()
+                with self.timings.span("playwright.start"):
+                    self.playwright = self.run(self._start_playwright)
+                logger.info(f"Started Playwright in {time.perf_counter() - start:.2f}s")
+            return self.playwright
+
+    def acquire_context(
+        self,
+        browser_type: str,
+        profile: str,
+        launch: Callable[[Playwright], BrowserContext],
+        options: Hashable = (),
+    ) -> BrowserContext:
+        """
+        Lease the browser context for a browser and profile, launching it if it
+        isn't already running.
+
+        Only one context per browser type can be open at a time (they would share
+        the same user data directory), so launching a context closes any other
+        context of the same browser, even if it is in use.
+
+        :param browser_type: The browser type (distribution channel).
+        :param profile: The profile directory name.
+        :param launch: Called on the worker thread with the Playwright instance
+            to launch the context, if needed.
+        :param options: The options `launch` was built with. If a running context
+            was launched with different options, it is closed and relaunched.
+        :return: A proxy for the context, which is safe to hand to clients.
+        """
+        key = (browser_type, profile)
+
+        with self._lock:
+            entry = self.contexts.get(key)
+            if entry is not None and (entry.closed or entry.options != options):
+                self._close_entry(key)
+                entry = None
+
+            if entry is None:
+                for other_key in list(self.contexts):
+                    if other_key[0] == browser_type:
+                        self._close_entry(other_key)
+
+                playwright = self.get_playwright()
+
+                start = time.perf_counter()
+                with self.timings.span("browser.launch", f"{browser_type} ({profile})"):
+                    context = self.run(launch, playwright)
+                logger.info(
+                    f"Launched {browser_type} ({profile}) in {time.perf_counter() - start:.2f}s"
+                )
+
+                entry = ContextEntry(context, options)
+                self.run(context.on, "close", lambda _: self._mark_closed(key, entry))
+                self.contexts[key] = entry
+            else:
+                logger.info(f"Re-attached to warm {browser_type} ({profile}) context")
+
+            entry.leases += 1
+            entry.last_used = time.monotonic()
+
+            return self.wrap(entry.context)  # type: ignore[no-any-return]
+
+    def release_context(self, browser_type: str, profile: str) -> None:
+        """
+        Hand back a context leased with `acquire_context()`.
+
+        The context is kept open. When no connection is using it anymore, all
+        but one of its pages are closed, so that it starts from a clean window
+        the next time it is leased.
+        """
+        key = (browser_type, profile)
+
+        with self._lock:
+            entry = self.contexts.get(key)
+            if entry is None:
+                return
+
+            entry.leases = max(entry.leases - 1, 0)
+            entry.last_used = time.monotonic()
+
+            if entry.leases == 0 and not entry.closed:
+                try:
+                    with self.timings.span("browser.trim_pages"):
+                        self._trim_pages(entry.context)
+                except Exception as e:
+                    logger.warning(f"Could not close pages of {key}: {e}")
+
+    def close_contexts(self, browser_type: str | None = None) -> None:
+        """
+        Close every context (regardless of leases), or only the contexts of the
+        specified browser type.
+        """
+        with self._lock:
+            for key in list(self.contexts):
+                if browser_type is None or key[0] == browser_type:
+                    self._close_entry(key)
+
+    def evict_idle(self) -> None:
+        """
+        Close all contexts that have had no leases for `idle_timeout` seconds.
+        """
+        now = time.monotonic()
+        with self._lock:
+            for key, entry in list(self.contexts.items()):
+                if entry.leases == 0 and now - entry.last_used >= self.idle_timeout:
+                    logger.info(f"Closing idle {key[0]} ({key[1]}) context")
+                    self._close_entry(key)
+
+    def stop(self) -> None:
+        """
+        Close all contexts, stop Playwright and shut down the worker thread.
+        """
+        self._stopped.set()
+        with self._lock:
+            self.close_contexts()
+            if self.playwright is not None:
+                self.run(self.playwright.stop)
+                self.playwright = None
+        self._stop_worker()
+
+    def _start_worker(self) -> int:
+        # Start the thread that all Playwright calls are run on, and return its
+        # identifier.
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="playwright"
+        )
+        return self._executor.submit(threading.get_ident).result()
+
+    def _stop_worker(self) -> None:
+        self._executor.shutdown()
+
+    def _start_playwright(self) -> Playwright:
+        return sync_playwright().start()
+
+    def _mark_closed(self, key: ContextKey, entry: ContextEntry) -> None:
+        # Called on the worker thread when a context is closed by any means,
+        # including the browser being killed or closed by hand. The entry may
+        # already have been removed from `contexts`.
+        if entry.closed:
+            return
+
+        entry.closed = True
+        for callback in self.close_callbacks:
+            try:
+                callback(key, entry.options)
+            except Exception as e:
+                logger.warning(f"Error in close callback for {key}: {e}")
+
+    def _close_entry(self, key: ContextKey) -> None:
+        entry = self.contexts.pop(key)
+        if entry.closed:
+            return
+
+        try:
+            with self.timings.span("browser.close", f"{key[0]} ({key[1]})"):
+                self.run(entry.context.close)
+        except Exception as e:
+            logger.warning(f"Error while closing {key}: {e}")
+        finally:
+            # In case the close event wasn't emitted
+            self._mark_closed(key, entry)
+
+    def _trim_pages(self, context: BrowserContext) -> None:
+        for page in self.run(lambda: context.pages[1:]):
+            self.run(page.close)
+
+    def _evict_idle_loop(self) -> None:
+        interval = max(min(self.idle_timeout / 4, 30.0), 0.1)
+        while not self._stopped.wait(interval):
+            try:
+                self.evict_idle()
+            except Exception as e:
+                logger.warning(f"Error while evicting idle contexts: {e}")
+
+
+class AsyncPlaywrightRuntime(PlaywrightRuntime):
+    """
+    A PlaywrightRuntime that uses Playwright's async API.
+
+    All Playwright calls are scheduled onto an event loop running on the
+    runtime's worker thread, and the calling thread blocks until its call is
+    done. Unlike the sync runtime, a slow call (such as a navigation) doesn't
+    hold up calls made by other threads in the meantime, so connections can
+    browse concurrently, whether in separate contexts or in separate pages of
+    the same context.
+
+    `ThreadBoundProxy` objects work the same way with either runtime, so clients
+    still see what looks like the sync API.
+    """
+
+    def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """
+        Run a function on the event loop and return its result, awaiting it if
+        the function returns an awaitable.
+        """
+        if threading.get_ident() == self._worker_ident:
+            # Blocking here would deadlock the event loop
+            raise RuntimeError("Can't wait for a Playwright call on the event loop")
+
+        async def call() -> T:
+            result = func(*args, **kwargs)
+            if inspect.isawaitable(result):
+                result = await result
+            return result
+
+        return asyncio.run_coroutine_threadsafe(call(), self._loop).result()
+
+    def enter(self, obj: Any) -> Any:
+        return self.run(obj.__aenter__)
+
+    def exit(self, obj: Any, *args: Any) -> Any:
+        return self.run(obj.__aexit__, *args)
+
+    def _start_worker(self) -> int:
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(
+            target=self._loop.run_forever, name="playwright-loop", daemon=True
+        )
+        self._loop_thread.start()
+
+        assert self._loop_thread.ident is not None
+        return self._loop_thread.ident
+
+    def _stop_worker(self) -> None:
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop_thread.join()
+        self._loop.close()
+
+    def _start_playwright(self) -> Any:
+        return async_playwright().start()
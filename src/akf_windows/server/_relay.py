@@ -0,0 +1,99 @@
+"""
+A minimal TCP relay, used to expose ports that are only bound to localhost.
+
+Chromium only binds its remote debugging port to 127.0.0.1 when it isn't
+running headless, so the host can't connect to it directly. A relay listens on
+all interfaces and forwards each connection to the local port.
+"""
+
+import logging
+import socket
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def get_free_port(host: str = "127.0.0.1") -> int:
+    """
+    Get a port that is currently free on the specified interface.
+    """
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]  # type: ignore[no-any-return]
+
+
+class TCPRelay:
+    """
+    Forwards TCP connections from a listening port to a target address.
+
+    Each accepted connection is relayed by two daemon threads, one per direction,
+    until either side closes it.
+    """
+
+    def __init__(
+        self,
+        target_host: str,
+        target_port: int,
+        listen_host: str = "0.0.0.0",
+        listen_port: int = 0,
+    ) -> None:
+        """
+        :param target_host: The host to forward connections to.
+        :param target_port: The port to forward connections to.
+        :param listen_host: The interface to listen on. Defaults to all interfaces.
+        :param listen_port: The port to listen on. If 0, a free port is chosen.
+        """
+        self.target = (target_host, target_port)
+
+        self._server = socket.create_server((listen_host, listen_port))
+        self.port: int = self._server.getsockname()[1]
+
+        self._closed = threading.Event()
+        self._thread = threading.Thread(
+            target=self._accept_loop, name=f"relay-{self.port}", daemon=True
+        )
+
+    def start(self) -> "TCPRelay":
+        self._thread.start()
+        logger.info(f"Relaying port {self.port} to {self.target[0]}:{self.target[1]}")
+        return self
+
+    def close(self) -> None:
+        """
+        Stop accepting new connections. Connections that are already being
+        relayed are left open until either side closes them.
+        """
+        self._closed.set()
+        self._server.close()
+
+    def _accept_loop(self) -> None:
+        while not self._closed.is_set():
+            try:
+                client, _ = self._server.accept()
+            except OSError:
+                # The listening socket was closed
+                return
+
+            try:
+                upstream = socket.create_connection(self.target)
+            except OSError as e:
+                logger.warning(f"Could not connect to {self.target}: {e}")
+                client.close()
+                continue
+
+            for src, dst in ((client, upstream), (upstream, client)):
+                threading.Thread(
+                    target=self._pipe, args=(src, dst), daemon=True
+                ).start()
+
+    @staticmethod
+    def _pipe(src: socket.socket, dst: socket.socket) -> None:
+        try:
+            while data := src.recv(65536):
+                dst.sendall(data)
+        except OSError:
+            pass
+        finally:
+            # Closing both sides stops the thread relaying the other direction
+            src.close()
+            dst.close()
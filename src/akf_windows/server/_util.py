@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 
 
@@ -39,3 +40,32 @@ def get_systemroot_path() -> Path:
         raise Exception("Could not find the SYSTEMROOT environment variable")
 
     return Path(appdata_dir).resolve()
+
+
+def get_scratch_path() -> Path:
+    """
+    Get the directory used for temporary copies of artifacts (e.g. snapshots of
+    locked databases), creating it if needed.
+
+    Defaults to an `akf` folder in the system temporary directory. Set the
+    `AKF_SCRATCH_DIR` environment variable to use a faster disk, such as a RAM
+    disk.
+    """
+    scratch_dir = os.getenv("AKF_SCRATCH_DIR")
+    if scratch_dir:
+        path = Path(scratch_dir)
+    else:
+        path = Path(tempfile.gettempdir()) / "akf"
+
+    path.mkdir(parents=True, exist_ok=True)
+    return path.resolve()
+
+
+def make_scratch_dir(prefix: str) -> Path:
+    """
+    Create a new, uniquely named directory in the scratch directory.
+
+    Each call returns a different directory, so concurrent callers never share
+    (or delete) each other's files. The caller is responsible for removing it.
+    """
+    return Path(tempfile.mkdtemp(prefix=prefix, dir=get_scratch_path()))
@@ -3,12 +3,10 @@ Implementation of the RPyC service for collecting various Windows artifacts.
 """
 
 import logging
-import pickle
 import re
 from pathlib import Path
 
 # import psutil
-from akflib.core.agents.server import AKFService
 from caselib.uco.observable import (
     File,
     FileFacet,
@@ -19,13 +17,14 @@ from caselib.uco.observable import (
     WindowsPrefetchFacet,
 )
 
+from akf_windows.server._base import WindowsService
 from akf_windows.server._util import get_systemroot_path
 from akf_windows.server.prefetch.windowsprefetch import Prefetch
 
 logger = logging.getLogger(__name__)
 
 
-class WindowsArtifactService(AKFService):
+class WindowsArtifactService(WindowsService):
     """
     Allows you to generate various CASE objects from Windows artifacts.
 
@@ -187,8 +186,8 @@ class WindowsArtifactService(AKFService):
 
         # RPyC doesn't play well with some of the Pydantic properties that we need
         # to correctly add things to AKFBundle using AKFBundle.add_objects, so we
-        # pickle the objects and deserialize them on the host.
-        return pickle.dumps(result)
+        # encode the objects and decode them on the host.
+        return self.encode_result(result)
 
 
 if __name__ == "__main__":
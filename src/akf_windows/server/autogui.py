@@ -7,7 +7,8 @@ from typing import TYPE_CHECKING
 
 import pyautogui
 import rpyc
-from akflib.core.agents.server import AKFService
+
+from akf_windows.server._base import WindowsService
 
 logger = logging.getLogger(__name__)
 
@@ -19,7 +20,7 @@ if TYPE_CHECKING:
     import pyautogui as PyAutoGUIType
 
 
-class PyAutoGuiService(AKFService):
+class PyAutoGuiService(WindowsService):
     """
     Allows you to invoke pyautogui commands on the VM.
 
@@ -28,7 +29,8 @@ class PyAutoGuiService(AKFService):
     - all connections to this service will share the same resources/configuration
       (e.g. the setting of pyautogui.PAUSE or pyautogui.FAILSAFE) since we're using
       ThreadedServer -- but you can spin up multiple instances of this service,
-      which will not share the same resources
+      which will not share the same resources (see the `instance` argument of
+      `WindowsServiceAPI.auto_connect()`)
 
     Use the `PyAutoGuiServiceAPI` class to connect to and interact with this service.
     """
@@ -37,6 +39,7 @@ class PyAutoGuiService(AKFService):
         """
         Expose the pyautogui module to clients.
         """
+        super().on_connect(conn)
         self.pyautogui: "PyAutoGUIType" = pyautogui
 
 
@@ -2,33 +2,106 @@
 Implementation of the RPyC service for interacting with Chromium browsers using Playwright.
 """
 
+import io
+import json
 import logging
-import pickle
+import shutil
 import sqlite3
+import threading
+import time
+import uuid
+from contextlib import closing, contextmanager
+from dataclasses import dataclass, field
 from datetime import UTC, datetime
-from pathlib import Path
-from typing import Literal
+from pathlib import Path, PureWindowsPath
+from typing import ClassVar, Iterable, Iterator, Literal
+from urllib.parse import urlsplit
+from urllib.request import urlopen
 
 import psutil
 import rpyc
-from akflib.core.agents.server import AKFService
 from caselib.uco.observable import (
     URL,
     Application,
     ApplicationFacet,
+    BrowserCookie,
+    BrowserCookieFacet,
+    DomainName,
+    DomainNameFacet,
+    File,
+    FileFacet,
+    ObservableRelationship,
     URLFacet,
     URLHistory,
     URLHistoryEntry,
     URLHistoryFacet,
 )
-from playwright.sync_api import BrowserContext, sync_playwright
+from playwright.sync_api import BrowserContext, Page, Playwright
 from pydantic import AwareDatetime, BaseModel
 
-from akf_windows.server._util import get_appdata_local_path
+from akf_windows.common.chromium import (
+    ALL_CHROMIUM_ARTIFACTS,
+    BrowsePlan,
+    BrowserAutofillEntry,
+    BrowseResult,
+    BrowseStep,
+    BrowseStepResult,
+    ChromiumArtifacts,
+    ChromiumArtifactType,
+    HarOptions,
+    NavigationTiming,
+    ScreenshotFormat,
+)
+from akf_windows.common.timing import TimingRecorder
+from akf_windows.server._base import WindowsService
+from akf_windows.server._playwright import AsyncPlaywrightRuntime, PlaywrightRuntime
+from akf_windows.server._relay import TCPRelay, get_free_port
+from akf_windows.server._util import get_appdata_local_path, make_scratch_dir
+from akf_windows.server.profiles import ProfileStateStore
 
 logger = logging.getLogger(__name__)
 
 
+class URLInterner:
+    """
+    A cache of URL objects keyed by URL.
+
+    Share a single instance across everything generated by one collection call,
+    so that each distinct URL is only built once and every artifact that refers
+    to it (history entries, downloads, top sites...) references the same object.
+    Pickle only serializes a shared object once, so this also reduces the size
+    of the results sent over RPyC.
+
+    URLs are matched exactly, without any normalization: URLs that differ only
+    in form (such as the case of the host, or an explicit default port) get
+    separate objects, so every artifact keeps the URL exactly as the browser
+    recorded it.
+    """
+
+    def __init__(self) -> None:
+        self.urls: dict[str, URL] = {}
+
+    def __len__(self) -> int:
+        return len(self.urls)
+
+    def get(self, url: str) -> URL:
+        """
+        Get the URL object for a URL, creating it if it doesn't exist yet.
+        """
+        if url not in self.urls:
+            self.urls[url] = URL(hasFacet=[URLFacet(fullValue=url)])
+        return self.urls[url]
+
+
+def make_url_object(url: str, interner: URLInterner | None = None) -> URL:
+    """
+    Get a URL object for a URL, using `interner` if provided.
+    """
+    if interner is None:
+        return URL(hasFacet=[URLFacet(fullValue=url)])
+    return interner.get(url)
+
+
 class BrowserHistoryEntry(BaseModel):
     """Pydantic model representing an entry in Chrome/Edge's urls table"""
 
@@ -39,8 +112,9 @@ class BrowserHistoryEntry(BaseModel):
     typed_count: int
     last_visit_time: AwareDatetime
     hidden: bool = False
+    keyword_search_term: str | None = None
 
-    def to_case_object(self) -> URLHistoryEntry:
+    def to_case_object(self, interner: URLInterner | None = None) -> URLHistoryEntry:
         """
         Convert this entry to a valid URLHistoryEntry CASE object.
 
@@ -49,9 +123,11 @@ class BrowserHistoryEntry(BaseModel):
         https://caseontology.org/examples/owl_trafficking/
 
         Note that unlike the CASE example, this function does not use a
-        reference to the URL object; it is assumed to be globally unique.
-        (That is, URLHistoryEntry.url is *not* a reference; it is the complete,
-        original object with a URLFacet.)
+        reference to the URL object. (That is, URLHistoryEntry.url is *not* a
+        reference; it is the complete, original object with a URLFacet.) If
+        `interner` is provided, the URL object is shared with every other
+        artifact that refers to the same URL; otherwise, a new URL object is
+        created.
 
         You should add this to an existing URLHistoryFacet object under its
         urlHistoryEntry attribute.
@@ -63,7 +139,7 @@ class BrowserHistoryEntry(BaseModel):
         """
 
         return URLHistoryEntry(
-            url=URL(hasFacet=[URLFacet(fullValue=self.url)]),
+            url=make_url_object(self.url, interner),
             referrerUrl=None,
             expirationTime=None,
             firstVisit=None,
@@ -73,10 +149,127 @@ class BrowserHistoryEntry(BaseModel):
             browserUserProfile=None,
             hostname=None,
             pageTitle=self.title,
-            keywordSearchTerm=None,
+            keywordSearchTerm=self.keyword_search_term,
+        )
+
+
+class BrowserDownloadEntry(BaseModel):
+    """Pydantic model representing an entry in Chrome/Edge's downloads table"""
+
+    id: int
+    target_path: str
+    url: str | None
+    mime_type: str
+    received_bytes: int
+    total_bytes: int
+    start_time: AwareDatetime | None = None
+    end_time: AwareDatetime | None = None
+
+    def to_case_objects(
+        self, interner: URLInterner | None = None
+    ) -> tuple[File, URL | None, ObservableRelationship | None]:
+        """
+        Convert this entry to CASE objects.
+
+        The downloaded file is represented as a File object. If the URL the file
+        was downloaded from is known, a URL object and a "Downloaded_From"
+        relationship between the File and URL are also generated. If `interner`
+        is provided, the URL object is shared with other artifacts.
+        """
+        # Chromium always records Windows paths on Windows, regardless of where
+        # the database is being read
+        target_path = PureWindowsPath(self.target_path)
+        file_obj = File(
+            hasFacet=[
+                FileFacet(
+                    isDirectory=False,
+                    fileName=target_path.name,
+                    filePath=str(target_path.parent),
+                    sizeInBytes=self.received_bytes,
+                )
+            ]
+        )
+
+        if self.url is None:
+            return file_obj, None, None
+
+        url_obj = make_url_object(self.url, interner)
+        relationship = ObservableRelationship(
+            source=[file_obj],
+            target=url_obj,
+            kindOfRelationship="Downloaded_From",
+            isDirectional=True,
+            startTime=self.start_time,
+            endTime=self.end_time,
+        )
+        return file_obj, url_obj, relationship
+
+
+class BrowserCookieEntry(BaseModel):
+    """Pydantic model representing an entry in Chrome/Edge's cookies table"""
+
+    host_key: str
+    name: str
+    path: str
+    is_secure: bool
+    creation_time: AwareDatetime | None = None
+    expiration_time: AwareDatetime | None = None
+    last_access_time: AwareDatetime | None = None
+
+    def to_case_object(self) -> BrowserCookie:
+        """
+        Convert this entry to a valid BrowserCookie CASE object.
+
+        Cookie values are encrypted by the browser and are not recorded.
+        """
+        # Cookies set for a domain and all of its subdomains have a leading dot
+        domain_obj = DomainName(
+            hasFacet=[DomainNameFacet(value=self.host_key.lstrip("."))]
+        )
+
+        return BrowserCookie(
+            hasFacet=[
+                BrowserCookieFacet(
+                    cookieName=self.name,
+                    cookiePath=self.path,
+                    cookieDomain=domain_obj,
+                    isSecure=self.is_secure,
+                    creationTime=self.creation_time,
+                    expirationTime=self.expiration_time,
+                    accessedTime=self.last_access_time,
+                )
+            ]
         )
 
 
+class BrowserTopSiteEntry(BaseModel):
+    """Pydantic model representing an entry in Chrome/Edge's top_sites table"""
+
+    url: str
+    url_rank: int
+    title: str
+
+    def to_case_object(self, interner: URLInterner | None = None) -> URL:
+        """
+        Convert this entry to a URL CASE object. If `interner` is provided, the
+        URL object is shared with other artifacts.
+        """
+        return make_url_object(self.url, interner)
+
+
+def get_user_data_path(browser_type: Literal["chrome", "msedge"]) -> Path:
+    """
+    Get the path to the "User Data" directory for the specified browser, which
+    contains all of the browser's profiles.
+    """
+    if browser_type == "chrome":
+        return get_appdata_local_path() / "Google" / "Chrome" / "User Data"
+    elif browser_type == "msedge":
+        return get_appdata_local_path() / "Microsoft" / "Edge" / "User Data"
+    else:
+        raise ValueError(f"Unsupported browser type: {browser_type}")
+
+
 def get_chrome_history_path() -> Path:
     return (
         get_appdata_local_path()
@@ -116,109 +309,852 @@ def chromium_timestamp_to_datetime(timestamp: int) -> datetime:
     return datetime.fromtimestamp(unix_timestamp, UTC)
 
 
+def optional_chromium_timestamp(timestamp: int | None) -> datetime | None:
+    """
+    Convert an optional Chromium timestamp to a Python datetime.
+
+    Chromium uses 0 for timestamps that were never set; these (and any values
+    that can't be represented as a datetime) are returned as None.
+    """
+    if not timestamp:
+        return None
+
+    try:
+        return chromium_timestamp_to_datetime(timestamp)
+    except (OSError, OverflowError, ValueError):
+        return None
+
+
+def optional_unix_timestamp(timestamp: int | None) -> datetime | None:
+    """
+    Convert an optional Unix timestamp (in seconds) to a Python datetime.
+
+    Some Chromium databases, such as Web Data, use Unix timestamps instead of
+    Chromium timestamps. Unset and invalid values are returned as None.
+    """
+    if not timestamp:
+        return None
+
+    try:
+        return datetime.fromtimestamp(timestamp, UTC)
+    except (OSError, OverflowError, ValueError):
+        return None
+
+
+# The query used to enumerate the `urls` table. Entries are returned from most
+# to least recently visited.
+HISTORY_URLS_QUERY = """
+    SELECT id, url, title, visit_count, typed_count, last_visit_time, hidden
+    FROM urls
+    ORDER BY last_visit_time DESC
+"""
+
+
+def get_history_path(browser_type: Literal["chrome", "msedge"]) -> Path:
+    """
+    Get the default history path for the specified browser.
+    """
+    if browser_type == "chrome":
+        return get_chrome_history_path()
+    elif browser_type == "msedge":
+        return get_edge_history_path()
+    else:
+        raise ValueError(f"Unsupported browser type: {browser_type}")
+
+
+# SQLite files that may hold uncommitted changes to a database, and which must be
+# copied alongside it for a consistent snapshot.
+SQLITE_SIDECAR_SUFFIXES = ["-wal", "-journal"]
+
+# The prefix of the scratch directories created by `snapshot_history()`.
+HISTORY_SNAPSHOT_PREFIX = "akf-history-"
+
+
+def copy_sqlite_database(src_path: Path, dst_path: Path) -> None:
+    """
+    Copy an SQLite database, along with any journal files that exist next to it.
+    """
+    shutil.copyfile(src_path, dst_path)
+    for suffix in SQLITE_SIDECAR_SUFFIXES:
+        sidecar_path = src_path.with_name(src_path.name + suffix)
+        if sidecar_path.is_file():
+            shutil.copyfile(sidecar_path, dst_path.with_name(dst_path.name + suffix))
+
+
+def snapshot_history(
+    browser_type: Literal["chrome", "msedge"], history_path: Path
+) -> Path:
+    """
+    Copy a history database to a temporary location and return the path to the
+    copy.
+
+    The browser locks the database while it's open, so it must be copied before
+    it can be read. Each call copies into its own directory in the scratch
+    directory (see `get_scratch_path()`), so concurrent calls on the same
+    database are safe. The caller is responsible for removing the copy with
+    `remove_history_snapshot()`; prefer `history_snapshot()`, which does this
+    automatically.
+    """
+    # Check if history exists
+    if not history_path.exists():
+        raise FileNotFoundError(f"{browser_type} history not found at {history_path}")
+
+    snapshot_dir = make_scratch_dir(HISTORY_SNAPSHOT_PREFIX)
+    temp_history_path = snapshot_dir / history_path.name
+
+    # Copy the file to avoid lock issues
+    try:
+        copy_sqlite_database(history_path, temp_history_path)
+    except Exception:
+        shutil.rmtree(snapshot_dir, ignore_errors=True)
+        raise
+
+    return temp_history_path
+
+
+def remove_history_snapshot(temp_history_path: Path) -> None:
+    """
+    Remove a copy of a history database made by `snapshot_history()`.
+    """
+    snapshot_dir = temp_history_path.parent
+
+    # Never remove anything that wasn't created by `snapshot_history()`
+    if not snapshot_dir.name.startswith(HISTORY_SNAPSHOT_PREFIX):
+        raise ValueError(f"{temp_history_path} is not a history snapshot")
+
+    # Ignore if we can't delete the files
+    shutil.rmtree(snapshot_dir, ignore_errors=True)
+
+
+@contextmanager
+def history_snapshot(
+    browser_type: Literal["chrome", "msedge"], history_path: Path
+) -> Iterator[Path]:
+    """
+    Context manager that snapshots a history database with `snapshot_history()`,
+    yields the path to the copy, and removes the copy when the block exits.
+    """
+    temp_history_path = snapshot_history(browser_type, history_path)
+    try:
+        yield temp_history_path
+    finally:
+        remove_history_snapshot(temp_history_path)
+
+
+def row_to_history_entry(row: sqlite3.Row) -> BrowserHistoryEntry | None:
+    """
+    Convert a row from `HISTORY_URLS_QUERY` to a BrowserHistoryEntry.
+
+    Returns None if the row has an invalid timestamp.
+    """
+    try:
+        last_visit = chromium_timestamp_to_datetime(row["last_visit_time"])
+    except (OSError, OverflowError, ValueError):
+        # The timestamp value is invalid, so we ignore it altogether. (Windows
+        # raises OSError for out-of-range timestamps; other platforms raise
+        # OverflowError or ValueError.)
+        logger.error(
+            f"Got invalid timestamp value for {row['id']=}, {row['url']=}: {row['last_visit_time']=}"
+        )
+        return None
+
+    return BrowserHistoryEntry(
+        id=row["id"],
+        url=row["url"],
+        title=row["title"] or "",  # Handle potential NULL values
+        visit_count=row["visit_count"],
+        typed_count=row["typed_count"],
+        last_visit_time=last_visit,
+        hidden=bool(row["hidden"]),
+    )
+
+
+def read_history_entries(conn: sqlite3.Connection) -> list[BrowserHistoryEntry]:
+    """
+    Read all entries from the `urls` table of an open history database.
+    """
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+
+    # Query the urls table
+    cursor.execute(HISTORY_URLS_QUERY)
+
+    history_entries = []
+    for row in cursor.fetchall():
+        entry = row_to_history_entry(row)
+        if entry is not None:
+            history_entries.append(entry)
+
+    return history_entries
+
+
 def parse_browser_history(
     browser_type: Literal["chrome", "msedge"], history_path: Path | None = None
 ) -> list[BrowserHistoryEntry]:
     """Parse browser history and return a list of BrowserHistoryEntry objects"""
     if history_path is None:
-        if browser_type == "chrome":
-            history_path = get_chrome_history_path()
-        elif browser_type == "msedge":
-            history_path = get_edge_history_path()
-        else:
-            raise ValueError(f"Unsupported browser type: {browser_type}")
+        history_path = get_history_path(browser_type)
 
-    # Browser locks the database when it's open, so make a copy
-    temp_history_path = history_path.with_suffix(".temp")
+    # The copy is cleaned up when the block exits
+    with history_snapshot(browser_type, history_path) as temp_history_path:
+        # Connect to the copied database
+        conn = sqlite3.connect(temp_history_path)
+        try:
+            return read_history_entries(conn)
+        finally:
+            conn.close()
 
-    try:
-        # Check if history exists
-        if not history_path.exists():
-            raise FileNotFoundError(
-                f"{browser_type} history not found at {history_path}"
+
+def build_url_history(
+    browser_type: Literal["chrome", "msedge"],
+    entries: Iterable[BrowserHistoryEntry],
+    interner: URLInterner | None = None,
+) -> URLHistory:
+    """
+    Build a URLHistory object for a browser from its history entries.
+
+    If `interner` is provided, the URL objects of the entries are shared with
+    other artifacts generated with the same interner.
+    """
+    # Convert these Pydantic models to CASE objects
+    url_history_entries = [obj.to_case_object(interner) for obj in entries]
+
+    # Create Application object for this browser (note that it also won't
+    # be included as a reference, it'll be the original)
+    app_obj = Application(
+        hasFacet=[ApplicationFacet(applicationIdentifier=browser_type)],
+    )
+
+    return URLHistory(
+        hasFacet=[
+            URLHistoryFacet(
+                urlHistoryEntry=url_history_entries, browserInformation=app_obj
             )
+        ],
+    )
 
-        # Copy the file to avoid lock issues
-        with open(history_path, "rb") as src, open(temp_history_path, "wb") as dst:
-            dst.write(src.read())
 
-        # Connect to the copied database
-        conn = sqlite3.connect(temp_history_path)
+@dataclass
+class HistoryCursor:
+    """
+    An open, paginated read over a snapshot of a history database.
+    """
+
+    browser_type: Literal["chrome", "msedge"]
+    snapshot_path: Path
+    conn: sqlite3.Connection
+    cursor: sqlite3.Cursor
+
+    def close(self) -> None:
+        """
+        Close the database connection and remove the snapshot.
+        """
+        self.conn.close()
+        remove_history_snapshot(self.snapshot_path)
+
+
+def open_history_cursor(
+    browser_type: Literal["chrome", "msedge"], history_path: Path | None = None
+) -> HistoryCursor:
+    """
+    Snapshot a history database and start a query over its `urls` table.
+
+    Rows can then be read in pages with `HistoryCursor.cursor.fetchmany()`. The
+    snapshot is kept until `HistoryCursor.close()` is called, so every page is
+    read from the same consistent copy of the database.
+    """
+    if history_path is None:
+        history_path = get_history_path(browser_type)
+
+    temp_history_path = snapshot_history(browser_type, history_path)
+
+    try:
+        # Pages may be requested from a different thread than the one that
+        # opened the cursor (e.g. from a different RPyC connection thread)
+        conn = sqlite3.connect(temp_history_path, check_same_thread=False)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
+        cursor.execute(HISTORY_URLS_QUERY)
+    except Exception:
+        remove_history_snapshot(temp_history_path)
+        raise
+
+    return HistoryCursor(browser_type, temp_history_path, conn, cursor)
+
+
+# The databases read by `collect_profile_artifacts()`, mapped to their candidate
+# locations relative to the profile directory. The first one that exists is used.
+# (The Cookies database moved into the Network folder in Chromium 96.)
+PROFILE_DATABASES: dict[str, list[str]] = {
+    "History": ["History"],
+    "Cookies": ["Network/Cookies", "Cookies"],
+    "Web Data": ["Web Data"],
+    "Top Sites": ["Top Sites"],
+}
+
+# The database each artifact is extracted from.
+ARTIFACT_DATABASES: dict[ChromiumArtifactType, str] = {
+    "history": "History",
+    "downloads": "History",
+    "cookies": "Cookies",
+    "autofill": "Web Data",
+    "top_sites": "Top Sites",
+}
 
-        # Query the urls table
-        cursor.execute(
-            """
-            SELECT id, url, title, visit_count, typed_count, last_visit_time, hidden
-            FROM urls
-            ORDER BY last_visit_time DESC
+
+@dataclass
+class ProfileSnapshot:
+    """
+    A consistent copy of one or more databases from a browser profile.
+    """
+
+    directory: Path
+    databases: dict[str, Path] = field(default_factory=dict)
+
+    def connect(self, database: str) -> sqlite3.Connection | None:
+        """
+        Open a connection to a copied database, or return None if the database
+        wasn't present in the profile.
+        """
+        if database not in self.databases:
+            return None
+
+        conn = sqlite3.connect(self.databases[database])
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def close(self) -> None:
+        """
+        Remove the copied databases.
         """
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def snapshot_profile(profile_path: Path, databases: Iterable[str]) -> ProfileSnapshot:
+    """
+    Copy the specified databases from a profile directory into a new directory in
+    the scratch directory (see `get_scratch_path()`).
+
+    All databases are copied together, so every artifact extracted from the
+    snapshot reflects the same point in time. Databases that don't exist in the
+    profile are skipped.
+
+    :param profile_path: The path to the profile directory (e.g. `User Data/Default`).
+    :param databases: The names of the databases to copy (keys of `PROFILE_DATABASES`).
+    :return: A ProfileSnapshot, which must be closed by the caller.
+    """
+    if not profile_path.is_dir():
+        raise FileNotFoundError(f"Profile not found at {profile_path}")
+
+    snapshot = ProfileSnapshot(make_scratch_dir("akf-profile-"))
+    try:
+        for database in databases:
+            for candidate in PROFILE_DATABASES[database]:
+                src_path = profile_path / candidate
+                if src_path.is_file():
+                    break
+            else:
+                logger.warning(f"{database} not found in {profile_path}, skipping")
+                continue
+
+            dst_path = snapshot.directory / database
+            copy_sqlite_database(src_path, dst_path)
+            snapshot.databases[database] = dst_path
+    except Exception:
+        snapshot.close()
+        raise
+
+    return snapshot
+
+
+def read_keyword_search_terms(conn: sqlite3.Connection) -> dict[int, str]:
+    """
+    Read the `keyword_search_terms` table of a history database, returning a
+    mapping of `urls` IDs to the search term used to reach that URL.
+    """
+    cursor = conn.execute("SELECT url_id, term FROM keyword_search_terms")
+    return {row["url_id"]: row["term"] for row in cursor}
+
+
+def read_download_entries(conn: sqlite3.Connection) -> list[BrowserDownloadEntry]:
+    """
+    Read the `downloads` table of a history database.
+
+    The URL recorded for each download is the last URL in its redirect chain.
+    """
+    cursor = conn.execute(
+        """
+        SELECT d.id, d.target_path, d.mime_type, d.received_bytes, d.total_bytes,
+            d.start_time, d.end_time,
+            (
+                SELECT c.url FROM downloads_url_chains c
+                WHERE c.id = d.id
+                ORDER BY c.chain_index DESC
+                LIMIT 1
+            ) AS url
+        FROM downloads d
+        ORDER BY d.start_time
+        """
+    )
+
+    return [
+        BrowserDownloadEntry(
+            id=row["id"],
+            target_path=row["target_path"],
+            url=row["url"],
+            mime_type=row["mime_type"] or "",
+            received_bytes=row["received_bytes"],
+            total_bytes=row["total_bytes"],
+            start_time=optional_chromium_timestamp(row["start_time"]),
+            end_time=optional_chromium_timestamp(row["end_time"]),
         )
+        for row in cursor
+    ]
 
-        history_entries = []
-        for row in cursor.fetchall():
-            try:
-                last_visit = chromium_timestamp_to_datetime(row["last_visit_time"])
-            except OSError:
-                # The timestamp value is invalid, so we ignore it altogether
-                logger.error(
-                    f"Got invalid timestamp value for {row['id']=}, {row['url']=}: {row['last_visit_time']=}"
+
+def read_cookie_entries(conn: sqlite3.Connection) -> list[BrowserCookieEntry]:
+    """
+    Read the `cookies` table of a cookies database.
+    """
+    cursor = conn.execute(
+        """
+        SELECT host_key, name, path, is_secure, creation_utc, expires_utc,
+            last_access_utc
+        FROM cookies
+        ORDER BY creation_utc
+        """
+    )
+
+    return [
+        BrowserCookieEntry(
+            host_key=row["host_key"],
+            name=row["name"],
+            path=row["path"],
+            is_secure=bool(row["is_secure"]),
+            creation_time=optional_chromium_timestamp(row["creation_utc"]),
+            expiration_time=optional_chromium_timestamp(row["expires_utc"]),
+            last_access_time=optional_chromium_timestamp(row["last_access_utc"]),
+        )
+        for row in cursor
+    ]
+
+
+def read_autofill_entries(conn: sqlite3.Connection) -> list[BrowserAutofillEntry]:
+    """
+    Read the `autofill` table of a Web Data database.
+    """
+    cursor = conn.execute(
+        """
+        SELECT name, value, count, date_created, date_last_used
+        FROM autofill
+        ORDER BY date_created
+        """
+    )
+
+    return [
+        BrowserAutofillEntry(
+            name=row["name"],
+            value=row["value"],
+            count=row["count"],
+            date_created=optional_unix_timestamp(row["date_created"]),
+            date_last_used=optional_unix_timestamp(row["date_last_used"]),
+        )
+        for row in cursor
+    ]
+
+
+def read_top_site_entries(conn: sqlite3.Connection) -> list[BrowserTopSiteEntry]:
+    """
+    Read the `top_sites` table of a Top Sites database.
+    """
+    cursor = conn.execute(
+        "SELECT url, url_rank, title FROM top_sites ORDER BY url_rank"
+    )
+
+    return [
+        BrowserTopSiteEntry(
+            url=row["url"], url_rank=row["url_rank"], title=row["title"] or ""
+        )
+        for row in cursor
+    ]
+
+
+def collect_profile_artifacts(
+    browser_type: Literal["chrome", "msedge"],
+    profile: str = "Default",
+    artifacts: Iterable[ChromiumArtifactType] = ALL_CHROMIUM_ARTIFACTS,
+    user_data_path: Path | None = None,
+    interner: URLInterner | None = None,
+) -> ChromiumArtifacts:
+    """
+    Collect several artifacts from a browser profile in a single pass.
+
+    Every database needed by the requested artifacts is copied exactly once, and
+    all artifacts are extracted from that same snapshot.
+
+    :param browser_type: The browser to collect artifacts from.
+    :param profile: The name of the profile directory. Defaults to "Default".
+    :param artifacts: The artifacts to collect. Defaults to all artifacts.
+    :param user_data_path: The path to the browser's "User Data" directory. If
+        None, defaults to the standard location for the specified browser.
+    :param interner: The URLInterner to build URL objects with. Pass the same
+        interner to several calls to share URL objects between profiles. If
+        None, a new interner is used for this call.
+    :return: A ChromiumArtifacts object containing the requested artifacts.
+    """
+    artifacts = set(artifacts)
+    for artifact in artifacts:
+        if artifact not in ARTIFACT_DATABASES:
+            raise ValueError(f"Unsupported artifact type: {artifact}")
+
+    if user_data_path is None:
+        user_data_path = get_user_data_path(browser_type)
+
+    if interner is None:
+        interner = URLInterner()
+
+    databases = {ARTIFACT_DATABASES[artifact] for artifact in artifacts}
+    snapshot = snapshot_profile(user_data_path / profile, databases)
+    result = ChromiumArtifacts(browser_type=browser_type, profile=profile)
+
+    try:
+        history_conn = snapshot.connect("History")
+        if history_conn is not None:
+            with closing(history_conn):
+                if "history" in artifacts:
+                    entries = read_history_entries(history_conn)
+
+                    # Keyword search terms are recorded on the history entries
+                    # for the URLs they led to
+                    try:
+                        search_terms = read_keyword_search_terms(history_conn)
+                    except sqlite3.OperationalError as e:
+                        logger.warning(f"Could not read keyword search terms: {e}")
+                        search_terms = {}
+                    for entry in entries:
+                        entry.keyword_search_term = search_terms.get(entry.id)
+
+                    result.history = build_url_history(browser_type, entries, interner)
+
+                if "downloads" in artifacts:
+                    download_source_ids: set[int] = set()
+                    for download in read_download_entries(history_conn):
+                        file_obj, url_obj, relationship = download.to_case_objects(
+                            interner
+                        )
+                        result.downloads.append(file_obj)
+                        if url_obj is not None and relationship is not None:
+                            # Several files may be downloaded from the same
+                            # (interned) URL, so only list each URL once
+                            if id(url_obj) not in download_source_ids:
+                                download_source_ids.add(id(url_obj))
+                                result.download_sources.append(url_obj)
+                            result.download_relationships.append(relationship)
+
+        cookies_conn = snapshot.connect("Cookies")
+        if cookies_conn is not None and "cookies" in artifacts:
+            with closing(cookies_conn):
+                result.cookies = [
+                    entry.to_case_object()
+                    for entry in read_cookie_entries(cookies_conn)
+                ]
+
+        web_data_conn = snapshot.connect("Web Data")
+        if web_data_conn is not None and "autofill" in artifacts:
+            with closing(web_data_conn):
+                result.autofill = read_autofill_entries(web_data_conn)
+
+        top_sites_conn = snapshot.connect("Top Sites")
+        if top_sites_conn is not None and "top_sites" in artifacts:
+            with closing(top_sites_conn):
+                result.top_sites = [
+                    entry.to_case_object(interner)
+                    for entry in read_top_site_entries(top_sites_conn)
+                ]
+    finally:
+        snapshot.close()
+
+    return result
+
+
+def run_browse_step(
+    page: Page, index: int, step: BrowseStep, timings: TimingRecorder | None = None
+) -> BrowseStepResult:
+    """
+    Run a single step of a browsing plan on a page.
+
+    Errors are recorded in the result rather than raised. If navigation fails
+    (e.g. the page didn't become ready in time), the screenshot and download are
+    skipped, but the page is still left open for the dwell time.
+
+    Each phase of the step is recorded as a span in `timings`, if given.
+    """
+    if timings is None:
+        timings = TimingRecorder()
+
+    result = BrowseStepResult(
+        index=index,
+        url=step.url,
+        page=0,
+        started=datetime.now(UTC),
+        navigation_seconds=0.0,
+        dwell_seconds=0.0,
+    )
+
+    start = time.perf_counter()
+    try:
+        with timings.span("browse.navigation", step.url):
+            page.goto(step.url, **step.wait.goto_kwargs())
+    except Exception as e:
+        logger.warning(f"Failed to visit {step.url}: {e}")
+        result.error = str(e)
+    result.navigation_seconds = time.perf_counter() - start
+
+    if result.error is None:
+        try:
+            result.final_url = page.url
+            result.title = page.title()
+            result.timing = NavigationTiming.from_page(page)
+
+            if step.screenshot_path is not None:
+                with timings.span("browse.screenshot", step.url):
+                    page.screenshot(
+                        path=step.screenshot_path,
+                        full_page=step.full_page_screenshot,
+                        type=step.screenshot_format,
+                        quality=step.screenshot_quality,
+                    )
+                result.screenshot_path = step.screenshot_path
+
+            if step.download_selector is not None:
+                download_dir = (
+                    Path(step.download_dir)
+                    if step.download_dir is not None
+                    else Path.home() / "Downloads"
                 )
-                continue
+                with timings.span("browse.download", step.url):
+                    with page.expect_download() as download_info:
+                        page.locator(step.download_selector).click()
+                    download = download_info.value
+                    download_path = download_dir / download.suggested_filename
+                    download.save_as(download_path)
+                result.download_path = str(download_path)
+        except Exception as e:
+            logger.warning(f"Step {index} ({step.url}) failed: {e}")
+            result.error = str(e)
 
-            entry = BrowserHistoryEntry(
-                id=row["id"],
-                url=row["url"],
-                title=row["title"] or "",  # Handle potential NULL values
-                visit_count=row["visit_count"],
-                typed_count=row["typed_count"],
-                last_visit_time=last_visit,
-                hidden=bool(row["hidden"]),
-            )
+    result.dwell_seconds = step.wait.sample_dwell()
+    with timings.span("browse.dwell", step.url):
+        time.sleep(result.dwell_seconds)
 
-            history_entries.append(entry)
+    return result
+
+
+def run_browse_plan(
+    browser: BrowserContext, plan: BrowsePlan, timings: TimingRecorder | None = None
+) -> BrowseResult:
+    """
+    Run every step of a browsing plan in a new page of a browser context.
+
+    The page is closed afterwards, unless it's the only page left in the context.
+    """
+    result = BrowseResult()
+    start = time.perf_counter()
 
-        return history_entries
+    page = browser.new_page()
+    try:
+        for index, step in enumerate(plan.steps):
+            logger.info(f"Running step {index} ({step.url})")
+            step_result = run_browse_step(page, index, step, timings)
+            result.steps.append(step_result)
 
+            if step_result.error is not None and plan.stop_on_error:
+                result.skipped = len(plan.steps) - index - 1
+                break
     finally:
-        # Clean up the temporary copy
-        if temp_history_path.exists():
-            try:
-                temp_history_path.unlink()
-            except PermissionError:
-                pass  # Ignore if we can't delete the file
+        if len(browser.pages) > 1:
+            page.close()
+
+    result.total_seconds = time.perf_counter() - start
+    return result
 
 
-class ChromiumService(AKFService):
+class ChromiumService(WindowsService):
     """
     Allows you to interact with a Microsoft Edge browser instance.
 
+    A single Playwright runtime is shared by every connection to this service
+    (see `PlaywrightRuntime`), so Playwright is only started once per service
+    process, and browser contexts stay open between connections. Reconnecting
+    and calling `set_browser()` with the same browser and profile re-attaches to
+    the already-running context.
+
     Use the `ChromiumServiceAPI` class to connect to and interact with this service.
     """
 
+    # The runtime shared by all connections in this process. Created on first
+    # use, so that importing this module doesn't start any threads.
+    runtime: ClassVar[PlaywrightRuntime | None] = None
+    runtime_lock: ClassVar[threading.Lock] = threading.Lock()
+    runtime_class: ClassVar[type[PlaywrightRuntime]] = PlaywrightRuntime
+
+    # Timing spans for each phase of the browser's lifecycle (see
+    # `exposed_get_stats`), shared by every connection and the runtime.
+    timings: ClassVar[TimingRecorder] = TimingRecorder()
+
+    # How long a browser context may go unused by any connection before it's
+    # closed, in seconds.
+    browser_idle_timeout: ClassVar[float] = 600.0
+
+    # The remote debugging port of each (browser type, profile) launched with
+    # one, and the relays exposing those ports to the host, keyed by the port.
+    # Both are removed once the browser is closed (see `on_context_closed`).
+    cdp_ports: ClassVar[dict[tuple[str, str], int]] = {}
+    cdp_relays: ClassVar[dict[int, TCPRelay]] = {}
+    cdp_lock: ClassVar[threading.Lock] = threading.Lock()
+
+    @classmethod
+    def get_runtime(cls) -> PlaywrightRuntime:
+        """
+        Get the Playwright runtime shared by all connections, creating it if
+        necessary.
+        """
+        with cls.runtime_lock:
+            if cls.runtime is None:
+                cls.runtime = cls.runtime_class(
+                    idle_timeout=cls.browser_idle_timeout, timings=cls.timings
+                )
+                cls.runtime.close_callbacks.append(cls.on_context_closed)
+            return cls.runtime
+
+    @classmethod
+    def on_context_closed(cls, key: tuple[str, str], options: object) -> None:
+        """
+        Forget the remote debugging port of a browser context once it's closed,
+        and stop the relay for it.
+
+        :param key: The (browser type, profile) of the context.
+        :param options: The options the context was launched with, which is its
+            remote debugging port, if any.
+        """
+        if not isinstance(options, int):
+            return
+
+        with cls.cdp_lock:
+            if cls.cdp_ports.get(key) == options:
+                del cls.cdp_ports[key]
+        cls.close_cdp_relay(options)
+
+    @classmethod
+    def close_cdp_relay(cls, debugging_port: int) -> None:
+        """
+        Stop the relay for a remote debugging port, if there is one. Connections
+        already being relayed are left open.
+        """
+        with cls.cdp_lock:
+            relay = cls.cdp_relays.pop(debugging_port, None)
+        if relay is not None:
+            logger.info(f"Closing CDP relay on port {relay.port}")
+            relay.close()
+
+    @classmethod
+    def warm_up(cls) -> None:
+        """
+        Start Playwright before the first connection is made.
+
+        Called by the dispatcher when this service is started as a pre-spawned
+        worker, so that the first connection doesn't wait for Playwright.
+        """
+        cls.get_runtime().get_playwright()
+
     def on_connect(self, conn: rpyc.Connection) -> None:
         """
-        Start the Playwright instance when a connection is made.
+        Attach to the shared Playwright runtime when a connection is made,
+        starting Playwright if this is the first connection.
 
         Expose both the Playwright instance and the browser context to the client.
         """
-        self.playwright = sync_playwright().start()
+        super().on_connect(conn)
+
+        runtime = self.get_runtime()
+        self.playwright: Playwright = runtime.wrap(runtime.get_playwright())
 
         # Although this may be `None` internally, the expectation is that
         # RPyC clients will only ever see this as non-`None` values.
         self.browser: BrowserContext | None = None
 
+        # The (browser type, profile) of the context leased by this connection.
+        self.browser_key: tuple[str, str] | None = None
+
+        # Paginated history reads that are still in progress, keyed by their
+        # continuation token.
+        self.history_cursors: dict[str, HistoryCursor] = {}
+
+        # Screenshots that haven't been fully read by the client yet, keyed by
+        # their token.
+        self.screenshots: dict[str, io.BytesIO] = {}
+
+        # The HAR archive being recorded or replayed, if any.
+        self.har: HarOptions | None = None
+
     def on_disconnect(self, conn: rpyc.Connection) -> None:
         """
-        Close the browser and stop the Playwright instance when the connection
-        is closed.
+        Release the browser context when the connection is closed.
+
+        The context itself is kept open for the next connection, and is closed
+        once it has been idle for `browser_idle_timeout` seconds.
+        """
+        self.reset()
+        super().on_disconnect(conn)
+
+    def exposed_reset(self) -> None:
+        """
+        Return this connection to the state of a new one, so that the host can
+        hand it to another caller (see `ChromiumServiceAPI.reset()`).
+        """
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Stop any HAR recording or replay, release the browser context leased by
+        this connection (which is kept warm), stop its CDP relay if no other
+        connection is using it, and discard unfinished history reads and
+        screenshots.
+        """
+        if self.har is not None:
+            har_mode = self.har.mode
+            try:
+                self.stop_har(relaunch=False)
+            except Exception as e:
+                logger.warning(f"Could not stop HAR {har_mode}: {e}")
+
+        browser_key = self.browser_key
+        self.release_browser()
+
+        # Stop relaying the browser's debugging port once no connection is using
+        # it. The browser keeps the port while it's warm, and
+        # `exposed_get_cdp_endpoint` starts a new relay for it if needed.
+        if browser_key is not None:
+            debugging_port = self.cdp_ports.get(browser_key)
+            entry = self.get_runtime().contexts.get(browser_key)
+            if debugging_port is not None and (entry is None or entry.leases == 0):
+                self.close_cdp_relay(debugging_port)
+
+        # Release any history snapshots the client didn't finish reading
+        for history_cursor in self.history_cursors.values():
+            history_cursor.close()
+        self.history_cursors.clear()
+        self.screenshots.clear()
+
+    def release_browser(self) -> None:
+        """
+        Release the browser context leased by this connection, if any.
         """
-        if self.browser is not None:
-            self.browser.close()
-            self.browser = None
+        if self.browser_key is not None:
+            self.get_runtime().release_context(*self.browser_key)
 
-        self.playwright.stop()
+        self.browser = None
+        self.browser_key = None
 
     def exposed_set_browser(
         self, browser_type: Literal["msedge", "chrome"], profile: str = "Default"
@@ -226,34 +1162,98 @@ class ChromiumService(AKFService):
         """
         Set the browser to use for this service.
 
+        If a context for this browser and profile is already running, it is
+        re-used; otherwise, a new one is launched. Browsers that have been
+        exposed with `exposed_get_cdp_endpoint` keep their remote debugging port.
+
         :param browser: The browser to use (which corresponds to the distribution
             channel).
         :param profile: The profile to use for the browser. Defaults to "Default".
             Note that the profile must already exist.
         """
-        if self.browser is not None:
-            self.browser.close()
-            self.browser = None
+        return self.acquire_browser(
+            browser_type, profile, self.cdp_ports.get((browser_type, profile))
+        )
 
-        if browser_type == "chrome":
-            # Use the Chrome profile path
-            profile_path = get_appdata_local_path() / "Google" / "Chrome" / "User Data"
-        elif browser_type == "msedge":
-            # Use the Edge profile path
-            profile_path = get_appdata_local_path() / "Microsoft" / "Edge" / "User Data"
-        else:
-            raise ValueError(f"Unsupported browser type: {browser_type}")
-
-        chromium = self.playwright.chromium
-        self.browser = chromium.launch_persistent_context(
-            headless=False,
-            user_data_dir=profile_path,
-            channel=browser_type,
-            args=[f"--profile-directory={profile}"],
+    def acquire_browser(
+        self,
+        browser_type: Literal["msedge", "chrome"],
+        profile: str = "Default",
+        debugging_port: int | None = None,
+    ) -> BrowserContext:
+        """
+        Lease the context for a browser and profile from the runtime, replacing
+        the context currently leased by this connection.
+
+        :param debugging_port: If set, the browser is launched with its remote
+            debugging port (on localhost) set to this port. A running context
+            that was launched without it is relaunched.
+        """
+        if self.har is not None:
+            self.stop_har(relaunch=False)
+
+        self.release_browser()
+
+        profile_path = get_user_data_path(browser_type)
+        browser_args = [f"--profile-directory={profile}"]
+        if debugging_port is not None:
+            browser_args += [
+                f"--remote-debugging-port={debugging_port}",
+                "--remote-allow-origins=*",
+            ]
+
+        def launch(playwright: Playwright) -> BrowserContext:
+            return playwright.chromium.launch_persistent_context(
+                headless=False,
+                user_data_dir=profile_path,
+                channel=browser_type,
+                args=browser_args,
+            )
+
+        self.browser = self.get_runtime().acquire_context(
+            browser_type, profile, launch, options=debugging_port
         )
+        self.browser_key = (browser_type, profile)
 
         return self.browser
 
+    def exposed_get_cdp_endpoint(
+        self, browser_type: Literal["msedge", "chrome"], profile: str = "Default"
+    ) -> tuple[int, str]:
+        """
+        Make a browser available over the Chrome DevTools Protocol (CDP), so
+        that the host can drive it with its own Playwright instance instead of
+        through RPyC.
+
+        The browser is (re)launched with a remote debugging port if it isn't
+        already running with one, and becomes the browser leased by this
+        connection. Since the debugging port is only bound to localhost, a relay
+        listening on all interfaces is started for it.
+
+        :param browser_type: The browser to use (which corresponds to the
+            distribution channel).
+        :param profile: The profile to use for the browser. Defaults to "Default".
+        :return: The port of the relay, and the path of the browser's CDP
+            WebSocket endpoint. The endpoint is `ws://<agent>:<port><path>`.
+        """
+        key = (browser_type, profile)
+        debugging_port = self.cdp_ports.get(key) or get_free_port()
+        self.acquire_browser(browser_type, profile, debugging_port)
+
+        with self.cdp_lock:
+            self.cdp_ports[key] = debugging_port
+            relay = self.cdp_relays.get(debugging_port)
+            if relay is None:
+                relay = TCPRelay("127.0.0.1", debugging_port).start()
+                self.cdp_relays[debugging_port] = relay
+
+        # The browser reports its endpoint as ws://127.0.0.1:<port>/<path>, which
+        # isn't reachable from the host, so only the path is returned.
+        with urlopen(f"http://127.0.0.1:{debugging_port}/json/version") as response:
+            ws_url = json.load(response)["webSocketDebuggerUrl"]
+
+        return relay.port, urlsplit(ws_url).path
+
     def exposed_kill_edge(self) -> None:
         """
         Kill Edge process instances by name.
@@ -268,14 +1268,29 @@ class ChromiumService(AKFService):
         the "startup boost" feature. In general, this is only necessary if Edge
         has been opened through other means (e.g. manually).
 
+        Edge processes launched by this service (i.e. warm browser contexts) are
+        not killed.
         """
-        for proc in psutil.process_iter(["name"]):
-            if proc.info["name"] == "msedge.exe":
-                logger.info(f"Killing Edge process {proc.pid}")
-                try:
-                    proc.kill()
-                except psutil.NoSuchProcess:
-                    logger.info(f"Process {proc.pid} is already dead...")
+        with self.timings.span("kill_edge"):
+            # Playwright's browsers are descendants of this process (via the
+            # Playwright driver)
+            own_pids = {proc.pid for proc in psutil.Process().children(recursive=True)}
+
+            for proc in psutil.process_iter(["name"]):
+                if proc.info["name"] == "msedge.exe" and proc.pid not in own_pids:
+                    logger.info(f"Killing Edge process {proc.pid}")
+                    try:
+                        proc.kill()
+                    except psutil.NoSuchProcess:
+                        logger.info(f"Process {proc.pid} is already dead...")
+
+    def exposed_close_browsers(self) -> None:
+        """
+        Close every warm browser context in this service process, including
+        those in use by other connections. Their CDP relays are stopped too.
+        """
+        self.release_browser()
+        self.get_runtime().close_contexts()
 
     def exposed_get_history(
         self, browser_type: Literal["chrome", "msedge"], history_path: Path | None
@@ -288,27 +1303,446 @@ class ChromiumService(AKFService):
             to the standard location for the specified browser.
         :return: A URLHistory object containing the browser history entries.
         """
-        browser_entries = parse_browser_history(browser_type, history_path)
+        with self.timings.span("history.collect", browser_type):
+            browser_entries = parse_browser_history(browser_type, history_path)
+            url_history = build_url_history(browser_type, browser_entries)
+
+        # Encode the object to send it over RPyC
+        return self.encode_result(url_history)
+
+    def exposed_get_history_page(
+        self,
+        browser_type: Literal["chrome", "msedge"],
+        history_path: Path | None,
+        page_size: int = 1000,
+        continuation_token: str | None = None,
+    ) -> tuple[bytes, str | None]:
+        """
+        Get a single page of browser history entries for the specified browser.
+
+        The first call should pass `continuation_token=None`, which snapshots the
+        history database. Each call returns the next `page_size` entries along
+        with a token for the following page; pass the token back to continue.
+        When the token returned is `None`, all entries have been read and the
+        snapshot has been removed.
+
+        Unlike `exposed_get_history`, this only returns the URLHistoryEntry
+        objects; the caller is responsible for assembling the URLHistory.
+
+        :param browser_type: Type of browser to retrieve history from ("chrome" or "msedge")
+        :param history_path: Path to the browser history file. If None, defaults
+            to the standard location for the specified browser. Ignored if a
+            continuation token is provided.
+        :param page_size: The maximum number of entries to return.
+        :param continuation_token: The token returned by the previous call, or
+            None to start a new read.
+        :return: A tuple of the encoded list of URLHistoryEntry objects and the
+            continuation token for the next page (or None if there are no more
+            entries).
+        """
+        if page_size < 1:
+            raise ValueError(f"page_size must be positive, got {page_size}")
+
+        if continuation_token is None:
+            continuation_token = uuid.uuid4().hex
+            self.history_cursors[continuation_token] = open_history_cursor(
+                browser_type, history_path
+            )
+        elif continuation_token not in self.history_cursors:
+            raise ValueError(f"Unknown continuation token {continuation_token}")
+
+        history_cursor = self.history_cursors[continuation_token]
+
+        # Rows with invalid timestamps are dropped, so a page may contain fewer
+        # than `page_size` entries even if more rows remain
+        rows = history_cursor.cursor.fetchmany(page_size)
+        url_history_entries = []
+        for row in rows:
+            entry = row_to_history_entry(row)
+            if entry is not None:
+                url_history_entries.append(entry.to_case_object())
+
+        next_token: str | None = continuation_token
+        if len(rows) < page_size:
+            # The query is exhausted, so release the snapshot now
+            self.exposed_close_history(continuation_token)
+            next_token = None
+
+        return self.encode_result(url_history_entries), next_token
+
+    def exposed_capture_screenshot(
+        self,
+        page: Page | None = None,
+        full_page: bool = True,
+        image_format: ScreenshotFormat = "png",
+        quality: int | None = None,
+        guest_path: str | None = None,
+    ) -> tuple[str, int]:
+        """
+        Take a screenshot of a page, to be read back in chunks with
+        `exposed_read_screenshot`.
+
+        The image is encoded by the browser itself, so a JPEG screenshot is
+        never held in memory (or written to disk) as a PNG first.
+
+        :param page: The page to take a screenshot of. If None, the most recently
+            opened page of the current browser is used.
+        :param full_page: Whether to capture the full scrollable page, rather
+            than just the viewport.
+        :param image_format: The image format, either "png" or "jpeg".
+        :param quality: The JPEG quality, from 0 to 100. Only valid for JPEG.
+        :param guest_path: If set, a copy of the image is also saved to this
+            path on the agent.
+        :return: A token to pass to `exposed_read_screenshot`, and the size of
+            the image in bytes.
+        """
+        if image_format != "jpeg" and quality is not None:
+            raise ValueError("quality is only supported for JPEG screenshots")
 
-        # Convert these Pydantic models to CASE objects
-        url_history_entries = [obj.to_case_object() for obj in browser_entries]
+        if page is None:
+            if self.browser is None:
+                raise RuntimeError("No browser is open; call set_browser() first")
+            page = self.browser.pages[-1]
 
-        # Create Application object for this browser (note that it also won't
-        # be included as a reference, it'll be the original)
-        app_obj = Application(
-            hasFacet=[ApplicationFacet(applicationIdentifier=browser_type)],
+        start = time.perf_counter()
+        with self.timings.span("screenshot.capture"):
+            image = page.screenshot(
+                full_page=full_page, type=image_format, quality=quality
+            )
+        logger.info(
+            f"Captured {len(image)} byte {image_format} screenshot in "
+            f"{time.perf_counter() - start:.2f}s"
         )
 
-        url_history = URLHistory(
-            hasFacet=[
-                URLHistoryFacet(
-                    urlHistoryEntry=url_history_entries, browserInformation=app_obj
+        if guest_path is not None:
+            Path(guest_path).write_bytes(image)
+
+        token = uuid.uuid4().hex
+        self.screenshots[token] = io.BytesIO(image)
+        return token, len(image)
+
+    def exposed_read_screenshot(self, token: str, chunk_size: int) -> bytes:
+        """
+        Read the next chunk of a screenshot taken with `exposed_capture_screenshot`.
+
+        Once the last chunk has been read, the screenshot is released.
+
+        :param token: The token returned by `exposed_capture_screenshot`.
+        :param chunk_size: The maximum number of bytes to return.
+        :return: The next chunk of the image. An empty bytes object means that
+            the whole image has been read.
+        """
+        if token not in self.screenshots:
+            raise ValueError(f"Unknown screenshot token {token}")
+
+        buffer = self.screenshots[token]
+        chunk = buffer.read(chunk_size)
+        if buffer.tell() == len(buffer.getbuffer()):
+            self.exposed_close_screenshot(token)
+
+        return chunk
+
+    def exposed_close_screenshot(self, token: str) -> None:
+        """
+        Release a screenshot before it has been fully read.
+
+        It is not an error to close a screenshot that has already been released.
+
+        :param token: The token returned by `exposed_capture_screenshot`.
+        """
+        self.screenshots.pop(token, None)
+
+    def exposed_collect_artifacts(
+        self,
+        browser_type: Literal["chrome", "msedge"],
+        profile: str = "Default",
+        artifacts: tuple[ChromiumArtifactType, ...] = ALL_CHROMIUM_ARTIFACTS,
+        user_data_path: Path | None = None,
+    ) -> bytes:
+        """
+        Collect several artifacts from a browser profile in a single pass.
+
+        The profile's databases are copied once, and every requested artifact is
+        extracted from that one snapshot.
+
+        :param browser_type: The browser to collect artifacts from.
+        :param profile: The name of the profile directory. Defaults to "Default".
+        :param artifacts: The artifacts to collect. Defaults to all artifacts.
+        :param user_data_path: The path to the browser's "User Data" directory.
+            If None, defaults to the standard location for the specified browser.
+        :return: An encoded ChromiumArtifacts object.
+        """
+        with self.timings.span("artifacts.collect", f"{browser_type} ({profile})"):
+            result = collect_profile_artifacts(
+                browser_type, profile, tuple(artifacts), user_data_path
+            )
+
+        # Encode the object to send it over RPyC
+        return self.encode_result(result)
+
+    def exposed_collect_artifacts_for_profiles(
+        self,
+        browser_type: Literal["chrome", "msedge"],
+        profiles: tuple[str, ...],
+        artifacts: tuple[ChromiumArtifactType, ...] = ALL_CHROMIUM_ARTIFACTS,
+        user_data_path: Path | None = None,
+    ) -> bytes:
+        """
+        Collect several artifacts from each of several browser profiles.
+
+        All profiles share a single URLInterner, so a URL that appears in more
+        than one profile is only built (and encoded) once.
+
+        :param browser_type: The browser to collect artifacts from.
+        :param profiles: The names of the profile directories.
+        :param artifacts: The artifacts to collect. Defaults to all artifacts.
+        :param user_data_path: The path to the browser's "User Data" directory.
+            If None, defaults to the standard location for the specified browser.
+        :return: An encoded list of ChromiumArtifacts objects, one per profile.
+        """
+        interner = URLInterner()
+        result = []
+        for profile in profiles:
+            with self.timings.span("artifacts.collect", f"{browser_type} ({profile})"):
+                result.append(
+                    collect_profile_artifacts(
+                        browser_type,
+                        profile,
+                        tuple(artifacts),
+                        user_data_path,
+                        interner,
+                    )
                 )
-            ],
+        logger.info(f"Built {len(interner)} distinct URL objects")
+
+        # Encode the object to send it over RPyC
+        return self.encode_result(result)
+
+    def exposed_browse(self, plan_json: str) -> bytes:
+        """
+        Run a whole browsing plan on the agent.
+
+        Each Playwright call made through the `browser` netref is a separate
+        round-trip; running the plan here instead means the whole plan only
+        costs one.
+
+        `exposed_set_browser` must be called first.
+
+        :param plan_json: A BrowsePlan, serialized as JSON.
+        :return: An encoded BrowseResult object.
+        """
+        if self.browser is None:
+            raise RuntimeError("No browser is open; call set_browser() first")
+
+        plan = BrowsePlan.model_validate_json(plan_json)
+        if plan.har is not None:
+            self.exposed_start_har(plan.har.model_dump_json())
+
+        try:
+            with self.timings.span("browse.plan"):
+                result = run_browse_plan(self.browser, plan, self.timings)
+        finally:
+            if plan.har is not None:
+                self.exposed_stop_har()
+
+        logger.info(
+            f"Ran {len(result.steps)} step(s) in {result.total_seconds:.2f}s, "
+            f"{len(result.failed)} failed"
         )
 
-        # Pickle the object to send it over RPyC
-        return pickle.dumps(url_history)
+        # Encode the object to send it over RPyC
+        return self.encode_result(result)
+
+    def exposed_start_har(self, har_json: str) -> None:
+        """
+        Start recording the current browser's traffic to a HAR archive, or
+        replaying its traffic from one, until `exposed_stop_har` is called.
+
+        This applies to every page of the browser context, including pages
+        opened by other connections.
+
+        :param har_json: A HarOptions object, serialized as JSON.
+        """
+        if self.browser is None:
+            raise RuntimeError("No browser is open; call set_browser() first")
+        if self.har is not None:
+            raise RuntimeError(f"Already in HAR {self.har.mode} mode")
+
+        har = HarOptions.model_validate_json(har_json)
+        har_path = Path(har.path)
+
+        if har.mode == "record":
+            har_path.parent.mkdir(parents=True, exist_ok=True)
+            self.browser.route_from_har(
+                har_path, url=har.url, update=True, update_content="embed"
+            )
+        else:
+            if not har_path.is_file():
+                raise FileNotFoundError(f"HAR archive {har_path} does not exist")
+            self.browser.route_from_har(har_path, url=har.url, not_found=har.not_found)
+
+        self.har = har
+        logger.info(f"Started HAR {har.mode} ({har_path})")
+
+    def exposed_stop_har(self) -> None:
+        """
+        Stop recording or replaying a HAR archive.
+
+        Playwright only writes a recorded archive when the browser context is
+        closed, so after recording, the context is closed (regardless of other
+        connections using it) and then relaunched for this connection.
+        """
+        self.stop_har()
+
+    def stop_har(self, relaunch: bool = True) -> None:
+        """
+        Stop recording or replaying a HAR archive.
+
+        :param relaunch: Whether to relaunch the browser after it's closed to
+            write a recorded archive.
+        """
+        har, self.har = self.har, None
+        if har is None or self.browser_key is None:
+            return
+
+        if har.mode == "record":
+            browser_key = self.browser_key
+            self.release_browser()
+            with self.timings.span("har.flush", har.path):
+                self.get_runtime().close_contexts(browser_key[0])
+            if relaunch:
+                self.exposed_set_browser(*browser_key)  # type: ignore[arg-type]
+        elif self.browser is not None:
+            self.browser.unroute_all(behavior="ignoreErrors")
+
+        logger.info(f"Stopped HAR {har.mode} ({har.path})")
+
+    def close_browser_for_profile(self, browser_type: str) -> None:
+        """
+        Close the browser (including contexts used by other connections), so
+        that its profile files can be safely read or replaced.
+        """
+        if self.browser_key is not None and self.browser_key[0] == browser_type:
+            self.release_browser()
+        self.get_runtime().close_contexts(browser_type)
+
+    def exposed_save_profile_state(
+        self,
+        browser_type: Literal["chrome", "msedge"],
+        name: str,
+        profile: str = "Default",
+    ) -> bytes:
+        """
+        Save the state of a browser profile, so that it can be restored before
+        a later scenario run with `exposed_restore_profile_state`.
+
+        The browser is closed first. Only files whose content isn't already
+        stored are copied, and caches are skipped.
+
+        :param browser_type: The browser the profile belongs to.
+        :param name: The name to save the state under. Any state previously
+            saved under this name is replaced.
+        :param profile: The name of the profile directory. Defaults to "Default".
+        :return: An encoded ProfileStateStats object.
+        """
+        self.close_browser_for_profile(browser_type)
+
+        profile_dir = get_user_data_path(browser_type) / profile
+        with self.timings.span("profile_state.save", name):
+            stats = ProfileStateStore().save(name, profile_dir)
+
+        # Encode the object to send it over RPyC
+        return self.encode_result(stats)
+
+    def exposed_restore_profile_state(
+        self,
+        browser_type: Literal["chrome", "msedge"],
+        name: str,
+        profile: str = "Default",
+    ) -> bytes:
+        """
+        Restore a browser profile to a state saved with
+        `exposed_save_profile_state`.
+
+        The browser is closed first, and must be opened again with
+        `exposed_set_browser` afterwards. Only files that differ from the saved
+        state are rewritten.
+
+        :param browser_type: The browser the profile belongs to.
+        :param name: The name of the saved state.
+        :param profile: The name of the profile directory. Defaults to "Default".
+        :return: An encoded ProfileStateStats object.
+        """
+        self.close_browser_for_profile(browser_type)
+
+        profile_dir = get_user_data_path(browser_type) / profile
+        with self.timings.span("profile_state.restore", name):
+            stats = ProfileStateStore().restore(name, profile_dir)
+
+        # Encode the object to send it over RPyC
+        return self.encode_result(stats)
+
+    def exposed_list_profile_states(self) -> list[str]:
+        """
+        Get the names of all saved profile states.
+        """
+        return ProfileStateStore().list_states()
+
+    def exposed_delete_profile_state(self, name: str) -> None:
+        """
+        Delete a saved profile state.
+        """
+        ProfileStateStore().delete(name)
+
+    def exposed_get_stats(self, reset: bool = False) -> bytes:
+        """
+        Get the timing spans recorded by this service process, covering each
+        phase of the browser's lifecycle (starting Playwright, launching and
+        closing browsers, killing Edge) and of browsing (navigation, dwell,
+        screenshots, downloads), as well as artifact collection.
+
+        :param reset: If True, clear the recorded timings afterwards.
+        :return: An encoded TimingStats object.
+        """
+        stats = self.timings.get_stats(reset)
+
+        # Encode the object to send it over RPyC
+        return self.encode_result(stats)
+
+    def exposed_close_history(self, continuation_token: str) -> None:
+        """
+        Stop a paginated history read early, releasing its snapshot.
+
+        It is not an error to close a read that has already finished.
+
+        :param continuation_token: The token returned by `exposed_get_history_page`.
+        """
+        history_cursor = self.history_cursors.pop(continuation_token, None)
+        if history_cursor is not None:
+            history_cursor.close()
+
+
+class ConcurrentChromiumService(ChromiumService):
+    """
+    A ChromiumService that drives the browser with Playwright's async API.
+
+    Calls made by different connections are scheduled onto a single event loop
+    instead of being run one at a time, so one service process can browse with
+    several connections in parallel: for example, one connection per browser
+    (Chrome and Edge), or several connections sharing the same context, each
+    with its own pages. This is useful for simulating several users at once.
+
+    Note that only one profile per browser can be open at a time, since every
+    profile of a browser shares the same user data directory.
+
+    Use the `ConcurrentChromiumServiceAPI` class to connect to and interact with
+    this service.
+    """
+
+    runtime: ClassVar[PlaywrightRuntime | None] = None
+    runtime_lock: ClassVar[threading.Lock] = threading.Lock()
+    runtime_class: ClassVar[type[PlaywrightRuntime]] = AsyncPlaywrightRuntime
+    timings: ClassVar[TimingRecorder] = TimingRecorder()
 
 
 if __name__ == "__main__":
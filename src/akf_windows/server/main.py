@@ -7,19 +7,34 @@ terminate them when requested. This helps manage resources and ensure that only
 the necessary services are running at any given time.
 """
 
+import argparse
 import logging
 import multiprocessing as mp
+import os
+import pickle
+import queue
 import sys
+import threading
+import time
 from dataclasses import dataclass
-from typing import ClassVar, Type
+from pathlib import Path
+from typing import Any, ClassVar, Type
 
 import rpyc
 from akflib.core.agents.server import AKFService
 from rpyc.utils.server import ThreadedServer
 
+from akf_windows.common.dispatch import (
+    DEFAULT_INSTANCE,
+    AgentStatus,
+    ServiceState,
+    ServiceStatus,
+)
+from akf_windows.common.metrics import MethodRecorder, instrument_exposed_methods
+from akf_windows.server._base import WindowsService
 from akf_windows.server.artifacts import WindowsArtifactService
 from akf_windows.server.autogui import PyAutoGuiService
-from akf_windows.server.chromium import ChromiumService
+from akf_windows.server.chromium import ChromiumService, ConcurrentChromiumService
 
 # Set up logging
 logging.basicConfig(
@@ -36,6 +51,7 @@ SERVICE_LIST: list[Type[AKFService]] = [
     WindowsArtifactService,
     PyAutoGuiService,
     ChromiumService,
+    ConcurrentChromiumService,
 ]
 AVAILABLE_SERVICES: dict[str, Type[AKFService]] = {
     service.__name__: service for service in SERVICE_LIST
@@ -74,14 +90,52 @@ AVAILABLE_SERVICES: dict[str, Type[AKFService]] = {
 #     _Popen = _Popen
 
 
-def start_subservice(server: rpyc.ThreadedServer) -> None:
+def start_subservice(
+    server: rpyc.ThreadedServer,
+    ready: Any = None,
+    connection_count: Any = None,
+    metrics_queue: Any = None,
+) -> None:
     """
     Entrypoint for starting a new ThreadedServer for a given service.
 
     This should be called from a new process each time.
+
+    :param server: The server to start.
+    :param ready: A multiprocessing Event, set once the service is about to
+        start accepting connections.
+    :param connection_count: A multiprocessing Value, kept up to date with the
+        number of open connections to the service.
+    :param metrics_queue: A multiprocessing Queue, which each call to the
+        service's exposed methods is reported on.
     """
-    # Don't know if there's any other setup that needs to happen here, but this
-    # is its own function for now
+    if connection_count is not None and issubclass(server.service, WindowsService):
+        server.service.connection_count = connection_count
+
+    if metrics_queue is not None and issubclass(server.service, WindowsService):
+        # Don't wait for unsent metrics when exiting, in case the dispatcher
+        # isn't reading them
+        metrics_queue.cancel_join_thread()
+        server.service.metrics_queue = metrics_queue
+
+    # Services can optionally do expensive setup (such as starting Playwright)
+    # before accepting connections, so that it's already done when a
+    # pre-spawned worker is handed out.
+    warm_up = getattr(server.service, "warm_up", None)
+    if warm_up is not None:
+        try:
+            warm_up()
+        except Exception as e:
+            logger.warning(f"Failed to warm up {server.service.__name__}: {e}")
+
+    # The server's socket is bound when the server is constructed, but
+    # connections are refused until it's listening. Listen before signalling
+    # readiness, so that a client told the service is ready can connect
+    # straight away; connections are queued until `start()` accepts them.
+    # (`start()` listens again, which only re-applies the backlog.)
+    server.listener.listen(server.backlog)
+    if ready is not None:
+        ready.set()
 
     # Blocking.
     server.start()
@@ -97,67 +151,588 @@ class ServiceInfo:
     server: rpyc.ThreadedServer
     port: int
 
+    # Set by the service's process once it's accepting connections
+    ready: Any = None
+
+    # The number of open connections to the service, updated by its process
+    connection_count: Any = None
+
+    # When the instance was last picked by `pick_instance()`
+    last_picked: float = 0.0
+
+    def is_ready(self) -> bool:
+        return self.ready is not None and self.ready.is_set()
+
+    @property
+    def connections(self) -> int:
+        if self.connection_count is None:
+            return 0
+        return self.connection_count.value  # type: ignore[no-any-return]
+
+    def get_status(
+        self, service_name: str, instance: str = DEFAULT_INSTANCE, restarts: int = 0
+    ) -> ServiceStatus:
+        state: ServiceState = "ready" if self.is_ready() else "starting"
+        if not self.process.is_alive():
+            state = "exited"
+
+        return ServiceStatus(
+            name=service_name,
+            instance=instance,
+            port=self.port,
+            state=state,
+            pid=self.process.pid,
+            exit_code=self.process.exitcode,
+            restarts=restarts,
+            connections=self.connections,
+        )
+
+
+def spawn_service(service_name: str, metrics_queue: Any = None) -> ServiceInfo:
+    """
+    Start a service by name in a new process.
+
+    :param service_name: The name of the service to start.
+    :param metrics_queue: A multiprocessing Queue to report calls to the
+        service's exposed methods on.
+    """
+    # Pickling is permitted to allow for more complex objects where needed.
+    # AKF is assumed to run in a trusted environment.
+    service_class = AVAILABLE_SERVICES[service_name]
+    server = ThreadedServer(
+        service_class,
+        port=0,
+        protocol_config={"allow_all_attrs": True, "allow_pickle": True},
+    )
+
+    # Start the service in a new process
+    ready = mp.Event()
+    connection_count = mp.Value("i", 0)
+    process = mp.Process(
+        target=start_subservice,
+        args=(server, ready, connection_count, metrics_queue),
+    )
+    process.start()
+
+    # Internally, `port` is the second element of the tuple returned by
+    # `socket.getsockname()`. As per https://docs.python.org/3/library/socket.html,
+    # this is the port number that the socket is bound to for both AF_INET
+    # and AF_INET6 sockets. This is not true of the other address families,
+    # but should be a valid assumption for our case.
+    port = server.port
+    assert isinstance(port, int)
+
+    # TODO: does two processes having a handle to the same service do
+    # what i expected it to do?
+    return ServiceInfo(process, server, port, ready, connection_count)
+
+
+def parse_prespawn(values: list[str]) -> dict[str, int]:
+    """
+    Parse pool sizes given as `ServiceName=count` strings.
+    """
+    pool_sizes: dict[str, int] = {}
+    for value in values:
+        service_name, _, count = value.partition("=")
+        service_name = service_name.strip()
+        if service_name not in AVAILABLE_SERVICES:
+            raise ValueError(f"Service {service_name} not found.")
+
+        pool_sizes[service_name] = int(count) if count else 1
+    return pool_sizes
+
+
+# A running instance of a service, as (service name, instance name)
+ServiceKey = tuple[str, str]
+
 
 # ignore: mypy does not recognize the `rpyc.Service` class
 class DispatchService(rpyc.Service):  # type: ignore[misc]
     """
     The "main" service that serves as the dispatch mechanism for agent subservices.
+
+    Each service can have several instances, each running in its own process.
+    Instances are identified by name; clients that don't care which instance
+    they use get the "0" instance, or can let `pick_instance()` choose the
+    least-loaded one.
     """
 
-    running_services: ClassVar[dict[str, ServiceInfo]] = {}
+    running_services: ClassVar[dict[ServiceKey, ServiceInfo]] = {}
+
+    # Workers that have been started ahead of time, and the number of workers to
+    # keep ready for each service (see `prespawn()`).
+    prespawned: ClassVar[dict[str, list[ServiceInfo]]] = {}
+    pool_sizes: ClassVar[dict[str, int]] = {}
+
+    # The number of workers being spawned for each pool, which count towards
+    # its size
+    spawning: ClassVar[dict[str, int]] = {}
+
+    # Instances handed out by `pick_instance()` that haven't been started yet,
+    # with when they were picked. They count as taken until they're started or
+    # `pick_grace_period` expires, so that concurrent picks don't get the same
+    # new instance.
+    reserved_instances: ClassVar[dict[ServiceKey, float]] = {}
+
+    # Instances whose process is being spawned by `start_service()`, which is
+    # done outside `services_lock`. The event is set once the instance is in
+    # `running_services` (or spawning it failed).
+    starting_services: ClassVar[dict[ServiceKey, threading.Event]] = {}
+
+    # Guards `running_services`, `prespawned`, `spawning`, `reserved_instances`
+    # and `starting_services`
+    services_lock: ClassVar[threading.RLock] = threading.RLock()
+
+    # The final status of instances whose process exited, until they're started
+    # again, and the number of times each instance has been restarted
+    exited_services: ClassVar[dict[ServiceKey, ServiceStatus]] = {}
+    restart_counts: ClassVar[dict[ServiceKey, int]] = {}
+
+    # How often the supervisor checks that workers are still alive, in seconds
+    supervise_interval: ClassVar[float] = 1.0
+
+    # How long an instance handed out by `pick_instance()` counts as having an
+    # extra connection, covering the time it takes the client to connect.
+    pick_grace_period: ClassVar[float] = 5.0
+
+    # Calls to the exposed methods of the dispatcher and every service. Service
+    # processes put their calls on `metrics_queue`, which is drained by the
+    # supervisor. If `metrics_path` is set, the metrics are written to it as
+    # JSON every `metrics_dump_interval` seconds and when the agent stops.
+    metrics: ClassVar[MethodRecorder] = MethodRecorder()
+    metrics_queue: ClassVar[Any] = None
+    metrics_path: ClassVar[Path | None] = None
+    metrics_dump_interval: ClassVar[float] = 60.0
+
+    @classmethod
+    def supervise(cls) -> None:
+        """
+        Start a background thread that periodically reaps dead workers (see
+        `reap()`).
+        """
+
+        def _supervise() -> None:
+            last_dump = time.monotonic()
+            while True:
+                time.sleep(cls.supervise_interval)
+                try:
+                    cls.reap()
+                    cls.collect_metrics()
+                    if time.monotonic() - last_dump >= cls.metrics_dump_interval:
+                        last_dump = time.monotonic()
+                        cls.dump_metrics()
+                except Exception:
+                    logger.exception("Failed to check on services")
+
+        threading.Thread(target=_supervise, name="supervisor", daemon=True).start()
+
+    @classmethod
+    def get_metrics_queue(cls) -> Any:
+        """
+        Get the queue that services report calls to their exposed methods on,
+        creating it if needed.
+        """
+        with cls.services_lock:
+            if cls.metrics_queue is None:
+                # Bounded, so that services drop calls instead of buffering
+                # them indefinitely if the supervisor isn't draining the queue
+                cls.metrics_queue = mp.Queue(maxsize=100_000)
+            return cls.metrics_queue
+
+    @classmethod
+    def record_call(
+        cls, method: str, seconds: float, result_bytes: int, error: bool
+    ) -> None:
+        """
+        Record a call to one of the dispatcher's own exposed methods.
+        """
+        cls.metrics.record(cls.__name__, method, seconds, result_bytes, error)
+
+    @classmethod
+    def collect_metrics(cls) -> None:
+        """
+        Record the calls that services have reported since the last collection.
+        """
+        if cls.metrics_queue is None:
+            return
+
+        while True:
+            try:
+                call = cls.metrics_queue.get_nowait()
+            except queue.Empty:
+                return
+            cls.metrics.record(*call)
+
+    @classmethod
+    def dump_metrics(cls) -> None:
+        """
+        Write the metrics recorded so far to `metrics_path` as JSON, if set.
+        """
+        if cls.metrics_path is None:
+            return
+
+        cls.collect_metrics()
+        metrics = cls.metrics.get_metrics()
+
+        # Replace the file in one step, so that readers never see a partial file
+        temp_path = cls.metrics_path.with_name(cls.metrics_path.name + ".tmp")
+        temp_path.write_text(metrics.model_dump_json(indent=2))
+        os.replace(temp_path, cls.metrics_path)
+
+    @classmethod
+    def reap(cls) -> None:
+        """
+        Remove services and pre-spawned workers whose process has exited.
+
+        The final status of each dead instance is kept, so that clients can see
+        why it exited; the instance is restarted the next time it's requested.
+        Pools that lost a worker are refilled.
+        """
+        with cls.services_lock:
+            for key, service_info in list(cls.running_services.items()):
+                if service_info.process.is_alive():
+                    continue
+
+                status = service_info.get_status(
+                    *key, restarts=cls.restart_counts.get(key, 0)
+                )
+                logger.warning(
+                    f"Service {format_service_key(key)} (PID {status.pid}) exited "
+                    f"with code {status.exit_code}"
+                )
+                del cls.running_services[key]
+                cls.exited_services[key] = status
+                service_info.server.close()
+
+            for service_name, pool in cls.prespawned.items():
+                dead = [w for w in pool if not w.process.is_alive()]
+                for service_info in dead:
+                    logger.warning(
+                        f"Discarding dead pre-spawned {service_name} worker "
+                        f"(exit code {service_info.process.exitcode})"
+                    )
+                    pool.remove(service_info)
+                    service_info.server.close()
+
+                if dead:
+                    cls.refill_pool(service_name)
+
+    @classmethod
+    def prespawn(cls, pool_sizes: dict[str, int]) -> None:
+        """
+        Keep a pool of ready workers for each of the specified services.
+
+        Starting a service normally means spawning a new process, which on
+        Windows re-imports every dependency of the service. With a pool, the
+        next `start_service` call for that service hands over a worker that
+        has already started, and the pool is refilled in the background.
+
+        :param pool_sizes: The number of workers to keep ready, by service name.
+        """
+        for service_name, count in pool_sizes.items():
+            if service_name not in AVAILABLE_SERVICES:
+                raise ValueError(f"Service {service_name} not found.")
+
+            cls.pool_sizes[service_name] = count
+            cls.refill_pool(service_name)
+
+    @classmethod
+    def refill_pool(cls, service_name: str) -> None:
+        """
+        Start workers in the background until the pool for a service is full.
+        """
+        threading.Thread(
+            target=cls._fill_pool,
+            args=(service_name,),
+            name=f"prespawn-{service_name}",
+            daemon=True,
+        ).start()
+
+    @classmethod
+    def _fill_pool(cls, service_name: str) -> None:
+        while True:
+            # Reserve a slot in the pool, so that concurrent refills don't
+            # overfill it, but spawn outside the lock so that other requests
+            # aren't held up by starting the process
+            with cls.services_lock:
+                pool = cls.prespawned.setdefault(service_name, [])
+                spawning = cls.spawning.get(service_name, 0)
+                if len(pool) + spawning >= cls.pool_sizes.get(service_name, 0):
+                    return
+                cls.spawning[service_name] = spawning + 1
+
+            service_info = None
+            try:
+                service_info = spawn_service(service_name, cls.get_metrics_queue())
+            finally:
+                with cls.services_lock:
+                    cls.spawning[service_name] -= 1
+                    if service_info is not None:
+                        pool.append(service_info)
+
+            logger.info(
+                f"Pre-spawned {service_name} worker on port {service_info.port}"
+            )
+
+    @classmethod
+    def take_prespawned(cls, service_name: str) -> ServiceInfo | None:
+        """
+        Take a live worker from the pool for a service, if there is one.
 
-    def exposed_start_service(self, service_name: str) -> int:
+        Workers that are already accepting connections are preferred over those
+        that are still starting up.
+        """
+        with cls.services_lock:
+            pool = cls.prespawned.get(service_name, [])
+            pool[:] = [w for w in pool if w.process.is_alive()]
+            if not pool:
+                return None
+
+            service_info = next((w for w in pool if w.is_ready()), pool[0])
+            pool.remove(service_info)
+            return service_info
+
+    @classmethod
+    def get_instances(cls, service_name: str) -> dict[str, ServiceInfo]:
+        """
+        Get the running instances of a service, by instance name.
+        """
+        with cls.services_lock:
+            return {
+                instance: service_info
+                for (name, instance), service_info in cls.running_services.items()
+                if name == service_name
+            }
+
+    def exposed_start_service(
+        self, service_name: str, instance: str = DEFAULT_INSTANCE
+    ) -> int:
         """
         Start a service by name. Return the port number allocated for the service.
+
+        :param service_name: The name of the service to start.
+        :param instance: The name of the instance to start. Each instance of a
+            service runs in its own process, and so doesn't share any state
+            with other instances.
         """
         # Check if service exists
         if service_name not in AVAILABLE_SERVICES:
             raise ValueError(f"Service {service_name} not found.")
 
-        # Check if service is already running, in which case just return the exists
-        # port number
-        if service_name in self.running_services:
-            return self.running_services[service_name].port
-
-        # Pickling is permitted to allow for more complex objects where needed.
-        # AKF is assumed to run in a trusted environment.
-        service_class = AVAILABLE_SERVICES[service_name]
-        server = ThreadedServer(
-            service_class,
-            port=0,
-            protocol_config={"allow_all_attrs": True, "allow_pickle": True},
-        )
+        key = (service_name, str(instance))
+        while True:
+            with self.services_lock:
+                # Don't hand out the port of a service that has died since the
+                # supervisor last checked
+                self.reap()
+
+                # Check if service is already running, in which case just return
+                # the exists port number
+                if key in self.running_services:
+                    return self.running_services[key].port
+
+                # Another caller is already spawning this instance; wait for it
+                # outside the lock, then check again
+                started = self.starting_services.get(key)
+                if started is None:
+                    if self.exited_services.pop(key, None) is not None:
+                        self.restart_counts[key] = self.restart_counts.get(key, 0) + 1
+                        logger.info(f"Restarting service {format_service_key(key)}")
+
+                    service_info = self.take_prespawned(service_name)
+                    if service_info is not None:
+                        logger.info(
+                            f"Handing over pre-spawned {format_service_key(key)} on "
+                            f"port {service_info.port}"
+                        )
+                        self.refill_pool(service_name)
+                        return self.publish_service(key, service_info)
+
+                    self.starting_services[key] = threading.Event()
+
+            if started is not None:
+                started.wait()
+                continue
+
+            # Spawning outside the lock means other requests (and the
+            # supervisor) aren't held up while the process starts
+            try:
+                service_info = spawn_service(service_name, self.get_metrics_queue())
+            except BaseException:
+                with self.services_lock:
+                    self.starting_services.pop(key).set()
+                raise
+
+            logger.info(
+                f"Started service {format_service_key(key)} on port "
+                f"{service_info.port}"
+            )
+            with self.services_lock:
+                self.starting_services.pop(key).set()
+                return self.publish_service(key, service_info)
+
+    @classmethod
+    def publish_service(cls, key: ServiceKey, service_info: ServiceInfo) -> int:
+        """
+        Add a newly started instance to `running_services`, and return its port.
+        Must be called with `services_lock` held.
+        """
+        # Whoever started the instance is about to connect to it
+        service_info.last_picked = time.monotonic()
+        cls.running_services[key] = service_info
+        cls.reserved_instances.pop(key, None)
+        return service_info.port
+
+    def exposed_pick_instance(self, service_name: str, max_instances: int = 1) -> str:
+        """
+        Pick the least-loaded instance of a service, starting a new one if every
+        running instance is busy and there are fewer than `max_instances`.
+
+        Load is the number of open connections to an instance, plus one if it
+        was picked within the last `pick_grace_period` seconds (so that clients
+        picking at the same time are spread out before they connect). A new
+        instance is reserved until it's started, for up to `pick_grace_period`
+        seconds, so it's only handed out once.
+
+        :param service_name: The name of the service.
+        :param max_instances: The maximum number of instances of the service to
+            run at once.
+        :return: The name of the instance, which must then be started with
+            `start_service()`.
+        """
+        if service_name not in AVAILABLE_SERVICES:
+            raise ValueError(f"Service {service_name} not found.")
+
+        with self.services_lock:
+            self.reap()
+            now = time.monotonic()
+
+            def load(service_info: ServiceInfo) -> int:
+                recently_picked = (
+                    now - service_info.last_picked < self.pick_grace_period
+                )
+                return service_info.connections + recently_picked
+
+            instances = self.get_instances(service_name)
+
+            # Reserved instances are always recently picked
+            for key, picked in list(self.reserved_instances.items()):
+                if now - picked >= self.pick_grace_period:
+                    del self.reserved_instances[key]
+            reserved = [
+                instance
+                for name, instance in [
+                    *self.reserved_instances,
+                    *self.starting_services,
+                ]
+                if name == service_name and instance not in instances
+            ]
+
+            loads = {instance: load(info) for instance, info in instances.items()}
+            loads.update((instance, 1) for instance in reserved)
+            if loads:
+                instance = min(loads, key=lambda instance: loads[instance])
+                if loads[instance] == 0 or len(loads) >= max_instances:
+                    if instance in instances:
+                        instances[instance].last_picked = now
+                    else:
+                        self.reserved_instances[(service_name, instance)] = now
+                    return instance
+
+            # Use the lowest instance number that isn't taken
+            number = 0
+            while str(number) in loads:
+                number += 1
+            self.reserved_instances[(service_name, str(number))] = now
+            return str(number)
+
+    def exposed_stop_service(
+        self, service_name: str, instance: str = DEFAULT_INSTANCE
+    ) -> None:
+        """
+        Stop an instance of a service by name.
+        """
+        key = (service_name, str(instance))
+        with self.services_lock:
+            # A service that has already exited just needs to be forgotten
+            if self.exited_services.pop(key, None) is not None:
+                return
+
+            if key not in self.running_services:
+                raise ValueError(f"Service {format_service_key(key)} not found.")
+
+            logger.info(f"Stopping service {format_service_key(key)}")
+            service_info = self.running_services.pop(key)
+        service_info.process.terminate()
+        service_info.server.close()
 
-        # Start the service in a new process
-        process = mp.Process(target=start_subservice, args=(server,))
-        process.start()
+    def exposed_wait_for_service(
+        self, service_name: str, timeout: float, instance: str = DEFAULT_INSTANCE
+    ) -> bytes:
+        """
+        Wait until a running service is accepting connections, it exits, or the
+        timeout expires, whichever comes first.
 
-        # Internally, `port` is the second element of the tuple returned by
-        # `socket.getsockname()`. As per https://docs.python.org/3/library/socket.html,
-        # this is the port number that the socket is bound to for both AF_INET
-        # and AF_INET6 sockets. This is not true of the other address families,
-        # but should be a valid assumption for our case.
-        port = server.port
-        assert isinstance(port, int)
+        Keep the timeout below RPyC's `sync_request_timeout`, and call this again
+        if the service is still starting.
 
-        logger.info(f"Started service {service_name} on port {port}")
-        # TODO: does two processes having a handle to the same service do
-        # what i expected it to do?
-        self.running_services[service_name] = ServiceInfo(process, server, port)
+        :return: The pickled `ServiceStatus` of the service.
+        """
+        key = (service_name, str(instance))
+        if key in self.exited_services:
+            return pickle.dumps(self.exited_services[key])
+
+        if key not in self.running_services:
+            raise ValueError(f"Service {format_service_key(key)} not found.")
+
+        service_info = self.running_services[key]
+        deadline = time.monotonic() + timeout
+        while (
+            not service_info.is_ready()
+            and service_info.process.is_alive()
+            and (remaining := deadline - time.monotonic()) > 0
+        ):
+            # Wake up periodically to notice if the process has died
+            service_info.ready.wait(min(remaining, 0.1))
+
+        return pickle.dumps(
+            service_info.get_status(*key, restarts=self.restart_counts.get(key, 0))
+        )
 
-        return port
+    def exposed_get_status(self) -> bytes:
+        """
+        Get the status of the agent and every running service.
 
-    def exposed_stop_service(self, service_name: str) -> None:
+        :return: The pickled `AgentStatus`.
         """
-        Stop a service by name.
+        with self.services_lock:
+            services = list(self.exited_services.values())
+            for key, service_info in self.running_services.items():
+                services.append(
+                    service_info.get_status(
+                        *key, restarts=self.restart_counts.get(key, 0)
+                    )
+                )
+
+            status = AgentStatus(
+                services=sorted(services, key=lambda s: (s.name, s.instance)),
+                prespawned={name: len(pool) for name, pool in self.prespawned.items()},
+            )
+        return pickle.dumps(status)
+
+    def exposed_get_metrics(self, reset: bool = False) -> bytes:
         """
-        if service_name not in self.running_services:
-            raise ValueError(f"Service {service_name} not found.")
+        Get the number of calls to each exposed method of the dispatcher and of
+        every service, how long they took and how large their results were.
 
-        logger.info(f"Stopping service {service_name}")
-        service_info = self.running_services.pop(service_name)
-        service_info.process.terminate()
-        service_info.server.close()
+        Calls to every instance of a service are combined, and calls to
+        instances that have since exited are kept.
+
+        :param reset: If True, clear the recorded metrics afterwards.
+        :return: The pickled `CallMetrics`.
+        """
+        self.collect_metrics()
+        return pickle.dumps(self.metrics.get_metrics(reset))
 
     def exposed_get_available_services(self) -> list[str]:
         """
@@ -168,11 +743,56 @@ class DispatchService(rpyc.Service):  # type: ignore[misc]
     def exposed_get_running_services(self) -> dict[str, int]:
         """
         Get a dictionary of running services and their corresponding ports.
+
+        Instances other than the default one are listed as "name:instance".
         """
-        return {k: v.port for k, v in self.running_services.items()}
+        return {format_service_key(k): v.port for k, v in self.running_services.items()}
+
+
+instrument_exposed_methods(DispatchService)
+
+
+def format_service_key(key: ServiceKey) -> str:
+    service_name, instance = key
+    if instance == DEFAULT_INSTANCE:
+        return service_name
+    return f"{service_name}:{instance}"
 
 
 def main() -> None:
+    parser = argparse.ArgumentParser(description="Start the AKF Windows agent.")
+    parser.add_argument(
+        "--prespawn",
+        action="append",
+        default=[],
+        metavar="SERVICE=COUNT",
+        help=(
+            "Keep COUNT ready workers for a service, so that starting it is "
+            "instant (e.g. --prespawn ChromiumService=1). Can be repeated. "
+            "Also read from the comma-separated AKF_PRESPAWN environment variable."
+        ),
+    )
+    parser.add_argument(
+        "--metrics-file",
+        type=Path,
+        default=os.getenv("AKF_METRICS_FILE"),
+        metavar="PATH",
+        help=(
+            "Periodically write per-method call metrics for every service to "
+            "this file as JSON. Also read from the AKF_METRICS_FILE environment "
+            "variable."
+        ),
+    )
+    args = parser.parse_args()
+
+    DispatchService.metrics_path = args.metrics_file
+
+    prespawn_values = args.prespawn
+    if os.getenv("AKF_PRESPAWN"):
+        prespawn_values += os.environ["AKF_PRESPAWN"].split(",")
+    DispatchService.prespawn(parse_prespawn(prespawn_values))
+    DispatchService.supervise()
+
     # Bind the server to the standard port.
     server = ThreadedServer(
         DispatchService, port=18861, protocol_config={"allow_all_attrs": True}
@@ -188,6 +808,12 @@ def main() -> None:
     # Teardown - the server has terminated and all subprocesses should be killed
     logger.info("DispatchService received interrupt, tearing down services")
     service: DispatchService = server.service
-    for subservice in service.running_services.values():
+    subservices = list(service.running_services.values())
+    for pool in service.prespawned.values():
+        subservices += pool
+
+    for subservice in subservices:
         logger.info(f"Killing process with PID {subservice.process.pid}")
         subservice.process.kill()
+
+    service.dump_metrics()
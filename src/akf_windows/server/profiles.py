@@ -0,0 +1,289 @@
+"""
+Save and restore the state of browser profile directories.
+
+Saved states are stored as content-addressed blobs (one zlib-compressed blob per
+distinct file content, named by its SHA-256 hash) and a JSON manifest per state
+mapping each file to its blob. Files shared between states, or unchanged since
+the last save, are only stored once. Caches are skipped entirely, since they are
+large and the browser rebuilds them as needed.
+
+Restoring only rewrites the files that differ from the saved state and deletes
+files that weren't part of it, so resetting a profile between scenario runs
+takes seconds rather than a full VM restore.
+"""
+
+import hashlib
+import logging
+import os
+import time
+import zlib
+from datetime import UTC, datetime
+from pathlib import Path
+
+from pydantic import AwareDatetime, BaseModel
+
+from akf_windows.common.chromium import ProfileStateStats
+from akf_windows.server._util import get_scratch_path
+
+logger = logging.getLogger(__name__)
+
+# Directories that are never saved (or touched on restore), matched against
+# every component of a file's path relative to the profile directory.
+EXCLUDED_DIRS = {
+    "Cache",
+    "Code Cache",
+    "GPUCache",
+    "GrShaderCache",
+    "ShaderCache",
+    "DawnCache",
+    "DawnGraphiteCache",
+    "DawnWebGPUCache",
+    "CacheStorage",
+    "ScriptCache",
+    "Crashpad",
+}
+
+# Lock files created by a running browser.
+EXCLUDED_FILES = {"lockfile", "SingletonLock", "SingletonCookie", "SingletonSocket"}
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class ManifestEntry(BaseModel):
+    """
+    A single file in a saved profile state.
+    """
+
+    sha256: str
+    size: int
+
+    # The modification time of the file when it was saved. Restored files are
+    # given the same time, so unchanged files can be recognized without
+    # hashing them.
+    mtime_ns: int
+
+
+class ProfileManifest(BaseModel):
+    """
+    The files that make up a saved profile state, keyed by their path relative
+    to the profile directory (always with forward slashes).
+    """
+
+    name: str
+    source: str
+    created: AwareDatetime
+    files: dict[str, ManifestEntry] = {}
+
+
+def is_excluded(relative_path: Path) -> bool:
+    """
+    Check if a file should be left out of saved profile states.
+    """
+    if relative_path.name in EXCLUDED_FILES:
+        return True
+    return any(part in EXCLUDED_DIRS for part in relative_path.parts[:-1])
+
+
+def iter_profile_files(profile_dir: Path) -> dict[str, Path]:
+    """
+    Get every file in a profile directory that should be saved, keyed by its
+    manifest path.
+    """
+    result: dict[str, Path] = {}
+    for root, dirs, files in os.walk(profile_dir):
+        # Don't descend into excluded directories at all
+        dirs[:] = [d for d in dirs if d not in EXCLUDED_DIRS]
+
+        for file in files:
+            path = Path(root) / file
+            relative_path = path.relative_to(profile_dir)
+            if not is_excluded(relative_path):
+                result[relative_path.as_posix()] = path
+    return result
+
+
+def hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ProfileStateStore:
+    """
+    A directory of saved profile states.
+    """
+
+    def __init__(self, root: Path | None = None) -> None:
+        """
+        :param root: The directory to store states in. Defaults to a
+            `profile-states` folder in the scratch directory.
+        """
+        if root is None:
+            root = get_scratch_path() / "profile-states"
+
+        self.root = root
+        self.blob_dir = root / "blobs"
+        self.manifest_dir = root / "manifests"
+
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        self.manifest_dir.mkdir(parents=True, exist_ok=True)
+
+    def list_states(self) -> list[str]:
+        """
+        Get the names of all saved states.
+        """
+        return sorted(path.stem for path in self.manifest_dir.glob("*.json"))
+
+    def get_manifest(self, name: str) -> ProfileManifest | None:
+        manifest_path = self._manifest_path(name)
+        if not manifest_path.exists():
+            return None
+        return ProfileManifest.model_validate_json(manifest_path.read_bytes())
+
+    def save(self, name: str, profile_dir: Path) -> ProfileStateStats:
+        """
+        Save the state of a profile directory under a name, replacing any state
+        previously saved under that name.
+
+        The browser must not be running with this profile, or its files may be
+        locked or inconsistent.
+        """
+        if not profile_dir.is_dir():
+            raise FileNotFoundError(f"Profile directory {profile_dir} does not exist")
+
+        start = time.perf_counter()
+        stats = ProfileStateStats(name=name)
+
+        # Files that haven't changed since the previous save under this name
+        # don't need to be hashed again
+        previous = self.get_manifest(name)
+        previous_files = previous.files if previous is not None else {}
+
+        manifest = ProfileManifest(
+            name=name, source=str(profile_dir), created=datetime.now(UTC)
+        )
+        for manifest_path, path in iter_profile_files(profile_dir).items():
+            try:
+                stat = path.stat()
+                entry = previous_files.get(manifest_path)
+                if (
+                    entry is None
+                    or entry.size != stat.st_size
+                    or entry.mtime_ns != stat.st_mtime_ns
+                    or not self._blob_path(entry.sha256).exists()
+                ):
+                    entry = ManifestEntry(
+                        sha256=hash_file(path),
+                        size=stat.st_size,
+                        mtime_ns=stat.st_mtime_ns,
+                    )
+                    if self._store_blob(entry.sha256, path):
+                        stats.copied_files += 1
+                        stats.copied_bytes += entry.size
+            except OSError as e:
+                logger.warning(f"Skipping {path}: {e}")
+                continue
+
+            manifest.files[manifest_path] = entry
+            stats.files += 1
+            stats.total_bytes += entry.size
+
+        # Write the manifest last, so an interrupted save never leaves a
+        # manifest that refers to missing blobs
+        temp_path = self._manifest_path(name).with_suffix(".tmp")
+        temp_path.write_text(manifest.model_dump_json())
+        temp_path.replace(self._manifest_path(name))
+
+        stats.seconds = time.perf_counter() - start
+        logger.info(
+            f"Saved profile state {name!r}: {stats.files} files, "
+            f"{stats.copied_files} new ({stats.copied_bytes} bytes) in "
+            f"{stats.seconds:.2f}s"
+        )
+        return stats
+
+    def restore(self, name: str, profile_dir: Path) -> ProfileStateStats:
+        """
+        Restore a profile directory to a saved state.
+
+        Only files that differ from the saved state are rewritten, and files
+        that weren't part of it are deleted. Excluded files (such as caches) are
+        left alone. The browser must not be running with this profile.
+        """
+        manifest = self.get_manifest(name)
+        if manifest is None:
+            raise ValueError(f"No profile state named {name!r}")
+
+        start = time.perf_counter()
+        stats = ProfileStateStats(name=name)
+        profile_dir.mkdir(parents=True, exist_ok=True)
+
+        for manifest_path, path in iter_profile_files(profile_dir).items():
+            if manifest_path not in manifest.files:
+                path.unlink()
+                stats.deleted_files += 1
+
+        for manifest_path, entry in manifest.files.items():
+            path = profile_dir / manifest_path
+            stats.files += 1
+            stats.total_bytes += entry.size
+
+            try:
+                stat = path.stat()
+                if stat.st_size == entry.size and stat.st_mtime_ns == entry.mtime_ns:
+                    continue
+            except FileNotFoundError:
+                path.parent.mkdir(parents=True, exist_ok=True)
+
+            with open(self._blob_path(entry.sha256), "rb") as f:
+                path.write_bytes(zlib.decompress(f.read()))
+            os.utime(path, ns=(entry.mtime_ns, entry.mtime_ns))
+
+            stats.copied_files += 1
+            stats.copied_bytes += entry.size
+
+        stats.seconds = time.perf_counter() - start
+        logger.info(
+            f"Restored profile state {name!r}: {stats.copied_files} files "
+            f"rewritten, {stats.deleted_files} deleted in {stats.seconds:.2f}s"
+        )
+        return stats
+
+    def delete(self, name: str) -> None:
+        """
+        Delete a saved state, along with any blobs no other state refers to.
+        """
+        self._manifest_path(name).unlink(missing_ok=True)
+
+        referenced: set[str] = set()
+        for other_name in self.list_states():
+            manifest = self.get_manifest(other_name)
+            if manifest is not None:
+                referenced.update(entry.sha256 for entry in manifest.files.values())
+
+        for blob_path in self.blob_dir.glob("*/*"):
+            if blob_path.name not in referenced:
+                blob_path.unlink()
+
+    def _manifest_path(self, name: str) -> Path:
+        if not name or Path(name).name != name:
+            raise ValueError(f"Invalid profile state name {name!r}")
+        return self.manifest_dir / f"{name}.json"
+
+    def _blob_path(self, sha256: str) -> Path:
+        return self.blob_dir / sha256[:2] / sha256
+
+    def _store_blob(self, sha256: str, path: Path) -> bool:
+        # Store a file's content as a blob, returning False if it was already
+        # stored.
+        blob_path = self._blob_path(sha256)
+        if blob_path.exists():
+            return False
+
+        blob_path.parent.mkdir(exist_ok=True)
+        temp_path = blob_path.with_suffix(".tmp")
+        temp_path.write_bytes(zlib.compress(path.read_bytes(), level=1))
+        temp_path.replace(blob_path)
+        return True
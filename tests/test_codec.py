@@ -0,0 +1,158 @@
+"""
+Round-trip tests for the result codecs.
+"""
+
+import enum
+import uuid
+from datetime import UTC, datetime, timedelta, timezone
+
+import pytest
+from pydantic import BaseModel, ConfigDict, Field
+
+from akf_windows.common.codec import (
+    CODECS,
+    MSGPACK_MAGIC,
+    ResultCodec,
+    decode_result,
+    encode_result,
+    negotiate_codec,
+)
+
+requires_msgpack = pytest.mark.skipif(
+    "msgpack" not in CODECS, reason="msgpack is not installed"
+)
+
+ALL_CODECS = [
+    "pickle",
+    pytest.param("msgpack", marks=requires_msgpack),
+]
+
+
+class Color(str, enum.Enum):
+    RED = "red"
+    BLUE = "blue"
+
+
+class Facet(BaseModel):
+    full_value: str = Field(alias="fullValue")
+    color: Color = Color.RED
+
+
+class Entry(BaseModel):
+    model_config = ConfigDict(extra="allow", populate_by_name=True)
+
+    id: uuid.UUID = Field(default_factory=uuid.uuid4)
+    name: str
+    facet: Facet | None = None
+    position: tuple[int, int] = (0, 0)
+    visited: datetime | None = None
+    tags: list[str] = []
+
+
+def make_entries() -> list[Entry]:
+    shared = Facet(fullValue="https://example.com/")
+    return [
+        Entry(
+            name="first",
+            facet=shared,
+            position=(1, 2),
+            visited=datetime(2025, 1, 2, 3, 4, 5, tzinfo=timezone(timedelta(hours=-5))),
+            tags=["a", "b"],
+            source="history",
+        ),
+        Entry(name="second", facet=shared),
+        Entry(name="third"),
+    ]
+
+
+@pytest.mark.parametrize("codec", ALL_CODECS)
+def test_round_trip(codec: str) -> None:
+    entries = make_entries()
+    decoded = decode_result(encode_result(entries, codec))
+
+    assert decoded == entries
+    assert [type(entry) for entry in decoded] == [Entry] * 3
+
+
+@pytest.mark.parametrize("codec", ALL_CODECS)
+def test_shared_references(codec: str) -> None:
+    decoded = decode_result(encode_result(make_entries(), codec))
+
+    assert decoded[0].facet is decoded[1].facet
+    assert decoded[2].facet is None
+
+
+@pytest.mark.parametrize("codec", ALL_CODECS)
+def test_aliases_and_extra_fields(codec: str) -> None:
+    decoded = decode_result(encode_result(make_entries(), codec))
+
+    assert decoded[0].facet.full_value == "https://example.com/"
+    assert decoded[0].facet.model_dump(by_alias=True)["fullValue"] == (
+        "https://example.com/"
+    )
+    assert decoded[0].model_extra == {"source": "history"}
+    assert decoded[0].source == "history"
+    assert not decoded[1].model_extra
+
+
+@pytest.mark.parametrize("codec", ALL_CODECS)
+def test_fields_set(codec: str) -> None:
+    entries = make_entries()
+    decoded = decode_result(encode_result(entries, codec))
+
+    for entry, original in zip(decoded, entries):
+        assert entry.model_fields_set == original.model_fields_set
+    assert decoded[2].model_dump(exclude_unset=True) == {"name": "third"}
+
+
+@pytest.mark.parametrize("codec", ALL_CODECS)
+def test_enums_tuples_and_scalars(codec: str) -> None:
+    value = {
+        "color": Color.BLUE,
+        "pair": (1, "two", (3.0, None)),
+        "list": [1, 2],
+        "when": datetime(2025, 6, 1, 12, 30, tzinfo=UTC),
+        "id": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+        "blob": b"\x00\xff",
+        "set": {1, 2, 3},
+    }
+    decoded = decode_result(encode_result(value, codec))
+
+    assert decoded == value
+    assert type(decoded["color"]) is Color
+    assert type(decoded["pair"]) is tuple
+    assert type(decoded["pair"][2]) is tuple
+    assert type(decoded["list"]) is list
+    assert decoded["when"].utcoffset() == timedelta(0)
+
+
+@requires_msgpack
+def test_msgpack_is_identified() -> None:
+    data = encode_result(make_entries(), "msgpack")
+    assert data[:1] == MSGPACK_MAGIC
+    assert encode_result(make_entries(), "pickle")[:1] != MSGPACK_MAGIC
+
+
+@requires_msgpack
+def test_msgpack_is_smaller_than_pickle() -> None:
+    entries = [Entry(name=f"entry {i}") for i in range(100)]
+    assert len(encode_result(entries, "msgpack")) < len(
+        encode_result(entries, "pickle")
+    )
+
+
+def test_negotiate_codec() -> None:
+    assert negotiate_codec(["unknown", "pickle"]) == "pickle"
+    assert negotiate_codec(["unknown"]) == "pickle"
+    assert negotiate_codec(list(CODECS)) == list(CODECS)[0]
+
+
+def test_codecs_must_implement_encode_and_decode() -> None:
+    class EncodeOnly(ResultCodec):
+        name = "encode-only"
+
+        def encode(self, obj: object) -> bytes:
+            return b""
+
+    with pytest.raises(TypeError):
+        EncodeOnly()  # type: ignore[abstract]
@@ -0,0 +1,93 @@
+"""
+Tests for the chunked compression of large results.
+"""
+
+import os
+import time
+
+import pytest
+
+from akf_windows.common.compression import (
+    CompressedResult,
+    _new_decompressor,
+    available_compressions,
+    decompress_result,
+    negotiate_compression,
+)
+
+ALL_ALGORITHMS = [
+    "zlib",
+    pytest.param(
+        "zstd",
+        marks=pytest.mark.skipif(
+            "zstd" not in available_compressions(),
+            reason="zstandard is not installed",
+        ),
+    ),
+]
+
+
+def make_data(size: int) -> bytes:
+    # Repetitive enough to compress, with some noise so that chunks differ
+    line = b"C:\\Windows\\System32\\kernel32.dll\n"
+    return b"".join(line + os.urandom(8) for _ in range(size // (len(line) + 8)))
+
+
+@pytest.mark.parametrize("algorithm", ALL_ALGORITHMS)
+@pytest.mark.parametrize("size", [0, 1000, 5 * 1024 * 1024 + 123])
+def test_round_trip(algorithm: str, size: int) -> None:
+    data = make_data(size)
+    result = CompressedResult(data, algorithm, chunk_size=256 * 1024)
+
+    decoded, stats = decompress_result(result)
+
+    assert decoded == data
+    assert stats.algorithm == algorithm
+    assert stats.raw_bytes == len(data)
+    if data:
+        assert stats.compressed_bytes < len(data)
+        assert stats.chunks > len(data) // (256 * 1024)
+
+
+@pytest.mark.parametrize("algorithm", ALL_ALGORITHMS)
+def test_chunks_decompress_independently(algorithm: str) -> None:
+    data = make_data(1024 * 1024)
+    result = CompressedResult(data, algorithm, chunk_size=64 * 1024)
+    decompressor = _new_decompressor(algorithm)
+
+    # Each chunk yields its data as soon as it's decompressed
+    first = decompressor.decompress(result.read())
+    assert first == data[: 64 * 1024]
+    result.close()
+
+
+def test_close_stops_compression() -> None:
+    result = CompressedResult(make_data(8 * 1024 * 1024), "zlib", chunk_size=4096)
+    assert result.read()
+
+    result.close()
+
+    # The compression thread stops instead of waiting for the reader
+    result._thread.join(timeout=5)
+    assert not result._thread.is_alive()
+    assert result.read() is None
+    assert result.stats.chunks < 8 * 1024 * 1024 // 4096
+
+
+def test_unread_result_is_closed_after_read_timeout() -> None:
+    result = CompressedResult(
+        make_data(1024 * 1024), "zlib", chunk_size=4096, read_timeout=0.5
+    )
+
+    start = time.monotonic()
+    result._thread.join(timeout=10)
+
+    assert not result._thread.is_alive()
+    assert time.monotonic() - start < 10
+    assert result.read() is None
+
+
+def test_negotiate_compression() -> None:
+    assert negotiate_compression(["unknown", "zlib"]) == "zlib"
+    assert negotiate_compression(["unknown"]) is None
+    assert negotiate_compression([]) is None
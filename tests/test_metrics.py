@@ -0,0 +1,178 @@
+"""
+Tests for the per-method metrics of exposed methods.
+"""
+
+import threading
+from typing import Any, ClassVar
+
+import pytest
+
+from akf_windows.common.compression import CompressedResult
+from akf_windows.common.metrics import (
+    LATENCY_BUCKETS,
+    MethodRecorder,
+    instrument_exposed_methods,
+    payload_size,
+)
+
+
+class FakeService:
+    recorder: ClassVar[MethodRecorder]
+
+    @classmethod
+    def record_call(
+        cls, method: str, seconds: float, result_bytes: int, error: bool
+    ) -> None:
+        cls.recorder.record(cls.__name__, method, seconds, result_bytes, error)
+
+    def exposed_echo(self, data: bytes) -> bytes:
+        return data
+
+    def exposed_fail(self) -> None:
+        raise RuntimeError("failed")
+
+    def exposed_outer(self) -> bytes:
+        return self.exposed_echo(b"inner") + b"outer"
+
+    def helper(self) -> None:
+        pass
+
+
+class FakeSubService(FakeService):
+    def exposed_extra(self) -> str:
+        return "extra"
+
+
+@pytest.fixture
+def recorder() -> MethodRecorder:
+    instrument_exposed_methods(FakeService)
+    instrument_exposed_methods(FakeSubService)
+    FakeService.recorder = MethodRecorder()
+    return FakeService.recorder
+
+
+def test_record(recorder: MethodRecorder) -> None:
+    for seconds in (0.002, 0.02, 0.2, 2.0):
+        recorder.record("Service", "method", seconds, result_bytes=100)
+    recorder.record("Service", "method", 120.0, error=True)
+
+    stats = recorder.get_metrics().methods["Service.method"]
+
+    assert stats.name == "method"
+    assert stats.service == "Service"
+    assert stats.count == 5
+    assert stats.errors == 1
+    assert stats.total_seconds == pytest.approx(122.222)
+    assert stats.min_seconds == 0.002
+    assert stats.max_seconds == 120.0
+    assert stats.result_bytes == 400
+    assert stats.max_result_bytes == 100
+    assert sum(stats.latency_histogram) == 5
+    assert len(stats.latency_histogram) == len(LATENCY_BUCKETS) + 1
+    assert stats.latency_histogram[-1] == 1
+    assert stats.percentile(50) == 0.5
+    assert stats.percentile(100) == 120.0
+
+
+def test_get_metrics_returns_a_copy(recorder: MethodRecorder) -> None:
+    recorder.record("Service", "method", 0.1)
+    metrics = recorder.get_metrics()
+    recorder.record("Service", "method", 0.1)
+
+    assert metrics.methods["Service.method"].count == 1
+    assert recorder.get_metrics().methods["Service.method"].count == 2
+
+
+def test_reset(recorder: MethodRecorder) -> None:
+    recorder.record("Service", "method", 0.1)
+    before = recorder.get_metrics(reset=True)
+    after = recorder.get_metrics()
+
+    assert before.methods["Service.method"].count == 1
+    assert after.methods == {}
+    assert after.since >= before.collected
+
+
+def test_concurrent_records(recorder: MethodRecorder) -> None:
+    def record() -> None:
+        for _ in range(1000):
+            recorder.record("Service", "method", 0.001, result_bytes=1)
+
+    threads = [threading.Thread(target=record) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = recorder.get_metrics().methods["Service.method"]
+    assert stats.count == 8000
+    assert stats.result_bytes == 8000
+
+
+def test_summary(recorder: MethodRecorder) -> None:
+    recorder.record("Service", "fast", 0.01)
+    recorder.record("Service", "slow", 5.0)
+
+    lines = recorder.get_metrics().summary().splitlines()
+
+    assert lines[0].startswith("method")
+    assert lines[1].startswith("Service.slow")
+    assert lines[2].startswith("Service.fast")
+
+
+def test_instrumented_methods(recorder: MethodRecorder) -> None:
+    service = FakeSubService()
+    assert service.exposed_echo(b"12345") == b"12345"
+    assert service.exposed_extra() == "extra"
+    with pytest.raises(RuntimeError):
+        service.exposed_fail()
+    service.helper()
+
+    methods = recorder.get_metrics().methods
+    assert set(methods) == {
+        "FakeSubService.echo",
+        "FakeSubService.extra",
+        "FakeSubService.fail",
+    }
+    assert methods["FakeSubService.echo"].result_bytes == 5
+    assert methods["FakeSubService.fail"].errors == 1
+
+
+def test_nested_calls_are_recorded_once(recorder: MethodRecorder) -> None:
+    FakeService().exposed_outer()
+    FakeService().exposed_echo(b"1")
+
+    methods = recorder.get_metrics().methods
+    assert methods["FakeService.outer"].count == 1
+    assert methods["FakeService.outer"].result_bytes == len(b"innerouter")
+    assert methods["FakeService.echo"].count == 1
+
+
+def test_instrumenting_twice_records_once(recorder: MethodRecorder) -> None:
+    instrument_exposed_methods(FakeService)
+    FakeService().exposed_echo(b"1")
+
+    assert recorder.get_metrics().methods["FakeService.echo"].count == 1
+
+
+@pytest.mark.parametrize(
+    "result, size",
+    [
+        (b"1234", 4),
+        (bytearray(3), 3),
+        ("ab", 2),
+        ((b"12", "3"), 3),
+        (None, 0),
+        (object(), 0),
+    ],
+)
+def test_payload_size(result: Any, size: int) -> None:
+    assert payload_size(result) == size
+
+
+def test_payload_size_of_compressed_result() -> None:
+    result = CompressedResult(b"x" * 1000, "zlib")
+    try:
+        assert payload_size(result) == 1000
+    finally:
+        result.close()
@@ -0,0 +1,131 @@
+"""
+Tests for saving and restoring browser profile states.
+"""
+
+from pathlib import Path
+
+import pytest
+
+from akf_windows.server.profiles import ProfileStateStore
+
+
+def write_files(root: Path, files: dict[str, bytes]) -> None:
+    for name, content in files.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(content)
+
+
+def read_files(root: Path) -> dict[str, bytes]:
+    return {
+        path.relative_to(root).as_posix(): path.read_bytes()
+        for path in root.rglob("*")
+        if path.is_file()
+    }
+
+
+@pytest.fixture
+def store(tmp_path: Path) -> ProfileStateStore:
+    return ProfileStateStore(tmp_path / "store")
+
+
+@pytest.fixture
+def profile(tmp_path: Path) -> Path:
+    profile = tmp_path / "Default"
+    write_files(
+        profile,
+        {
+            "History": b"history" * 1000,
+            "Preferences": b"{}",
+            "Network/Cookies": b"cookies",
+            "Cache/Cache_Data/data_0": b"cached",
+            "lockfile": b"",
+        },
+    )
+    return profile
+
+
+def test_save_and_restore(store: ProfileStateStore, profile: Path) -> None:
+    stats = store.save("clean", profile)
+    assert store.list_states() == ["clean"]
+    assert stats.files == 3
+    assert stats.copied_files == 3
+
+    original = read_files(profile)
+    (profile / "History").write_bytes(b"changed")
+    (profile / "Network/Cookies").unlink()
+    write_files(profile, {"Extensions/new.json": b"new", "Cache/new": b"cache"})
+
+    stats = store.restore("clean", profile)
+
+    assert stats.files == 3
+    assert stats.copied_files == 2
+    assert stats.deleted_files == 1
+
+    # Caches and lock files are left alone
+    restored = read_files(profile)
+    assert restored.pop("Cache/new") == b"cache"
+    assert restored == original
+
+
+def test_restore_keeps_unchanged_files(store: ProfileStateStore, profile: Path) -> None:
+    store.save("clean", profile)
+    (profile / "Preferences").write_bytes(b'{"changed": true}')
+
+    stats = store.restore("clean", profile)
+
+    assert stats.copied_files == 1
+    assert (profile / "Preferences").read_bytes() == b"{}"
+
+
+def test_restore_to_empty_directory(
+    store: ProfileStateStore, profile: Path, tmp_path: Path
+) -> None:
+    store.save("clean", profile)
+    target = tmp_path / "Profile 2"
+
+    store.restore("clean", target)
+
+    assert read_files(target) == {
+        "History": b"history" * 1000,
+        "Preferences": b"{}",
+        "Network/Cookies": b"cookies",
+    }
+
+
+def test_identical_content_is_stored_once(
+    store: ProfileStateStore, profile: Path
+) -> None:
+    store.save("first", profile)
+    stats = store.save("second", profile)
+
+    assert stats.copied_files == 0
+    assert len(list(store.blob_dir.glob("*/*"))) == 3
+
+
+def test_delete_keeps_shared_blobs(store: ProfileStateStore, profile: Path) -> None:
+    store.save("first", profile)
+    (profile / "History").write_bytes(b"more history")
+    store.save("second", profile)
+    assert len(list(store.blob_dir.glob("*/*"))) == 4
+
+    store.delete("first")
+
+    assert store.list_states() == ["second"]
+    assert len(list(store.blob_dir.glob("*/*"))) == 3
+
+    store.delete("second")
+
+    assert store.list_states() == []
+    assert list(store.blob_dir.glob("*/*")) == []
+
+
+def test_restore_unknown_state(store: ProfileStateStore, profile: Path) -> None:
+    with pytest.raises(ValueError):
+        store.restore("missing", profile)
+
+
+@pytest.mark.parametrize("name", ["", "../escape", "a/b"])
+def test_invalid_names(store: ProfileStateStore, profile: Path, name: str) -> None:
+    with pytest.raises(ValueError):
+        store.save(name, profile)
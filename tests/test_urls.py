@@ -0,0 +1,56 @@
+"""
+Tests for URL interning.
+"""
+
+from datetime import UTC, datetime
+
+from akf_windows.server.chromium import (
+    BrowserHistoryEntry,
+    URLInterner,
+    make_url_object,
+)
+
+
+def test_interner_shares_identical_urls() -> None:
+    interner = URLInterner()
+
+    first = interner.get("https://example.com/")
+    second = interner.get("https://example.com/")
+    other = interner.get("https://example.com/other")
+
+    assert first is second
+    assert other is not first
+    assert len(interner) == 2
+
+
+def test_interner_keeps_recorded_urls() -> None:
+    interner = URLInterner()
+    visited = datetime(2025, 1, 1, tzinfo=UTC)
+
+    # These URLs are equivalent, but each entry must keep the URL exactly as the
+    # browser recorded it
+    entries = [
+        BrowserHistoryEntry(
+            id=i,
+            url=url,
+            title="Example",
+            visit_count=1,
+            typed_count=0,
+            last_visit_time=visited,
+        )
+        for i, url in enumerate(["HTTPS://Example.com:443", "https://example.com/"])
+    ]
+    first, second = [entry.to_case_object(interner) for entry in entries]
+
+    assert first.url is not second.url
+    assert first.url.hasFacet[0].fullValue == "HTTPS://Example.com:443"
+    assert second.url.hasFacet[0].fullValue == "https://example.com/"
+    assert len(interner) == 2
+
+
+def test_make_url_object() -> None:
+    interner = URLInterner()
+
+    assert make_url_object("https://a.com", interner) is interner.get("https://a.com")
+    assert make_url_object("https://a.com") is not make_url_object("https://a.com")
+    assert make_url_object("https://a.com").hasFacet[0].fullValue == "https://a.com"